@@ -0,0 +1,58 @@
+"""
+FAQ answer cache keys (handlers.answercache.normalize_question): rephrasings
+of one question must share a key, different questions must not. Asserts
+both lists, then reports the cost of a key and of a cache lookup.
+
+    python -m benchmarks.bench_answercache [iterations]
+"""
+import sys
+import time
+
+from handlers.answercache import AnswerCache, normalize_question
+
+SAME = [
+    ("How do I join?", "how   to JOIN"),
+    ("What is BuildStation?", "what's buildstation"),
+    ("When is the next meetup?", "When's the next meetup??"),
+    ("Don't I need a wallet?", "do I not need a wallet"),
+]
+DIFFERENT = [
+    ("When is the next meetup?", "Where is the next meetup?"),
+    ("Why join Superteam?", "How do I join Superteam?"),
+    ("Who runs Talent Hub?", "When is Talent Hub?"),
+    ("What is Colosseum?", "Which is Colosseum?"),
+    ("Can I join without a wallet?", "Can I join with a wallet?"),
+    ("Is the meetup free?", "Is the meetup not free?"),
+    ("Do I need a wallet?", "Don't I need a wallet?"),
+]
+
+
+def check():
+    for a, b in SAME:
+        assert normalize_question(a) == normalize_question(b), (a, b, normalize_question(a))
+    for a, b in DIFFERENT:
+        assert normalize_question(a) != normalize_question(b), (a, b, normalize_question(a))
+    print(f"cache keys: {len(SAME)} rephrasings share a key, {len(DIFFERENT)} distinct pairs don't")
+
+
+def main(n: int):
+    check()
+    questions = [q for pair in SAME + DIFFERENT for q in pair]
+    start = time.perf_counter()
+    for i in range(n):
+        normalize_question(questions[i % len(questions)])
+    key_us = (time.perf_counter() - start) / n * 1e6
+
+    cache = AnswerCache(max_size=512)
+    for q in questions:
+        cache.put(normalize_question(q), "answer")
+    start = time.perf_counter()
+    for i in range(n):
+        cache.get(normalize_question(questions[i % len(questions)]))
+    lookup_us = (time.perf_counter() - start) / n * 1e6
+    print(f"normalize_question      {key_us:6.2f} µs")
+    print(f"key + cache lookup      {lookup_us:6.2f} µs")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
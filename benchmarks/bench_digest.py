@@ -0,0 +1,106 @@
+"""
+Send-time latency of the morning digest: the old path (opener, events and
+bounties fetched one after another when the digest is due) versus the
+staged pipeline (fetched in parallel ahead of time, so only send_message is
+left at the scheduled moment). Upstreams are local stubs with realistic
+latency; the last run makes every upstream fail to show the fallbacks.
+
+    python -m benchmarks.bench_digest [runs]
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from telegram import Bot
+
+from benchmarks.stubs import FakeBotAPI, StubServer, json_handler, llm_handler, percentile, text_handler
+
+GROUP = -100123
+
+
+def sample_ics(count=20) -> str:
+    start = datetime.now(timezone.utc) + timedelta(days=1)
+    events = [
+        "BEGIN:VEVENT\r\n"
+        f"UID:bench-{i}@luma\r\n"
+        f"SUMMARY:Talent Hub Friday #{i}\r\n"
+        f"DTSTART:{(start + timedelta(days=i)).strftime('%Y%m%dT%H%M%SZ')}\r\n"
+        f"URL:https://lu.ma/bench-{i}\r\n"
+        "END:VEVENT\r\n"
+        for i in range(count)
+    ]
+    return "BEGIN:VCALENDAR\r\nVERSION:2.0\r\n" + "".join(events) + "END:VCALENDAR\r\n"
+
+
+BOUNTIES = {"results": [
+    {"title": f"Bounty {i}", "rewardAmount": 500, "token": "USDC",
+     "deadline": "2030-01-01T00:00:00Z", "slug": f"bounty-{i}"}
+    for i in range(10)
+]}
+
+
+async def old_digest(alerts, events, bounties, bot):
+    opener = await alerts.generate_opener()
+    evts = await events.refresh_events()
+    btys = await bounties.refresh_bounties()
+    await alerts._send_digest(bot, GROUP, alerts.render_digest(opener, evts, btys))
+
+
+def report(name, latencies):
+    print(
+        f"{name:<26} p50 {percentile(latencies, 50) * 1000:8.1f} ms"
+        f"   p95 {percentile(latencies, 95) * 1000:8.1f} ms"
+    )
+
+
+async def main(runs: int):
+    api = FakeBotAPI(latency=0.02)
+    with StubServer(llm_handler(base_latency=1.5)) as llm, \
+            StubServer(text_handler(sample_ics(), latency=0.6)) as luma, \
+            StubServer(json_handler(BOUNTIES, latency=0.8)) as earn, \
+            StubServer(api.handler()) as telegram:
+        os.environ["OPENAI_API_KEY"] = "bench"
+        os.environ["OPENAI_BASE_URL"] = f"{llm.url}/v1"
+        from handlers import alerts, bounties, events, jobs, storage  # read the env above
+
+        alerts.STORE = storage.JsonStorage(Path(tempfile.mkdtemp()) / "db.json")
+        events.CONFIG["feeds"]["events"] = f"{luma.url}/ics"
+        bounties.CONFIG["feeds"]["bounties"] = f"{earn.url}/search"
+        tz = jobs.load_timezone("Europe/Dublin")
+
+        async with Bot("123:bench", base_url=FakeBotAPI.base_url(telegram)) as bot:
+            old, prep, staged = [], [], []
+            for _ in range(runs):
+                t0 = time.perf_counter()
+                await old_digest(alerts, events, bounties, bot)
+                old.append(time.perf_counter() - t0)
+
+                t0 = time.perf_counter()
+                await alerts.stage_digest(tz, lead_seconds=0)
+                prep.append(time.perf_counter() - t0)
+
+                alerts.STORE.set_meta("last_digest_date", None)
+                t0 = time.perf_counter()
+                await alerts.scheduled_digest(bot, GROUP, tz)
+                staged.append(time.perf_counter() - t0)
+
+            # Every upstream down: the staged digest still renders from last good values
+            alerts.OPENAI_BASE_URL = "http://127.0.0.1:9/v1"
+            events.CONFIG["feeds"]["events"] = "http://127.0.0.1:9/ics"
+            bounties.CONFIG["feeds"]["bounties"] = "http://127.0.0.1:9/search"
+            await alerts.stage_digest(tz, lead_seconds=0)
+            degraded = next(iter(alerts._STAGED_DIGEST.values()))
+
+    report("sequential at send time", old)
+    report("parallel staging (ahead)", prep)
+    report("staged: send only", staged)
+    print(f"messages sent              {len(api.sent)}")
+    print(f"fallback digest complete   {'Talent Hub Friday' in degraded and 'Bounty 0' in degraded}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 5))
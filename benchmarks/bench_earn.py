@@ -0,0 +1,74 @@
+"""
+Earn ingestion against a local paging stub: 500 open listings, 50 per page,
+40 ms per request. Compares fetching pages one at a time with the bounded
+concurrent pager in handlers.bounties, then checks that a new listing on a
+later page is picked up as an index diff and times in-memory /bounties
+filtering.
+
+    python -m benchmarks.bench_earn [listings]
+"""
+import asyncio
+import sys
+import time
+from datetime import date, timedelta
+
+from benchmarks.stubs import StubServer, earn_handler
+
+
+def sample_listings(count: int):
+    tokens = ["USDC", "SOL", "BONK", "JUP"]
+    today = date.today()
+    return [
+        {
+            "slug": f"listing-{i}",
+            "title": f"Build thing #{i}",
+            "rewardAmount": 100 * (1 + i % 30),
+            "token": tokens[i % len(tokens)],
+            "deadline": f"{today + timedelta(days=i % 60)}T23:59:59.000Z",
+            "type": "bounty",
+        }
+        for i in range(count)
+    ]
+
+
+async def ingest(bounties, concurrency: int) -> float:
+    bounties.BOUNTIES_CONFIG["concurrency"] = concurrency
+    bounties.BOUNTIES_CACHE.value = None  # no validators: full fetch
+    t0 = time.perf_counter()
+    await bounties.load_bounties()
+    return time.perf_counter() - t0
+
+
+async def main(count: int):
+    data = sample_listings(count)
+    with StubServer(earn_handler(data, latency=0.04)) as earn:
+        from handlers import bounties, httpclient
+
+        bounties.CONFIG["feeds"]["bounties"] = f"{earn.url}/api/search/ireland?grantsLimit=2"
+        bounties.BOUNTIES_CONFIG.update(page_size=50, max_pages=50)
+
+        sequential = await ingest(bounties, 1)
+        concurrent = await ingest(bounties, 4)
+        revision = bounties.INDEX.revision
+
+        data.insert(count - 10, {"slug": "brand-new", "title": "Fresh bounty", "rewardAmount": 900,
+                                 "token": "USDC", "deadline": None})
+        await ingest(bounties, 4)
+        added = [l.slug for l in bounties.INDEX.added_since(revision)]
+
+        t0 = time.perf_counter()
+        for _ in range(1000):
+            matches = bounties.INDEX.filter(**bounties.parse_filters(["usdc", "min=1000", "days=30"]))
+        filter_us = (time.perf_counter() - t0) * 1000
+
+        await httpclient.aclose()
+
+    print(f"listings indexed        {len(bounties.INDEX)} ({earn.requests_seen} page requests)")
+    print(f"ingest, 1 page at a time {sequential * 1000:7.1f} ms")
+    print(f"ingest, 4 concurrent     {concurrent * 1000:7.1f} ms")
+    print(f"added on page {count // 50}:         {added}")
+    print(f"filter usdc/min/days     {filter_us:7.1f} µs per query ({len(matches)} matches)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 500))
@@ -0,0 +1,57 @@
+"""
+Prompt size and end-to-end /faq latency: full knowledge base vs retrieval.
+
+    python -m benchmarks.bench_faq_context
+
+A local chat-completions stub stands in for OpenAI; its latency grows with
+prompt size, so the numbers show the effect of sending less context.
+"""
+import asyncio
+import os
+import statistics
+import time
+
+from benchmarks.stubs import StubServer, llm_handler, percentile
+
+QUESTIONS = [
+    "How do I join Superteam Ireland?",
+    "When is the next Talent Hub?",
+    "What is BuildStation?",
+    "How do Colosseum hackathons work?",
+    "Where can I find bounties and grants?",
+    "Are there meetups in Dublin?",
+]
+ROUNDS = 5
+
+
+async def run_mode(faq, retrieval, use_retrieval: bool):
+    faq.FAQ_CONFIG["retrieval"] = use_retrieval
+    sizes, latencies = [], []
+    for _ in range(ROUNDS):
+        for question in QUESTIONS:
+            t0 = time.perf_counter()
+            context_text = faq.build_context_text(question)
+            system_msg, user_msg = faq.build_messages_html(context_text, question)
+            await faq.ask_openai(system_msg, user_msg)
+            latencies.append(time.perf_counter() - t0)
+            sizes.append(retrieval.estimate_tokens(system_msg + user_msg))
+    return sizes, latencies
+
+
+async def main():
+    with StubServer(llm_handler()) as llm:
+        os.environ["OPENAI_API_KEY"] = "bench"
+        os.environ["OPENAI_BASE_URL"] = f"{llm.url}/v1"
+        from handlers import faq, retrieval  # reads the env above at import
+
+        print(f"{'mode':<10} {'prompt tok (mean)':>18} {'p50 ms':>8} {'p95 ms':>8}")
+        for name, flag in (("full-kb", False), ("retrieval", True)):
+            sizes, latencies = await run_mode(faq, retrieval, flag)
+            print(
+                f"{name:<10} {statistics.mean(sizes):>18.0f} "
+                f"{percentile(latencies, 50) * 1000:>8.1f} {percentile(latencies, 95) * 1000:>8.1f}"
+            )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
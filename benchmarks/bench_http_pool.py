@@ -0,0 +1,50 @@
+"""
+Per-request latency of a fresh AsyncClient per call (old behaviour) versus
+the pooled keep-alive clients from handlers.httpclient, over local TLS.
+
+    python -m benchmarks.bench_http_pool
+"""
+import asyncio
+import time
+
+import httpx
+
+from benchmarks.stubs import StubServer, json_handler, percentile, self_signed_cert
+from handlers import httpclient
+
+REQUESTS = 200
+
+
+def report(name, latencies):
+    print(
+        f"{name:<22} p50 {percentile(latencies, 50) * 1000:7.2f} ms"
+        f"   p95 {percentile(latencies, 95) * 1000:7.2f} ms"
+    )
+
+
+async def main():
+    cert = self_signed_cert()
+    with StubServer(json_handler({"results": []}), certfile=cert) as server:
+        url = f"{server.url}/feed"
+
+        fresh = []
+        for _ in range(REQUESTS):
+            t0 = time.perf_counter()
+            async with httpx.AsyncClient(verify=str(cert)) as client:
+                (await client.get(url)).raise_for_status()
+            fresh.append(time.perf_counter() - t0)
+
+        pooled = []
+        client = httpclient.build_client({"verify": str(cert)})
+        async with client:
+            for _ in range(REQUESTS):
+                t0 = time.perf_counter()
+                (await client.get(url)).raise_for_status()
+                pooled.append(time.perf_counter() - t0)
+
+    report("new client per call", fresh)
+    report("pooled keep-alive", pooled)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,129 @@
+"""
+Events feed parsing on a synthetic 10k-VEVENT calendar: the old
+icalendar-based parse_events (whole body, every component, full sort)
+versus handlers.ics.EventWindow, cold and on a refresh where 1% of the
+VEVENTs changed, plus the longest single feed() call when streamed in
+64 KiB chunks (how long the event loop is blocked at a time).
+
+    python -m benchmarks.bench_ics [events]
+"""
+import re
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+
+from icalendar import Calendar
+
+from handlers import ics
+
+CHUNK = 64 * 1024
+
+
+def legacy_parse_events(ics_text: str):
+    """parse_events() as it was before handlers/ics.py, for comparison."""
+    gcal = Calendar.from_ical(ics_text)
+
+    now = datetime.now(timezone.utc)
+    events = []
+    for component in gcal.walk():
+        if component.name == "VEVENT":
+            start = component.get("DTSTART").dt
+            if start >= now:
+                title = str(component.get("SUMMARY"))
+                link = str(component.get("URL", "")) or \
+                       str(component.get("ATTACH", "")) or ""
+                if not link:
+                    desc = str(component.get("DESCRIPTION", ""))
+                    match = re.search(r"https?://\S+", desc)
+                    if match:
+                        link = match.group(0)
+                if not link:
+                    link = "No link available"
+                date = start.strftime("%Y-%m-%d %H:%M")
+                events.append({"title": title, "date": date, "link": link,
+                               "uid": str(component.get("UID", ""))})
+
+    events.sort(key=lambda e: e["date"])
+    return events[:5]
+
+
+def synthetic_ics(count: int, sequence_bump: int = 0) -> str:
+    """Mostly past one-off events (a long-lived calendar), some upcoming, a few weekly series."""
+    now = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+    stamp = now.strftime("%Y%m%dT%H%M%SZ")
+    out = ["BEGIN:VCALENDAR\r\nVERSION:2.0\r\nPRODID:-//bench//EN\r\n"]
+    for i in range(count):
+        if i % 200 == 0:
+            start = now - timedelta(weeks=57) + timedelta(minutes=30 + i // 200)
+            rule = "RRULE:FREQ=WEEKLY;COUNT=200\r\n"
+        else:
+            start = now + timedelta(hours=(i - count * 0.9) * 3)
+            rule = ""
+        seq = 1 if sequence_bump and i % 100 == 0 else 0
+        out.append(
+            "BEGIN:VEVENT\r\n"
+            f"UID:evt-{i}@bench\r\n"
+            f"DTSTAMP:{stamp}\r\n"
+            f"SEQUENCE:{seq}\r\n"
+            f"DTSTART:{start:%Y%m%dT%H%M%SZ}\r\n"
+            f"DTEND:{start + timedelta(hours=2):%Y%m%dT%H%M%SZ}\r\n"
+            f"{rule}"
+            f"SUMMARY:Community event number {i}{' (updated)' if seq else ''}\r\n"
+            "DESCRIPTION:Join the Superteam Ireland community for talks\\, demos and\r\n"
+            "  pizza. Details at https://lu.ma/bench\r\n"
+            f"URL:https://lu.ma/evt-{i}\r\n"
+            "END:VEVENT\r\n"
+        )
+    out.append("END:VCALENDAR\r\n")
+    return "".join(out)
+
+
+def timed(fn, *args):
+    t0 = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - t0
+
+
+def peak_memory(fn, *args) -> int:
+    tracemalloc.start()
+    fn(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def main(count: int):
+    text = synthetic_ics(count)
+    changed = synthetic_ics(count, sequence_bump=1)
+    print(f"feed: {count} VEVENTs, {len(text) / 1e6:.1f} MB")
+
+    legacy, t_legacy = timed(legacy_parse_events, text)
+    m_legacy = peak_memory(legacy_parse_events, text)
+    m_cold = peak_memory(ics.EventWindow().parse, text)
+
+    window = ics.EventWindow(window_days=120, limit=5)
+    cold, t_cold = timed(window.parse, text)
+    _, t_warm = timed(window.parse, changed)
+    parsed, reused = window.parsed, window.reused
+
+    window.start()
+    longest = 0.0
+    for i in range(0, len(changed), CHUNK):
+        t0 = time.perf_counter()
+        window.feed(changed[i:i + CHUNK])
+        longest = max(longest, time.perf_counter() - t0)
+    window.finish()
+
+    print(f"{'legacy icalendar':<24} {t_legacy * 1000:8.1f} ms   peak {m_legacy / 1e6:6.1f} MB")
+    print(f"{'EventWindow cold':<24} {t_cold * 1000:8.1f} ms   peak {m_cold / 1e6:6.1f} MB")
+    print(f"{'EventWindow 1% changed':<24} {t_warm * 1000:8.1f} ms   ({parsed} parsed, {reused} reused)")
+    print(f"{'longest 64 KiB feed()':<24} {longest * 1000:8.1f} ms")
+    print("next event (legacy)      ", legacy[0]["title"] if legacy else "-")
+    print("next event (EventWindow) ", f"{cold[0]['title']} @ {cold[0]['start']:%Y-%m-%d %H:%M}" if cold else "-")
+    print("legacy misses recurrences:", not any("@bench/" in o["uid"] for o in legacy),
+          "| EventWindow expands them:", any("/" in o["uid"] for o in cold))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10_000)
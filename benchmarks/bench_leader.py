@@ -0,0 +1,111 @@
+"""
+Failover test for handlers.leader: several replica processes share one
+lease (SQLite row or lock file) and the "background job" of each appends a
+tick to a shared file while it leads. The leader is then killed (SIGKILL:
+no release, the lease has to expire) and its successor stopped cleanly
+(SIGTERM: lease released). Reports how long no one was leading after each
+and checks that two replicas never ticked at the same time.
+
+    python -m benchmarks.bench_leader [replicas] [ttl_seconds]
+"""
+import asyncio
+import multiprocessing
+import os
+import signal
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from handlers import leader
+
+TICK = 0.02
+
+
+def replica(backend: str, lease_path: str, ticks_path: str, ttl: float):
+    lease = leader.SqliteLease(Path(lease_path)) if backend == "sqlite" else leader.FileLease(Path(lease_path))
+    elector = leader.LeaderElector(lease, owner=str(os.getpid()), ttl=ttl, renew_every=ttl / 4)
+
+    async def work():
+        with open(ticks_path, "a", buffering=1) as ticks:
+            while True:
+                ticks.write(f"{time.time():.4f} {elector.owner}\n")
+                await asyncio.sleep(TICK)
+
+    async def main():
+        task = asyncio.create_task(elector.lead(work))
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, task.cancel)
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    asyncio.run(main())
+
+
+def read_ticks(path: Path):
+    rows = [line.split() for line in path.read_text().splitlines() if line.strip()]
+    return sorted((float(t), owner) for t, owner in rows)
+
+
+def current_leader(path: Path, after: float):
+    recent = [owner for t, owner in read_ticks(path) if t > after]
+    return recent[-1] if recent else None
+
+
+def gap_after(ticks, stopped_owner: str):
+    """Seconds between the stopped leader's last tick and the next leader's first."""
+    last = max(t for t, owner in ticks if owner == stopped_owner)
+    following = [t for t, owner in ticks if t > last and owner != stopped_owner]
+    return following[0] - last if following else None
+
+
+def overlaps(ticks) -> int:
+    """Leadership changes beyond the expected ones: A B A means both ran at once."""
+    owners = [owner for _, owner in ticks]
+    changes = [owners[i] for i in range(1, len(owners)) if owners[i] != owners[i - 1]]
+    return len(changes) - len(set(changes))
+
+
+def run(backend: str, replicas: int, ttl: float):
+    workdir = Path(tempfile.mkdtemp(prefix="bench-leader-"))
+    lease_path = workdir / ("bot.db" if backend == "sqlite" else "leader.lease")
+    ticks_path = workdir / "ticks.log"
+    ticks_path.touch()
+    ctx = multiprocessing.get_context("spawn")
+    procs = {}
+    for _ in range(replicas):
+        p = ctx.Process(target=replica, args=(backend, str(lease_path), str(ticks_path), ttl), daemon=True)
+        p.start()
+        procs[str(p.pid)] = p
+
+    time.sleep(1.5)
+    killed = current_leader(ticks_path, time.time() - 0.5)
+    os.kill(int(killed), signal.SIGKILL)
+    time.sleep(ttl + 1.5)
+    stopped = current_leader(ticks_path, time.time() - 0.5)
+    os.kill(int(stopped), signal.SIGTERM)
+    time.sleep(1.5)
+
+    for p in procs.values():
+        p.kill()
+        p.join()
+    ticks = read_ticks(ticks_path)
+    leaders = list(dict.fromkeys(owner for _, owner in ticks))
+    print(f"{backend:<7} leaders {len(leaders)}   "
+          f"takeover after SIGKILL {gap_after(ticks, killed):5.2f} s (ttl {ttl:g} s)   "
+          f"after SIGTERM {gap_after(ticks, stopped):5.2f} s   "
+          f"overlapping leaders: {overlaps(ticks)}")
+
+
+def main(replicas: int, ttl: float):
+    print(f"{replicas} replicas, lease ttl {ttl:g} s, renewed every {ttl / 4:g} s\n")
+    for backend in ("sqlite", "file"):
+        run(backend, replicas, ttl)
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 3,
+        float(sys.argv[2]) if len(sys.argv) > 2 else 2.0,
+    )
@@ -0,0 +1,85 @@
+"""
+Single-flight /faq answers against a local chat-completions stub: N
+concurrent /faq updates asking the same question (in different words)
+must reach the LLM once, while a near-identical but different question
+asked at the same time gets its own call. Asserts both, and compares the
+wall time with every update calling the LLM itself.
+
+    python -m benchmarks.bench_singleflight [updates] [llm_ms]
+"""
+import asyncio
+import os
+import sys
+import time
+
+from benchmarks.stubs import StubServer, llm_handler
+
+SAME = ["How do I join Superteam?", "how do i JOIN superteam", "How do I join Superteam??"]
+NEAR_MISS = ["When is the next meetup?", "Where is the next meetup?"]
+
+
+class FakeMessage:
+    """Just enough of telegram.Message for faq.reply_to_question."""
+
+    def __init__(self, text: str = ""):
+        self.text = text
+        self.replies = []
+
+    async def reply_text(self, text, **kwargs):
+        reply = FakeMessage(text)
+        self.replies.append(reply)
+        return reply
+
+    async def edit_text(self, text, **kwargs):
+        self.text = text
+        return self
+
+
+class FakeUpdate:
+    def __init__(self, question: str):
+        self.message = FakeMessage(f"/faq {question}")
+
+
+async def ask_all(faq, questions):
+    updates = [FakeUpdate(q) for q in questions]
+    start = time.perf_counter()
+    await asyncio.gather(*(faq.reply_to_question(u, q) for u, q in zip(updates, questions)))
+    elapsed = time.perf_counter() - start
+    answered = sum(1 for u in updates if u.message.replies and "Stub answer" in u.message.replies[-1].text)
+    return elapsed, answered
+
+
+async def main(n: int, llm_seconds: float):
+    with StubServer(llm_handler(base_latency=llm_seconds, per_kchar_latency=0)) as llm:
+        os.environ["OPENAI_API_KEY"] = "bench"
+        os.environ["OPENAI_BASE_URL"] = f"{llm.url}/v1"
+        from handlers import answercache, faq  # reads the env above at import
+
+        faq.FAQ_CONFIG["stream"] = False
+        faq.ANSWER_CACHE = answercache.AnswerCache(max_size=0)  # every call misses the cache
+
+        questions = [SAME[i % len(SAME)] for i in range(n)]
+        elapsed, answered = await ask_all(faq, questions)
+        assert llm.requests_seen == 1, f"{n} concurrent equivalent questions made {llm.requests_seen} LLM calls"
+        assert answered == n, f"only {answered}/{n} updates got the answer"
+        print(f"{n} concurrent equivalent /faq: {llm.requests_seen} LLM call, "
+              f"all answered in {elapsed * 1000:.0f} ms")
+
+        seen = llm.requests_seen
+        await ask_all(faq, NEAR_MISS * (n // 2))
+        calls = llm.requests_seen - seen
+        assert calls == len(NEAR_MISS), f"{NEAR_MISS} made {calls} LLM calls, expected {len(NEAR_MISS)}"
+        print(f"{NEAR_MISS[0]!r} vs {NEAR_MISS[1]!r}: {calls} LLM calls (not merged)")
+
+        seen = llm.requests_seen
+        unshared = [f"{SAME[0]} #{i}" for i in range(n)]  # distinct keys: one call each
+        elapsed, _ = await ask_all(faq, unshared)
+        print(f"{n} distinct /faq for comparison: {llm.requests_seen - seen} LLM calls "
+              f"in {elapsed * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 20,
+        (float(sys.argv[2]) if len(sys.argv) > 2 else 300) / 1000,
+    ))
@@ -0,0 +1,80 @@
+"""
+Slow feeds vs the rest of the bot: the Luma and Earn stubs take a second to
+answer while a cheap handler keeps running on the same event loop. Measures
+how late the cheap handler's ticks are during the old blocking fetch and
+during events.refresh_events() / bounties.refresh_bounties(), and asserts
+the refreshes never hold the loop for more than a small fraction of the
+feed delay. The first refresh is reported separately: the first async
+request in a process pays one-off lazy imports (anyio sockets/streams)
+whatever the feed latency.
+
+    python -m benchmarks.bench_slowfeed [feed_ms]
+"""
+import asyncio
+import sys
+import time
+
+from benchmarks.bench_earn import sample_listings
+from benchmarks.bench_ics import synthetic_ics
+from benchmarks.stubs import StubServer, earn_handler, text_handler
+
+TICK = 0.01
+MAX_LAG = 0.1  # seconds a tick may be late while a feed is being fetched
+
+
+async def cheap_handler(stop: asyncio.Event, lags: list):
+    """Stands in for /start or /help: runs every TICK, records how late it ran."""
+    while not stop.is_set():
+        due = time.perf_counter() + TICK
+        await asyncio.sleep(TICK)
+        lags.append(time.perf_counter() - due)
+
+
+async def while_fetching(fetch):
+    """Worst tick lag (s) and wall time (s) while `fetch()` runs."""
+    stop, lags = asyncio.Event(), []
+    ticker = asyncio.create_task(cheap_handler(stop, lags))
+    await asyncio.sleep(TICK * 3)
+    start = time.perf_counter()
+    result = await fetch()
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await ticker
+    return max(lags), elapsed, result
+
+
+async def main(feed_seconds: float):
+    ics = synthetic_ics(200)
+    with StubServer(text_handler(ics, latency=feed_seconds)) as luma, \
+            StubServer(earn_handler(sample_listings(120), latency=feed_seconds)) as earn:
+        from handlers import bounties, events, httpclient
+
+        events.CONFIG["feeds"]["events"] = f"{luma.url}/ics"
+        bounties.CONFIG["feeds"]["bounties"] = f"{earn.url}/api/search/ireland"
+        bounties.BOUNTIES_CONFIG.update(page_size=50, max_pages=10)
+        await httpclient.startup()  # as in the bot's post_init: clients (and TLS contexts) built up front
+
+        async def blocking():
+            return events.fetch_events()  # the pre-async call, straight on the loop
+
+        async def refresh_both():
+            events.EVENTS_CACHE.value = bounties.BOUNTIES_CACHE.value = None  # no validators: full fetch
+            return await asyncio.gather(events.refresh_events(), bounties.refresh_bounties())
+
+        blocked_lag, blocked_s, _ = await while_fetching(blocking)
+        cold_lag, cold_s, _ = await while_fetching(refresh_both)
+        lag, elapsed, (upcoming, listings) = await while_fetching(refresh_both)
+        await httpclient.aclose()
+
+    print(f"feeds answer after {feed_seconds * 1000:.0f} ms, cheap handler ticks every {TICK * 1000:.0f} ms\n")
+    print(f"blocking fetch_events()           {blocked_s * 1000:6.0f} ms   worst tick lag {blocked_lag * 1000:6.1f} ms")
+    print(f"refresh_events + refresh_bounties {cold_s * 1000:6.0f} ms   worst tick lag {cold_lag * 1000:6.1f} ms   (first request)")
+    print(f"refresh_events + refresh_bounties {elapsed * 1000:6.0f} ms   worst tick lag {lag * 1000:6.1f} ms")
+    assert upcoming and "Could not fetch" not in upcoming[0]["title"], upcoming[:1]
+    assert len(listings) == 120, f"{len(listings)} listings"
+    assert elapsed >= feed_seconds, "the stub feeds were not slow"
+    assert lag < MAX_LAG, f"a {feed_seconds:g} s feed held the loop for {lag * 1000:.0f} ms"
+
+
+if __name__ == "__main__":
+    asyncio.run(main((float(sys.argv[1]) if len(sys.argv) > 1 else 1000) / 1000))
@@ -0,0 +1,322 @@
+"""
+handlers.tghtml against the regex pipeline it replaced in handlers.faq
+(copied below as legacy_*):
+
+- differential: every faq/*.md page through both Markdown renderers;
+  apart from the intended differences below the output must be identical
+- validity: synthetic LLM-style HTML through both sanitizers, checked
+  against Telegram's rules (allowed tags only, nesting, escaping)
+- speed: ~1 MB of Markdown and ~200 KB of HTML through each, legacy and
+  tghtml runs interleaved; tghtml must not be slower on any input
+- splitting: a long answer cut into valid messages of at most 4096 chars
+
+    python -m benchmarks.bench_tghtml [repeat]
+
+Intended differences, each checked on a sample in INTENDED (only the
+first occurs in the faq pages):
+
+- a blank line before a list is kept (the legacy list regex ate it)
+- code spans keep their contents literally (no <b>/<i> inside <code>)
+- an intraword "_" (snake_case) is not italic
+- bold doesn't span lines
+"""
+import difflib
+import html
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+from handlers import tghtml
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Legacy implementation (handlers/faq.py before tghtml)
+# ──────────────────────────────────────────────────────────────────────────────
+_BR_TAG = re.compile(r'<br\s*/?>', re.I)
+_UNSUPPORTED_TAGS = re.compile(
+    r'</?(?:ul|ol|li|span|strong|em|ins|del|strike|tg-spoiler|img|table|tr|td|th|h[1-6]|div|p|blockquote|hr|sup|sub)[^>]*>',
+    re.I,
+)
+# Remove attributes in allowed tags except href in <a>
+_ALLOWED_TAG_ATTRS = re.compile(r'<(b|i|u|s|code|pre)(\s+[^>]*)?>', re.I)
+_A_TAG_CLEAN = re.compile(r'<a\s+[^>]*href="([^"]+)"[^>]*>', re.I)
+
+def legacy_sanitize(s: str) -> str:
+    if not s:
+        return s
+    s = s.replace("&nbsp;", " ")
+    s = _BR_TAG.sub("\n", s)           # convert <br> to newline
+    s = _UNSUPPORTED_TAGS.sub("", s)   # drop unsupported tags entirely
+    # Clean allowed tags to remove attributes (Telegram dislikes many attrs)
+    s = _ALLOWED_TAG_ATTRS.sub(lambda m: f"<{m.group(1).lower()}>", s)
+    s = _A_TAG_CLEAN.sub(lambda m: f'<a href="{m.group(1)}">', s)
+    # Collapse 3+ newlines to max 2 for neatness
+    s = re.sub(r'\n{3,}', '\n\n', s)
+    return legacy_balance_tags(s)
+
+_ALLOWED_TAG = re.compile(r'<(/?)(b|i|u|s|a|code|pre)\b[^>]*>', re.I)
+_PARTIAL_TAIL = re.compile(r'<[^>]*$|&[#\w]*$')
+
+def legacy_balance_tags(s: str) -> str:
+    """Drop stray closing tags and close any tags left open at the end."""
+    out, stack, pos = [], [], 0
+    for m in _ALLOWED_TAG.finditer(s):
+        out.append(s[pos:m.start()])
+        pos = m.end()
+        name = m.group(2).lower()
+        if not m.group(1):
+            stack.append(name)
+            out.append(m.group(0))
+        elif name in stack:
+            # close anything opened inside it first, then the tag itself
+            while stack:
+                top = stack.pop()
+                out.append(f"</{top}>")
+                if top == name:
+                    break
+    out.append(s[pos:])
+    out.extend(f"</{name}>" for name in reversed(stack))
+    return "".join(out)
+
+def legacy_sanitize_partial(s: str) -> str:
+    """Sanitize streamed output: cut a half-received tag/entity, then balance."""
+    return legacy_sanitize(_PARTIAL_TAIL.sub("", s))
+
+# Convert a subset of Markdown to Telegram-safe HTML (<b> <i> <code> <a>) + newline bullets.
+_MD_IMG = re.compile(r'!\[([^\]]*)\]\(([^)]+)\)')
+_MD_LINK = re.compile(r'\[([^\]]+)\]\((https?://[^)]+)\)')
+_MD_CODE = re.compile(r'`([^`]+)`')
+_MD_BOLD = re.compile(r'(\*\*|__)(.*?)\1', re.DOTALL)
+# italics: *text* or _text_ (simple, line-scoped)
+_MD_ITAL = re.compile(r'(?:(?<!\*)\*(?!\*))([^*\n]+?)(?<!\*)\*(?!\*)|_([^_\n]+?)_', re.DOTALL)
+_MD_H = re.compile(r'^\s{0,3}#{1,6}\s*(.+)$', re.M)
+_MD_UL = re.compile(r'^\s*[-*]\s+', re.M)
+_MD_OL = re.compile(r'^\s*\d+\.\s+', re.M)
+_MD_HR = re.compile(r'^\s{0,3}(-{3,}|\*{3,}|_{3,})\s*$', re.M)
+
+def legacy_md_to_html(md: str) -> str:
+    if not md:
+        return ""
+
+    # Escape raw HTML first
+    s = html.escape(md)
+
+    # Images → keep alt text only
+    s = _MD_IMG.sub(lambda m: m.group(1), s)
+    # Links → <a href="...">text</a>
+    s = _MD_LINK.sub(lambda m: f'<a href="{m.group(2)}">{m.group(1)}</a>', s)
+    # Inline code
+    s = _MD_CODE.sub(lambda m: f"<code>{m.group(1)}</code>", s)
+    # Bold
+    s = _MD_BOLD.sub(lambda m: f"<b>{m.group(2)}</b>", s)
+    # Italic (two-alternative groups)
+    def ital_repl(m):
+        txt = m.group(1) or m.group(2) or ""
+        return f"<i>{txt}</i>"
+    s = _MD_ITAL.sub(ital_repl, s)
+    # Headings → bold line
+    s = _MD_H.sub(lambda m: f"<b>{m.group(1)}</b>", s)
+    # Lists → bullet prefix "• "
+    s = _MD_UL.sub("• ", s)
+    s = _MD_OL.sub("• ", s)
+    # Horizontal rules → blank line
+    s = _MD_HR.sub("\n", s)
+
+    # Normalize newlines
+    s = re.sub(r'\r\n?', '\n', s)
+    s = re.sub(r'\n{3,}', '\n\n', s)
+    return s
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Telegram's rules, checked strictly
+# ──────────────────────────────────────────────────────────────────────────────
+_CHECK_TAG = re.compile(r'<(/?)(b|i|u|s|a|code|pre)( href="[^"<>]*")?>')
+_CHECK_ENTITY = re.compile(r'&(?:lt|gt|amp|quot|#[0-9]+|#x[0-9a-fA-F]+);')
+
+
+def telegram_error(s: str):
+    """Why Telegram would reject `s` with parse_mode=HTML, or None."""
+    stack, pos = [], 0
+    while pos < len(s):
+        c = s[pos]
+        if c == "<":
+            m = _CHECK_TAG.match(s, pos)
+            if not m or (m.group(3) and (m.group(1) or m.group(2) != "a")):
+                return f"bad tag {s[pos:pos + 20]!r}"
+            closing, name = m.group(1), m.group(2)
+            if closing:
+                if not stack or stack[-1] != name:
+                    return f"unexpected </{name}>"
+                stack.pop()
+            else:
+                if stack and stack[-1] == "code" or stack and stack[-1] == "pre" and name != "code":
+                    return f"<{name}> inside <{stack[-1]}>"
+                if name == "a" and "a" in stack:
+                    return "nested <a>"
+                stack.append(name)
+            pos = m.end()
+        elif c == ">":
+            return "unescaped >"
+        elif c == "&":
+            m = _CHECK_ENTITY.match(s, pos)
+            if not m:
+                return f"bad entity {s[pos:pos + 10]!r}"
+            pos = m.end()
+        else:
+            pos += 1
+    return f"unclosed <{stack[-1]}>" if stack else None
+
+
+def visible(s: str) -> str:
+    return " ".join(html.unescape(re.sub(r"<[^>]+>", "", s)).split())
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Inputs
+# ──────────────────────────────────────────────────────────────────────────────
+_LLM_FRAGMENTS = [
+    "Superteam Ireland runs <b>weekly</b> meetups.",
+    "<p>Join via the <a href=\"https://superteam.fun/ireland\" target=\"_blank\">website</a>.</p>",
+    "<ul><li><strong>BuildStation</strong></li><li><em>Talent Hub</em></li></ul>",
+    "Use <code>/faq &lt;question&gt;</code> to ask.",
+    "Rewards: 500 USDC & up, if score < 50 or > 80.",
+    "AT&T and R&D teams&mdash;welcome&nbsp;all.",
+    "<b><i>crossed</b></i> tags",
+    "<b>left open",
+    "</i> stray closer",
+    "<a href='https://earn.superteam.fun'>Earn</a>",
+    "<a href=\"https://lu.ma\"><b>Luma</b> calendar</a>",
+    "<pre><code class=\"language-py\">print(\"<hi>\")</code></pre>",
+    "<code><b>no tags in code</b></code>",
+    "<span style=\"color:red\">red</span> and <br/>new line",
+    "I <3 Solana, see <https://solana.com>.",
+    "<h3>Heading</h3><div>block</div>",
+    "<tg-spoiler>secret</tg-spoiler> &copy; 2024",
+    "x<y and y>z",
+    "<a href=\"https://a.example\">outer <a href=\"https://b.example\">inner</a></a>",
+]
+
+
+def llm_html(rng: random.Random, fragments: int) -> str:
+    return "\n".join(rng.choice(_LLM_FRAGMENTS) for _ in range(fragments))
+
+
+# (Markdown, what tghtml renders) for each intended difference from legacy
+INTENDED = [
+    ("Intro\n\n- item", "Intro\n\n• item"),
+    ("Run `a *b* c`", "Run <code>a *b* c</code>"),
+    ("Set snake_case_name", "Set snake_case_name"),
+    ("**bold\nline**", "**bold\nline**"),
+]
+SLACK = 1.05  # timer noise allowed before tghtml counts as slower
+
+
+def faq_pages():
+    return {p.name: p.read_text() for p in sorted(Path("faq").glob("*.md"))}
+
+
+def timed(old, new, arg, repeat: int):
+    """Best time (s) of `old(arg)` and of `new(arg)`, alternating runs so both see the same machine."""
+    best = [float("inf"), float("inf")]
+    for _ in range(repeat):
+        for i, func in enumerate((old, new)):
+            start = time.perf_counter()
+            func(arg)
+            best[i] = min(best[i], time.perf_counter() - start)
+    return best
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Runs
+# ──────────────────────────────────────────────────────────────────────────────
+def nonblank_lines(s: str) -> list:
+    return [line for line in s.splitlines() if line.strip()]
+
+
+def differential(pages: dict):
+    same = same_lines = 0
+    shown = 0
+    for name, md in pages.items():
+        old, new = legacy_md_to_html(md), tghtml.render_markdown(md)
+        same += old == new
+        same_lines += nonblank_lines(old) == nonblank_lines(new)
+        for line in difflib.unified_diff(old.splitlines(), new.splitlines(), lineterm="", n=0):
+            if shown < 12 and line[1:].strip() and line[:1] in "+-" and line[:3] not in ("+++", "---"):
+                print(f"    {name:<18} {line[:100]}")
+                shown += 1
+    rejected = {name: telegram_error(tghtml.render_markdown(md)) for name, md in pages.items()}
+    rejected = {name: error for name, error in rejected.items() if error}
+    print(f"  faq pages identical: {same}/{len(pages)}"
+          f"   identical apart from blank lines before lists: {same_lines}/{len(pages)}")
+    print(f"  pages Telegram would reject — legacy: "
+          f"{sum(telegram_error(legacy_md_to_html(md)) is not None for md in pages.values())}"
+          f"   tghtml: {len(rejected)}")
+    assert same_lines == len(pages), "a faq page renders differently beyond the intended differences"
+    assert not rejected, rejected
+    for md, expected in INTENDED:
+        old, new = legacy_md_to_html(md), tghtml.render_markdown(md)
+        print(f"  {md!r:<22} legacy {old!r:<34} tghtml {new!r}")
+        assert new == expected and old != new, (md, old, new)
+
+
+def validity(samples: int):
+    rng = random.Random(7)
+    inputs = [llm_html(rng, rng.randint(2, 8)) for _ in range(samples)]
+    for name, func in (("legacy", legacy_sanitize), ("tghtml", tghtml.sanitize),
+                       ("legacy partial", legacy_sanitize_partial),
+                       ("tghtml partial", lambda s: tghtml.sanitize(s, partial=True))):
+        cut = "partial" in name
+        errors = [telegram_error(func(s[:rng.randint(1, len(s))] if cut else s)) for s in inputs]
+        bad = [e for e in errors if e]
+        example = f"   e.g. {bad[0]}" if bad else ""
+        print(f"  {name:<15} valid {samples - len(bad):5}/{samples}{example}")
+        assert name.startswith("legacy") or not bad, f"{name}: {len(bad)} invalid, e.g. {bad[0]}"
+
+
+def speed(pages: dict, repeat: int):
+    corpus = "\n\n".join(pages.values())
+    md = (corpus + "\n\n") * (1_000_000 // (len(corpus) + 2) + 1)
+    inputs = [
+        ("render_markdown", "KB Markdown", md, legacy_md_to_html, tghtml.render_markdown),
+        # answers look like the rendered KB: mostly prose with some tags
+        ("sanitize", "answer-like HTML", tghtml.render_markdown(md[:200_000]), legacy_sanitize, tghtml.sanitize),
+        # worst case: a tag or entity every few characters
+        ("sanitize", "tag soup", llm_html(random.Random(3), 4000), legacy_sanitize, tghtml.sanitize),
+    ]
+    for func, label, text, old, new in inputs:
+        old_s, new_s = timed(old, new, text, repeat)
+        print(f"  {func:<15} {label:<17} {len(text) / 1e3:6.0f} KB   "
+              f"legacy {old_s * 1000:7.1f} ms   tghtml {new_s * 1000:7.1f} ms   ×{new_s / old_s:.2f}")
+        assert new_s <= old_s * SLACK, f"{func} on {label}: tghtml {new_s / old_s:.2f}× legacy"
+    return md
+
+
+def splitting(md: str):
+    answer = tghtml.render_markdown(md[:60_000])
+    parts = tghtml.split_message(answer)
+    invalid = [e for e in map(telegram_error, parts) if e]
+    kept = visible(" ".join(parts)) == visible(answer)
+    longest = max(map(len, parts))
+    print(f"  {len(answer)} chars → {len(parts)} messages, longest {longest}, "
+          f"invalid {len(invalid)}, text kept: {kept}")
+    assert longest <= tghtml.MAX_MESSAGE_CHARS, longest
+    assert not invalid, invalid[:3]
+    assert kept, "splitting lost or changed visible text"
+    assert len(parts) > 1
+
+
+def main(repeat: int):
+    pages = faq_pages()
+    print("Markdown → HTML, legacy vs tghtml")
+    differential(pages)
+    print("\nSanitizing LLM-style HTML")
+    validity(2000)
+    print("\nSpeed (best of %d)" % repeat)
+    md = speed(pages, repeat)
+    print("\nSplitting")
+    splitting(md)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
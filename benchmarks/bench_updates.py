@@ -0,0 +1,98 @@
+"""
+Head-of-line blocking by slow LLM-backed updates. A burst of /faq
+questions (each `faq_ms` long, like a slow OpenAI call) arrives together
+with cheap /events commands from other chats, plus a run of messages in a
+single chat. Compares PTB's default (one update at a time) with
+handlers.updates.ChatOrderedProcessor; reports how long the cheap
+commands wait and checks that one chat's updates still finish in order.
+
+    python -m benchmarks.bench_updates [faq_count] [cheap_count] [faq_ms]
+"""
+import asyncio
+import sys
+import time
+
+from telegram import Update
+
+from benchmarks.stubs import percentile
+from handlers.updates import ChatOrderedProcessor
+
+ORDERED_CHAT = 777
+
+
+def make_update(update_id: int, chat_id: int, text: str) -> Update:
+    command = text.split()[0]
+    return Update.de_json({"update_id": update_id, "message": {
+        "message_id": update_id, "date": int(time.time()), "text": text,
+        "chat": {"id": chat_id, "type": "private"},
+        "from": {"id": chat_id, "is_bot": False, "first_name": "Bench"},
+        "entities": [{"type": "bot_command", "offset": 0, "length": len(command)}],
+    }}, None)
+
+
+def workload(faq_count: int, cheap_count: int):
+    updates = []
+    for i in range(faq_count):
+        updates.append(make_update(len(updates), 1000 + i, "/faq how do I join?"))
+    for i in range(cheap_count):
+        updates.append(make_update(len(updates), 5000 + i, "/events"))
+    for i in range(20):  # one chat: a slow question followed by quick commands
+        updates.append(make_update(len(updates), ORDERED_CHAT, "/faq hi" if i == 0 else "/events"))
+    return updates
+
+
+async def run(processor, updates, faq_seconds: float, cheap_seconds: float = 0.005):
+    """Feed the burst the way Application._update_fetcher does."""
+    done = {}  # update_id -> seconds after the burst arrived
+    order = []
+    t0 = time.monotonic()
+
+    async def handle(update):
+        slow = update.message.text.startswith("/faq")
+        await asyncio.sleep(faq_seconds if slow else cheap_seconds)
+        done[update.update_id] = time.monotonic() - t0
+        if update.effective_chat.id == ORDERED_CHAT:
+            order.append(update.update_id)
+
+    async with processor:
+        if processor.max_concurrent_updates > 1:
+            await asyncio.gather(*(processor.process_update(u, handle(u)) for u in updates))
+        else:
+            for u in updates:
+                await processor.process_update(u, handle(u))
+
+    # the ordered chat's /events wait for its own /faq by design, so leave them out
+    cheap = [done[u.update_id] for u in updates
+             if not u.message.text.startswith("/faq") and u.effective_chat.id != ORDERED_CHAT]
+    expected = [u.update_id for u in updates if u.effective_chat.id == ORDERED_CHAT]
+    return cheap, max(done.values()), order == expected
+
+
+def report(name, cheap, total, ordered):
+    print(
+        f"{name:<13} /events p50 {percentile(cheap, 50) * 1000:7.0f} ms"
+        f"   p95 {percentile(cheap, 95) * 1000:7.0f} ms"
+        f"   all done {total:6.2f} s   chat order kept: {ordered}"
+    )
+
+
+async def main(faq_count: int, cheap_count: int, faq_seconds: float):
+    from telegram.ext import SimpleUpdateProcessor
+
+    updates = workload(faq_count, cheap_count)
+    print(f"{faq_count} × /faq ({faq_seconds * 1000:.0f} ms), {cheap_count} × /events, "
+          f"20 updates in one chat\n")
+    report("sequential", *await run(SimpleUpdateProcessor(1), updates, faq_seconds))
+    processor = ChatOrderedProcessor(concurrency=8, llm_concurrency=2)
+    report("chat-ordered", *await run(processor, updates, faq_seconds))
+    for name, stats in processor.stats().items():
+        if isinstance(stats, dict):
+            print(f"  lane {name:<8} processed {stats['processed']:4}   max queue {stats['max_waiting']:4}"
+                  f"   wait p50 {stats['wait_p50_ms']:7.1f} ms   p95 {stats['wait_p95_ms']:7.1f} ms")
+
+
+if __name__ == "__main__":
+    faqs = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    cheap = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    ms = float(sys.argv[3]) if len(sys.argv) > 3 else 500
+    asyncio.run(main(faqs, cheap, ms / 1000))
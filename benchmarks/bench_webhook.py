@@ -0,0 +1,119 @@
+"""
+Update-to-reply latency of the real bot Application in both modes against
+a local fake Bot API: long polling (getUpdates) versus the built-in webhook
+server (handlers.webhook). Each update is a /start command; the clock runs
+from the moment Telegram would have the update until the fake API receives
+the reply. one_way_delay_ms is added to every Telegram leg. The burst comes
+from distinct chats, so handlers.updates runs it concurrently.
+
+    python -m benchmarks.bench_webhook [updates] [one_way_delay_ms]
+"""
+import asyncio
+import logging
+import sys
+import time
+
+import httpx
+
+from benchmarks.stubs import FakeBotAPI, StubServer, percentile
+
+SECRET = "bench-secret"
+
+
+def start_update(chat_id: int) -> dict:
+    return {"update_id": chat_id, "message": {
+        "message_id": chat_id, "date": int(time.time()), "text": "/start",
+        "chat": {"id": chat_id, "type": "private"},
+        "from": {"id": chat_id, "is_bot": False, "first_name": "Bench"},
+        "entities": [{"type": "bot_command", "offset": 0, "length": 6}],
+    }}
+
+
+def report(name, latencies, burst_seconds, burst):
+    print(
+        f"{name:<9} p50 {percentile(latencies, 50) * 1000:7.1f} ms"
+        f"   p95 {percentile(latencies, 95) * 1000:7.1f} ms"
+        f"   burst of {burst}: {burst / burst_seconds:6.0f} updates/s"
+    )
+
+
+async def measure(api, deliver, updates: int, burst: int):
+    """deliver(update) hands one update to the bot the way Telegram would."""
+    latencies = []
+    for i in range(updates):
+        sent = len(api.sent)
+        t0 = time.monotonic()
+        await deliver(start_update(10_000 + i))
+        await asyncio.to_thread(api.wait_for_sent, sent + 1)
+        latencies.append(api.sent_at[sent] - t0)
+
+    sent = len(api.sent)
+    t0 = time.monotonic()
+    await asyncio.gather(*(deliver(start_update(20_000 + i)) for i in range(burst)))
+    await asyncio.to_thread(api.wait_for_sent, sent + burst, 60)
+    return latencies, api.sent_at[-1] - t0
+
+
+async def main(updates: int, delay: float):
+    import bot  # after argv parsing: importing loads config.yaml and the handlers
+    from handlers import metrics, webhook
+
+    logging.getLogger().setLevel(logging.WARNING)
+
+    burst = 200
+    api = FakeBotAPI(latency=delay, rate_limit=10_000)
+    with StubServer(api.handler()) as telegram:
+        # --- long polling ---
+        app = bot.build_application("123:bench", base_url=FakeBotAPI.base_url(telegram))
+        app.post_init = app.post_shutdown = None  # no scheduler/outbox during the benchmark
+        async with app:
+            await app.start()
+            await app.updater.start_polling(poll_interval=0, timeout=10)
+
+            async def push(update):
+                update.pop("update_id")  # getUpdates numbers them itself
+                api.push_update(update)
+
+            polling = await measure(api, push, updates, burst)
+            await app.updater.stop()
+            await app.stop()
+
+        # --- webhook ---
+        app = bot.build_application("123:bench", base_url=FakeBotAPI.base_url(telegram))
+        app.post_init = app.post_shutdown = None
+        server = webhook.WebhookServer(app, "/telegram", SECRET, metrics_path="/metrics")
+        metrics.REGISTRY.add_collector("webhook", server.collect)  # as webhook.run() does
+        async with app, httpx.AsyncClient(limits=httpx.Limits(max_connections=40)) as client:
+            await app.start()
+            await server.start("127.0.0.1", 0)
+            base = f"http://127.0.0.1:{server.port}"
+
+            async def post(update):
+                await asyncio.sleep(delay)  # Telegram → bot
+                r = await client.post(f"{base}/telegram", json=update,
+                                      headers={"X-Telegram-Bot-Api-Secret-Token": SECRET})
+                r.raise_for_status()
+
+            hooked = await measure(api, post, updates, burst)
+            forged = await client.post(f"{base}/telegram", json=start_update(1),
+                                       headers={"X-Telegram-Bot-Api-Secret-Token": "wrong"})
+            health = await client.get(f"{base}/healthz")
+            scrape = await client.get(f"{base}/metrics")
+            await server.stop()
+            await app.stop()
+
+    report("polling", *polling, burst)
+    report("webhook", *hooked, burst)
+    print(f"forged secret → {forged.status_code}, /healthz → {health.status_code} {health.json()}")
+    assert forged.status_code == 403
+    assert health.json() == {"ok": True}, "the unauthenticated /healthz must not expose details"
+    handled = [line for line in scrape.text.splitlines() if line.startswith("bot_handler_seconds_count")]
+    webhook_lines = [line for line in scrape.text.splitlines() if line.startswith("bot_webhook_requests_total")]
+    print(f"/metrics webhook counters: {', '.join(webhook_lines)}")
+    print(f"/metrics → {scrape.status_code}, {len(scrape.text.splitlines())} lines, e.g. {handled[0] if handled else '-'}")
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    ms = float(sys.argv[2]) if len(sys.argv) > 2 else 20
+    asyncio.run(main(n, ms / 1000))
@@ -0,0 +1,245 @@
+"""
+Offline load test of the whole bot: the real Application (handlers,
+update processor, rate limiter, feed caches, storage) against local stand-ins
+for the Bot API, the chat-completions endpoint, Earn and Luma. Synthetic
+update streams are replayed through getUpdates at a fixed rate:
+
+- commands:  /start, /help, /events, /bounties (some filtered) and /faq from private chats
+- mentions:  "@BenchBot <question>" in group chats (one mention per group,
+             so the per-group cooldown never queues them)
+- subscribe: a /subscribe storm from distinct users (storage writes)
+
+An update's latency runs from the moment it is queued at the fake Bot API
+to the last sendMessage/editMessageText for its chat (e.g. the final edit
+of a streamed /faq answer). Every run uses a throwaway working directory, so
+bot.db, the outbox and db.json are never touched.
+
+    python -m benchmarks.loadtest [--scenario all] [--updates 300] [--rate 100]
+        [--latency-ms 20] [--llm-ms 300] [--error-rate 0] [--json out.json]
+        [--max-p95-ms N] [--min-mps N]
+
+With --max-p95-ms / --min-mps it exits 1 when a scenario misses them (for CI).
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import yaml
+
+from benchmarks.stubs import FakeBotAPI, Faults, StubServer, earn_handler, llm_handler, percentile, text_handler
+
+REPO = Path(__file__).resolve().parent.parent
+SCENARIOS = ("commands", "mentions", "subscribe")
+QUESTIONS = [
+    "How do I join Superteam Ireland?", "When is the next Talent Hub Friday?",
+    "What is BuildStation?", "How does Colosseum work?", "Where are meetups held?",
+    "How do I find bounties?", "Can I get a grant?", "Who runs Superteam Ireland?",
+]
+
+
+def message(update_id: int, chat_id: int, user_id: int, text: str, chat_type="private") -> dict:
+    msg = {
+        "message_id": update_id, "date": int(time.time()), "text": text,
+        "chat": {"id": chat_id, "type": chat_type, **({"title": "Bench group"} if chat_type != "private" else {})},
+        "from": {"id": user_id, "is_bot": False, "first_name": "Load"},
+    }
+    if text.startswith("/"):
+        msg["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+    return msg
+
+
+def stream(scenario: str, count: int, rng: random.Random, base: int):
+    """[(chat_id, message dict)] for one scenario; chat IDs are unique per update."""
+    out = []
+    for i in range(count):
+        user = base + i
+        if scenario == "commands":
+            text = rng.choices(
+                ["/start", "/help", "/events", "/bounties", "/bounties usdc min=500", "/faq"],
+                weights=[2, 1, 3, 2, 1, 2],
+            )[0]
+            if text == "/faq":
+                text += " " + rng.choice(QUESTIONS)
+            out.append((user, message(i, user, user, text)))
+        elif scenario == "mentions":
+            group = -(base + i)
+            out.append((group, message(i, group, user, f"@BenchBot {rng.choice(QUESTIONS)}", "group")))
+        elif scenario == "subscribe":
+            out.append((user, message(i, user, user, "/subscribe")))
+    return out
+
+
+def prepare_workdir(urls: dict) -> Path:
+    """Temp dir with a config.yaml pointing at the stubs, and the FAQ pages."""
+    workdir = Path(tempfile.mkdtemp(prefix="bot-loadtest-"))
+    config = yaml.safe_load((REPO / "config.yaml").read_text())
+    config["feeds"] = {
+        "bounties": f"{urls['earn']}/api/search/ireland?grantsLimit=2",
+        "events": f"{urls['luma']}/ics/get",
+    }
+    config["http"] = {"default": {"http2": False, "max_connections": 50, "max_keepalive": 50}}
+    config.setdefault("faq", {})["answer_cache"] = {"max_size": 512, "ttl_seconds": 86400, "path": ""}
+    config.setdefault("metrics", {})["enabled"] = False
+    (workdir / "config.yaml").write_text(yaml.safe_dump(config))
+    shutil.copytree(REPO / "faq", workdir / "faq")
+    return workdir
+
+
+async def settle(app, api, target: int, timeout: float = 120):
+    """Wait until `target` updates were processed and nothing is queued or running."""
+    from handlers import faq
+
+    processor = app.update_processor
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        stats = processor.stats()
+        lanes = [s for s in stats.values() if isinstance(s, dict)]
+        done = sum(s["processed"] for s in lanes)
+        busy = any(s["running"] or s["waiting"] for s in lanes)
+        if done >= target and not busy and app.update_queue.empty() and not faq.LIMITER.queued():
+            await asyncio.sleep(0.2)  # replies still in flight to the fake API
+            return True
+        await asyncio.sleep(0.05)
+    return False
+
+
+async def replay(app, api, updates, rate: float):
+    """Queue updates at `rate` per second; returns {chat_id: pushed at}."""
+    pushed = {}
+    start = time.monotonic()
+    for i, (chat_id, msg) in enumerate(updates):
+        delay = start + i / rate - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        pushed[chat_id] = time.monotonic()
+        api.push_update({"message": msg})
+    return pushed
+
+
+async def run_scenario(app, api, name: str, updates, rate: float, processed_before: int):
+    from handlers import metrics
+
+    errors_before = sum(metrics.HANDLER_ERRORS._values.values())
+    writes_before = len(api.sent) + api.edits
+    pushed = await replay(app, api, updates, rate)
+    settled = await settle(app, api, processed_before + len(updates))
+    latencies = [api.last_write[c] - t for c, t in pushed.items() if api.last_write.get(c, 0) >= t]
+    writes = len(api.sent) + api.edits - writes_before
+    first = min(pushed.values())
+    last = max((api.last_write.get(c, first) for c in pushed), default=first)
+    return {
+        "scenario": name,
+        "updates": len(updates),
+        "answered": len(latencies),
+        "settled": settled,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        "messages": writes,
+        "handler_errors": sum(metrics.HANDLER_ERRORS._values.values()) - errors_before,
+        "msgs_per_s": round(writes / max(last - first, 1e-9), 1),
+    }
+
+
+async def main(args) -> int:
+    rng = random.Random(args.seed)
+    faults = {name: Faults(args.error_rate, seed=args.seed + i)
+              for i, name in enumerate(("telegram", "llm", "earn", "luma"))}
+    latency = args.latency_ms / 1000
+
+    from benchmarks.bench_earn import sample_listings
+    from benchmarks.bench_ics import synthetic_ics
+
+    api = FakeBotAPI(latency=latency, rate_limit=1e9, faults=faults["telegram"])
+    with StubServer(api.handler()) as telegram, \
+            StubServer(llm_handler(args.llm_ms / 1000, 0.0, faults=faults["llm"])) as llm, \
+            StubServer(earn_handler(sample_listings(200), latency, faults=faults["earn"])) as earn, \
+            StubServer(text_handler(synthetic_ics(2000), latency=latency, faults=faults["luma"])) as luma:
+        workdir = prepare_workdir({"earn": earn.url, "luma": luma.url})
+        os.environ.update(OPENAI_API_KEY="loadtest", OPENAI_BASE_URL=f"{llm.url}/v1")
+        os.chdir(workdir)  # handlers read config.yaml, faq/ and the database from the cwd
+        try:
+            import bot  # imported here: modules load config.yaml at import
+            from handlers import alerts, httpclient
+
+            logging.getLogger().setLevel(logging.WARNING)
+            # injected failures surface as handler exceptions; they are counted below instead
+            logging.getLogger("telegram.ext").setLevel(logging.CRITICAL)
+            app = bot.build_application("123:loadtest", base_url=FakeBotAPI.base_url(telegram))
+            app.post_init = app.post_shutdown = None  # no scheduler/outbox: only update handling
+            results = []
+            async with app:
+                await app.start()
+                await app.updater.start_polling(poll_interval=0, timeout=10)
+                # warm the feed caches so the first /events and /bounties aren't the cold fetch
+                api.push_update({"message": message(0, 1, 1, "/events")})
+                api.push_update({"message": message(1, 2, 2, "/bounties")})
+                processed = 2
+                await settle(app, api, processed)
+
+                names = SCENARIOS if args.scenario == "all" else (args.scenario,)
+                for n, name in enumerate(names):
+                    updates = stream(name, args.updates, rng, base=(n + 1) * 1_000_000)
+                    results.append(await run_scenario(app, api, name, updates, args.rate, processed))
+                    processed += len(updates)
+
+                await app.updater.stop()
+                await app.stop()
+            await httpclient.aclose()
+            alerts.STORE.close()
+        finally:
+            os.chdir(REPO)
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"{args.updates} updates/scenario at {args.rate:.0f}/s, Bot API {args.latency_ms:.0f} ms, "
+          f"LLM {args.llm_ms:.0f} ms, error rate {args.error_rate:.0%}\n")
+    print(f"{'scenario':<10} {'answered':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'msgs/s':>8} {'errors':>7}")
+    for r in results:
+        print(f"{r['scenario']:<10} {r['answered']:>4}/{r['updates']:<4} {r['p50_ms']:>8.1f} "
+              f"{r['p95_ms']:>8.1f} {r['p99_ms']:>8.1f} {r['msgs_per_s']:>8.1f} {r['handler_errors']:>7.0f}"
+              + ("" if r["settled"] else "   (timed out)"))
+    injected = {name: f.injected for name, f in faults.items() if f.injected}
+    if injected:
+        print(f"injected errors: {injected}")
+
+    failures = []
+    for r in results:
+        if not r["settled"]:
+            failures.append(f"{r['scenario']}: did not finish")
+        if args.max_p95_ms and r["p95_ms"] > args.max_p95_ms:
+            failures.append(f"{r['scenario']}: p95 {r['p95_ms']} ms > {args.max_p95_ms} ms")
+        if args.min_mps and r["msgs_per_s"] < args.min_mps:
+            failures.append(f"{r['scenario']}: {r['msgs_per_s']} msgs/s < {args.min_mps}")
+    if args.json:
+        Path(args.json).write_text(json.dumps({"args": vars(args), "results": results,
+                                               "injected": injected, "failures": failures}, indent=2))
+    for failure in failures:
+        print(f"FAIL {failure}")
+    return 1 if failures else 0
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--scenario", choices=SCENARIOS + ("all",), default="all")
+    parser.add_argument("--updates", type=int, default=300, help="updates per scenario")
+    parser.add_argument("--rate", type=float, default=100, help="updates queued per second")
+    parser.add_argument("--latency-ms", type=float, default=20, help="Bot API / feed response delay")
+    parser.add_argument("--llm-ms", type=float, default=300, help="chat-completions delay before the first token")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of stub responses that are 500s")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--max-p95-ms", type=float, help="fail when a scenario's p95 is above this")
+    parser.add_argument("--min-mps", type=float, help="fail when a scenario sends fewer messages/s")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main(parse_args())))
@@ -0,0 +1,343 @@
+"""
+Local stand-in servers for benchmarks (stdlib only, no network needed).
+Each server runs in a daemon thread on 127.0.0.1 and an ephemeral port.
+Handlers that take `error_rate` answer that fraction of requests with an
+HTTP 500 instead (seeded, so runs are repeatable).
+"""
+import json
+import random
+import ssl
+import urllib.parse
+import subprocess
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+
+def self_signed_cert() -> Path:
+    """Create a throwaway cert+key for 127.0.0.1 (needs the openssl CLI)."""
+    folder = Path(tempfile.mkdtemp(prefix="bench-tls-"))
+    pem = folder / "localhost.pem"
+    subprocess.run(
+        [
+            "openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+            "-subj", "/CN=127.0.0.1", "-addext", "subjectAltName=IP:127.0.0.1",
+            "-keyout", str(pem), "-out", str(pem),
+        ],
+        check=True,
+        capture_output=True,
+    )
+    return pem
+
+
+class StubServer:
+    """
+    Start a ThreadingHTTPServer for `handler_cls` in the background.
+    Pass certfile (see self_signed_cert) to serve HTTPS instead of HTTP.
+    """
+
+    def __init__(self, handler_cls, certfile=None):
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), handler_cls)
+        self.httpd.daemon_threads = True
+        self.httpd.requests_seen = 0
+        self.scheme = "http"
+        if certfile:
+            ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            ctx.load_cert_chain(certfile)
+            self.httpd.socket = ctx.wrap_socket(self.httpd.socket, server_side=True)
+            self.scheme = "https"
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"{self.scheme}://{host}:{port}"
+
+    @property
+    def requests_seen(self) -> int:
+        return self.httpd.requests_seen
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class _JSONHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real upstreams
+    # Buffer headers+body into one write and disable Nagle, otherwise
+    # delayed ACKs add ~40 ms to every keep-alive response.
+    wbufsize = 64 * 1024
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def send_json(self, payload, status=200):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class Faults:
+    """Seeded error injection shared by a stub's request threads."""
+
+    def __init__(self, error_rate: float = 0.0, seed: int = 0):
+        self.error_rate = error_rate
+        self.injected = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def fail(self) -> bool:
+        if not self.error_rate:
+            return False
+        with self._lock:
+            if self._rng.random() < self.error_rate:
+                self.injected += 1
+                return True
+        return False
+
+
+def json_handler(payload, latency=0.0):
+    """GET → the same JSON payload every time, after `latency` seconds."""
+
+    class Handler(_JSONHandler):
+        def do_GET(self):
+            self.server.requests_seen += 1
+            time.sleep(latency)
+            self.send_json(payload)
+
+    return Handler
+
+
+def earn_handler(listings, latency=0.0, limit_param="bountiesLimit", offset_param="skip",
+                 faults: Faults = None):
+    """
+    Earn search stub: GET → {"results": listings[offset:offset + limit]}.
+    `listings` is a list that may be changed between requests.
+    """
+    faults = faults or Faults()
+
+    class Handler(_JSONHandler):
+        def do_GET(self):
+            self.server.requests_seen += 1
+            query = urllib.parse.parse_qs(urllib.parse.urlsplit(self.path).query)
+            limit = int(query.get(limit_param, ["5"])[0])
+            offset = int(query.get(offset_param, ["0"])[0])
+            time.sleep(latency)
+            if faults.fail():
+                self.send_json({"error": "injected"}, status=500)
+                return
+            self.send_json({"results": listings[offset:offset + limit]})
+
+    return Handler
+
+
+def text_handler(body: str, content_type="text/calendar", latency=0.0, faults: Faults = None):
+    """GET → a fixed text body (e.g. an ICS feed), after `latency` seconds."""
+    data = body.encode()
+    faults = faults or Faults()
+
+    class Handler(_JSONHandler):
+        def do_GET(self):
+            self.server.requests_seen += 1
+            time.sleep(latency)
+            if faults.fail():
+                self.send_json({"error": "injected"}, status=500)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    return Handler
+
+
+def llm_handler(base_latency=0.05, per_kchar_latency=0.01, answer="<b>Stub answer</b> ☘️",
+                faults: Faults = None):
+    """
+    Chat-completions stub. Latency grows with prompt size, which is roughly
+    how prompt processing behaves on the real endpoint.
+    """
+    faults = faults or Faults()
+
+    class Handler(_JSONHandler):
+        def do_POST(self):
+            payload = self.read_json()
+            self.server.requests_seen += 1
+            prompt_chars = sum(len(m.get("content", "")) for m in payload.get("messages", []))
+            time.sleep(base_latency + per_kchar_latency * prompt_chars / 1000)
+            if faults.fail():
+                self.send_json({"error": {"message": "injected"}}, status=500)
+                return
+            if payload.get("stream"):
+                self.send_stream(answer)
+                return
+            self.send_json({"choices": [{"message": {"role": "assistant", "content": answer}}]})
+
+        def send_stream(self, text, token_delay=0.01):
+            """Server-sent events, one whitespace-separated token per chunk."""
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            for token in text.split(" "):
+                chunk = {"choices": [{"delta": {"content": token + " "}}]}
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                self.wfile.flush()
+                time.sleep(token_delay)
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.close_connection = True
+
+    return Handler
+
+
+class FakeBotAPI:
+    """
+    Minimal Telegram Bot API: getMe, sendMessage and editMessageText, with
+    flood control (RetryAfter above `rate_limit` msg/s), users who blocked
+    the bot and injected 500s (`faults`), plus long-polling getUpdates fed
+    by push_update() and no-op setWebhook/deleteWebhook/sendChatAction.
+    Use `handler()` with StubServer and point the Bot at `base_url(server)`.
+    """
+
+    def __init__(self, latency=0.0, rate_limit=30.0, blocked=(), retry_after=1, faults: Faults = None):
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.blocked = set(blocked)
+        self.retry_after = retry_after
+        self.sent = []            # (chat_id, text) in arrival order
+        self.rejected_429 = 0
+        self._window = []         # send timestamps within the last second
+        self._lock = threading.Lock()
+        self._message_id = 0
+        self.sent_at = []         # time.monotonic() of each accepted sendMessage
+        self._updates = []        # pending updates for getUpdates
+        self._update_id = 0
+        self._changed = threading.Condition(self._lock)
+        self.edits = 0
+        self.last_write = {}      # chat_id -> time.monotonic() of its latest send/edit
+        self.faults = faults or Faults()
+
+    @staticmethod
+    def base_url(server) -> str:
+        return f"{server.url}/bot"
+
+    def _flood_controlled(self) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            self._window = [t for t in self._window if now - t < 1.0]
+            if len(self._window) >= self.rate_limit:
+                self.rejected_429 += 1
+                return True
+            self._window.append(now)
+            return False
+
+    def push_update(self, update: dict) -> dict:
+        """Queue an update (without update_id) for getUpdates; returns it with one."""
+        with self._changed:
+            self._update_id += 1
+            update = {"update_id": self._update_id, **update}
+            self._updates.append(update)
+            self._changed.notify_all()
+        return update
+
+    def wait_for_sent(self, count: int, timeout: float = 10) -> bool:
+        """Block until `count` messages have been sent in total."""
+        with self._changed:
+            return self._changed.wait_for(lambda: len(self.sent) >= count, timeout=timeout)
+
+    def _get_updates(self, params: dict):
+        offset = int(params.get("offset") or 0)
+        timeout = float(params.get("timeout") or 0)
+        with self._changed:
+            # long polling: answer as soon as something newer than offset exists
+            self._updates = [u for u in self._updates if u["update_id"] >= offset]
+            self._changed.wait_for(lambda: self._updates, timeout=timeout)
+            return list(self._updates)
+
+    def call(self, method: str, params: dict):
+        """Return (http status, Bot API response) for one method call."""
+        if method == "getUpdates":
+            return 200, {"ok": True, "result": self._get_updates(params)}
+        if method in ("setWebhook", "deleteWebhook", "sendChatAction"):
+            return 200, {"ok": True, "result": True}
+        if method in ("sendMessage", "editMessageText") and self.faults.fail():
+            return 500, {"ok": False, "error_code": 500, "description": "Internal Server Error: injected"}
+        if method == "getMe":
+            return 200, {"ok": True, "result": {
+                "id": 1, "is_bot": True, "first_name": "Bench", "username": "BenchBot",
+                "can_join_groups": True, "can_read_all_group_messages": False,
+                "supports_inline_queries": False,
+            }}
+        if method == "sendMessage":
+            chat_id = int(params["chat_id"])
+            if chat_id in self.blocked:
+                return 403, {"ok": False, "error_code": 403,
+                             "description": "Forbidden: bot was blocked by the user"}
+            if self._flood_controlled():
+                return 429, {"ok": False, "error_code": 429,
+                             "description": f"Too Many Requests: retry after {self.retry_after}",
+                             "parameters": {"retry_after": self.retry_after}}
+            with self._changed:
+                self._message_id += 1
+                self.sent.append((chat_id, params.get("text", "")))
+                self.sent_at.append(time.monotonic())
+                self.last_write[chat_id] = self.sent_at[-1]
+                message_id = self._message_id
+                self._changed.notify_all()
+            return 200, {"ok": True, "result": {
+                "message_id": message_id, "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"}, "text": params.get("text", ""),
+            }}
+        if method == "editMessageText":
+            chat_id = int(params["chat_id"])
+            with self._changed:
+                self.edits += 1
+                self.last_write[chat_id] = time.monotonic()
+                self._changed.notify_all()
+            return 200, {"ok": True, "result": {
+                "message_id": int(params["message_id"]), "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"}, "text": params.get("text", ""),
+            }}
+        return 404, {"ok": False, "error_code": 404, "description": "Not Found"}
+
+    def handler(self):
+        api = self
+
+        class Handler(_JSONHandler):
+            def do_POST(self):
+                self.server.requests_seen += 1
+                method = self.path.rstrip("/").rsplit("/", 1)[-1]
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length).decode()
+                if self.headers.get("Content-Type", "").startswith("application/json"):
+                    params = json.loads(body or "{}")
+                else:
+                    params = {k: v[0] for k, v in urllib.parse.parse_qs(body).items()}
+                status, payload = api.call(method, params)
+                time.sleep(api.latency)  # one-way network delay of the response
+                self.send_json(payload, status=status)
+
+        return Handler
+
+
+def percentile(values, pct: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    k = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[k]
@@ -1,6 +1,5 @@
 import logging
 from pathlib import Path
-import json
 import yaml
 from telegram.ext import Application, CommandHandler
 from dotenv import load_dotenv
@@ -8,9 +7,7 @@ import os
 import asyncio
 from telegram.ext import MessageHandler, filters
 load_dotenv()
-from handlers import faq, events, bounties, alerts
-import time
-last_group_reply = {}
+from handlers import faq, events, bounties, alerts, httpclient, jobs, leader, metrics, webhook, updates
 
 # --- Logging ---
 logging.basicConfig(level=logging.INFO)
@@ -18,17 +15,8 @@ logger = logging.getLogger(__name__)
 
 # --- Load config ---
 CONFIG = yaml.safe_load(Path("config.yaml").read_text())
-
-# --- Load DB ---
-DB_FILE = Path("db.json")
-if not DB_FILE.exists():
-    DB_FILE.write_text(json.dumps({"subscribers": [], "seen_bounties": [], "seen_events": []}))
-DB = json.loads(DB_FILE.read_text())
-
-
-def save_db():
-    DB_FILE.write_text(json.dumps(DB, indent=2))
-
+METRICS_CONFIG = CONFIG.get("metrics", {})
+ADMIN_IDS = metrics.admin_ids(CONFIG)
 
 # --- Start & Help ---
 async def start(update, context):
@@ -51,7 +39,9 @@ async def help_cmd(update, context):
         "• /faq `<your question>` → Ask me about Superteam Ireland, events, or programs\n"
         "• /events → See the next 5 upcoming events\n"
         "• /bounties → Check the latest live bounties (with rewards & deadlines)\n"
+        "   e.g. /bounties usdc min=500 days=14 → filter by token, reward, deadline\n"
         "• /subscribe → Get DM alerts when new bounties/events drop\n"
+        "   e.g. /subscribe bounties usdc min=500 → only the alerts you care about\n"
         "• /unsubscribe → Stop alerts anytime\n\n"
         "_Tip: In group chats, just mention me with a question (e.g. Hi `@SuperteamIrelandBot hen’s the next Talent Hub?`) and I’ll reply._"
     )
@@ -62,82 +52,193 @@ async def help_cmd(update, context):
 async def mention_handler(update, context):
     """
     Trigger FAQ when bot is mentioned in a group with a question.
-    Rate limited to avoid spam (1 reply every 10s per group).
+    Replies go through faq.LIMITER (per-group and per-user token buckets);
+    mentions during a group's cooldown are queued and answered together.
     """
     if update.message.chat.type not in ["group", "supergroup"]:
         return
 
-    chat_id = update.message.chat.id
     text = update.message.text or ""
     bot_username = context.bot.username  # already available, no need to call get_me()
 
     if f"@{bot_username}" not in text:
         return
 
-    # --- Rate limiting ---
-    now = time.time()
-    last_time = last_group_reply.get(chat_id, 0)
-    if now - last_time < 10:  # 10-second cooldown
-        logger.info(f"Rate limit hit in chat {chat_id}, ignoring mention.")
-        return
-    last_group_reply[chat_id] = now
-
     # Clean the mention from the text
-    question = text.replace(f"@{bot_username}", "").strip()
+    question = " ".join(text.replace(f"@{bot_username}", "").split())
 
     if not question:
-        await update.message.reply_text(
-            f"👋 You mentioned me! Try asking a question, e.g.: '@{bot_username} How do I join Superteam?'"
-        )
+        user = update.effective_user
+        await faq.LIMITER.submit(update.message.chat.id, user.id if user else None, update, mention_nudge)
         return
 
     # Forward to FAQ
-    context.args = question.split()
-    await faq.faq(update, context)
+    await faq.ask(update, question)
 
-# --- Main ---
-def main():
-    app = Application.builder().token(os.getenv("TELEGRAM_TOKEN")).build()
+
+async def mention_nudge(updates):
+    bot_username = updates[-1].get_bot().username
+    await updates[-1].message.reply_text(
+        f"👋 You mentioned me! Try asking a question, e.g.: '@{bot_username} How do I join Superteam?'"
+    )
+
+# --- Admin: /stats ---
+async def stats_cmd(update, context):
+    """Latency/error summary for admins (metrics.admin_ids or $ADMIN_IDS)."""
+    user = update.effective_user
+    if not user or user.id not in ADMIN_IDS:
+        return
+
+    lines = [metrics.summary(), ""]
+    processor = context.application.update_processor
+    if hasattr(processor, "stats"):
+        for lane, s in processor.stats().items():
+            if isinstance(s, dict):
+                lines.append(
+                    f"Lane {lane}: {s['running']} running, {s['waiting']} waiting, "
+                    f"wait p95 {s['wait_p95_ms']:.0f} ms"
+                )
+    elector = context.application.bot_data.get("leader")
+    if elector:
+        s = elector.stats()
+        lines.append(
+            f"Leader: {'this instance' if s['is_leader'] else s['leader'] or 'none'} "
+            f"(lease {s['lease_expires_in']}s left, {s['elections']} elections here)"
+        )
+    lines.append(f"Reply limiter: {faq.LIMITER.stats()}")
+    lines.append(f"Answer cache: {faq.ANSWER_CACHE.stats()}")
+    await update.message.reply_text("\n".join(lines)[:4000])
+
+
+# --- Lifecycle hooks ---
+async def on_startup(app):
+    await httpclient.startup()
+    schedule = CONFIG.get("schedule", {})
+    tz = jobs.load_timezone(schedule.get("timezone", "Europe/Dublin"))
+    group_chat_id = int(CONFIG.get("broadcasts", {}).get("group_chat_id", -1002937891185))
+
+    scheduler = jobs.JobScheduler(tz, misfire_grace=schedule.get("misfire_grace_seconds", 600))
+    scheduler.add_job(
+        "check_feeds",
+        alerts.check_feeds,
+        jobs.IntervalTrigger(
+            schedule.get("bounty_check_minutes", 10) * 60,
+            jitter=schedule.get("jitter_seconds", 30),
+        ),
+    )
+    # daily digest for fixed group ("HH:MM" or a cron expression),
+    # fetched and rendered ahead of time so it goes out on the minute
+    digest_trigger = jobs.cron_trigger(schedule.get("digest_time", "08:00"), tz)
+    lead = schedule.get("digest_lead_seconds", 300)
+    scheduler.add_job(
+        "stage_digest",
+        lambda: alerts.stage_digest(tz, lead),
+        jobs.LeadTrigger(digest_trigger, lead),
+    )
+    scheduler.add_job(
+        "morning_digest",
+        lambda: alerts.scheduled_digest(app.bot, group_chat_id, tz),
+        digest_trigger,
+    )
+
+    # Polling mode has no HTTP server of its own, so /metrics gets a small one
+    if app.bot_data.get("serve_metrics"):
+        server = metrics.MetricsServer(METRICS_CONFIG.get("path", "/metrics"), os.getenv("METRICS_TOKEN", ""))
+        await server.start(METRICS_CONFIG.get("listen", "127.0.0.1"), METRICS_CONFIG.get("port", 9090))
+        app.bot_data["metrics_server"] = server
+
+    async def background():
+        await asyncio.gather(
+            jobs.supervise("scheduler", scheduler.run),
+            jobs.supervise("outbox", lambda: alerts.outbox_worker(app.bot)),
+        )
+
+    # Every replica answers updates; scheduled work and alert delivery run
+    # only on the one holding the leader lease (see handlers.leader)
+    elector = leader.elector_from(CONFIG)
+    if elector:
+        app.bot_data["leader"] = elector
+        metrics.REGISTRY.add_collector("leader", elector.collect)
+        work = jobs.supervise("leader", lambda: elector.lead(background))
+    else:
+        work = background()
+    # Keep a reference so the task isn't garbage-collected mid-run
+    app.bot_data["background_tasks"] = [asyncio.create_task(work)]
+
+
+async def on_shutdown(app):
+    for task in app.bot_data.get("background_tasks", []):
+        task.cancel()
+    await asyncio.gather(*app.bot_data.get("background_tasks", []), return_exceptions=True)
+    if app.bot_data.get("metrics_server"):
+        await app.bot_data["metrics_server"].stop()
+    await httpclient.aclose()
+    if app.bot_data.get("leader"):
+        app.bot_data["leader"].lease.close()
+    alerts.STORE.close()
+
+
+# --- Application ---
+def command(name: str, callback) -> CommandHandler:
+    """CommandHandler whose callback is timed by handlers.metrics."""
+    return CommandHandler(name, metrics.instrument(f"/{name}", callback))
+
+
+def build_application(token: str, base_url: str = None) -> Application:
+    """All handlers and hooks; base_url points the bot at another Bot API server."""
+    # Updates run concurrently (in order within each chat), with LLM-backed
+    # ones in their own lane; see the updates section of config.yaml
+    processor = updates.processor_from(CONFIG)
+    builder = (
+        Application.builder()
+        .token(token)
+        .concurrent_updates(processor)
+        .request(metrics.BotAPIRequest(connection_pool_size=256))  # per-method Bot API latency
+    )
+    if base_url:
+        builder = builder.base_url(base_url)
+    app = builder.build()
 
     # Core commands
-    app.add_handler(CommandHandler("start", start))
-    app.add_handler(CommandHandler("help", help_cmd))
-    app.add_handler(CommandHandler("faq", faq.faq))
-    app.add_handler(CommandHandler("events", events.events))
-    app.add_handler(CommandHandler("bounties", bounties.bounties))
-    app.add_handler(CommandHandler("subscribe", alerts.subscribe))
-    app.add_handler(CommandHandler("unsubscribe", alerts.unsubscribe))
+    app.add_handler(command("start", start))
+    app.add_handler(command("help", help_cmd))
+    app.add_handler(command("faq", faq.faq))
+    app.add_handler(command("events", events.events))
+    app.add_handler(command("bounties", bounties.bounties))
+    app.add_handler(command("subscribe", alerts.subscribe))
+    app.add_handler(command("unsubscribe", alerts.unsubscribe))
+    app.add_handler(command("stats", stats_cmd))
     # app.add_handler(CommandHandler("testalert", alerts.testalert))
     # app.add_handler(CommandHandler("digestnow", alerts.digestnow))
 
     # Group mention handler
-    app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, mention_handler))
-
-    # Startup hook
-    async def on_startup(app):
-        asyncio.create_task(
-            alerts.scheduler(
-                app.bot,
-                interval_minutes=CONFIG.get("schedule", {}).get("bounty_check_minutes", 10)
-            )
-        )
-    # daily digest for fixed group
-        group_chat_id = int(CONFIG.get("group_chat_id", -1002937891185))  # replace with your group id
-        asyncio.create_task(
-            alerts.digest_loop(
-                app.bot,
-                digest_time_str="08:00",   # 8 AM
-                tz_name="Europe/Dublin",
-                group_chat_id=group_chat_id
-            )
-        )
+    app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, metrics.instrument("mention", mention_handler)))
+
+    # queued /faq replies keep the chat's order and the LLM lane's limit
+    faq.LIMITER.dispatch = lambda chat_id, reply: processor.run_in_chat(chat_id, updates.LLM_LANE, reply)
+    metrics.REGISTRY.add_collector("updates", processor.collect)
+    metrics.REGISTRY.add_collector("reply_limiter", faq.LIMITER.collect)
 
     app.post_init = on_startup
+    app.post_shutdown = on_shutdown
+    return app
+
+
+# --- Main ---
+def main():
+    app = build_application(os.getenv("TELEGRAM_TOKEN"))
+
+    # Webhook mode (config webhook.enabled or BOT_MODE=webhook) for hosted
+    # deployments; long polling stays the default for local use.
+    settings = webhook.settings_from(CONFIG)
+    if settings.get("enabled"):
+        asyncio.run(webhook.run(app, settings))
+        return
 
+    app.bot_data["serve_metrics"] = METRICS_CONFIG.get("enabled", True)
     logger.info("Bot started in polling mode…")
-    app.run_polling()   # <--- switched to polling
+    app.run_polling()
 
 
 if __name__ == "__main__":
     main()
-
@@ -1,75 +1,121 @@
 import logging
 import asyncio
 from pathlib import Path
-import json
-from datetime import datetime
+from datetime import datetime, timedelta
 from zoneinfo import ZoneInfo
 import os
-import httpx
+import yaml
 from telegram import Bot
 
-from handlers import bounties, events
+from handlers import bounties, events, httpclient, outbox, seenindex, singleflight, storage, subscriptions
 
 logger = logging.getLogger(__name__)
 
-# --- DB setup ---
-DB_FILE = Path("db.json")
-if not DB_FILE.exists():
-    DB_FILE.write_text(json.dumps({
-        "subscribers": [],
-        "seen_bounties": [],
-        "seen_events": [],
-        "last_digest_date": None
-    }))
+# Load config
+CONFIG = yaml.safe_load(Path("config.yaml").read_text())
 
-DB = json.loads(DB_FILE.read_text())
+# --- Storage (SQLite by default, db.json for local development) ---
+STORE = storage.open_storage(CONFIG)
 
-
-def save_db():
-    DB_FILE.write_text(json.dumps(DB, indent=2))
+# Who wants which alerts, inverted by topic/token (kept in step with STORE)
+SUBSCRIPTIONS = subscriptions.SubscriptionIndex.from_stored(STORE.subscriber_filters())
 
 
 # --- Subscribe / Unsubscribe ---
 async def subscribe(update, context):
+    """/subscribe [bounties|events|all] [token] [min=amount]"""
     user_id = update.message.from_user.id
-    if user_id not in DB["subscribers"]:
-        DB["subscribers"].append(user_id)
-        save_db()
-        await update.message.reply_text("✅ You have subscribed to alerts!")
+    try:
+        filters = subscriptions.parse_filters(context.args or [])
+    except ValueError:
+        await update.message.reply_text(subscriptions.USAGE)
+        return
+
+    # STORE, not SUBSCRIPTIONS: another replica may have taken their /subscribe
+    if STORE.add_subscriber(user_id, filters.to_stored()):
+        text = f"✅ You have subscribed to alerts for {filters.describe()}!"
     else:
-        await update.message.reply_text("ℹ️ You are already subscribed.")
+        current = subscriptions.Filters.from_stored(STORE.get_subscriber_filters(user_id))
+        if not context.args or filters == current:
+            SUBSCRIPTIONS.add(user_id, current)
+            await update.message.reply_text(f"ℹ️ You are already subscribed to {current.describe()}.")
+            return
+        STORE.set_subscriber_filters(user_id, filters.to_stored())
+        text = f"✅ Alerts updated: you'll get {filters.describe()}."
+    SUBSCRIPTIONS.add(user_id, filters)
+    await update.message.reply_text(text)
 
 
 async def unsubscribe(update, context):
     user_id = update.message.from_user.id
-    if user_id in DB["subscribers"]:
-        DB["subscribers"].remove(user_id)
-        save_db()
+    SUBSCRIPTIONS.remove(user_id)
+    if STORE.remove_subscriber(user_id):
         await update.message.reply_text("❌ You have unsubscribed from alerts.")
     else:
         await update.message.reply_text("ℹ️ You are not subscribed.")
 
 
 # --- Alert sending ---
-async def send_alert(bot: Bot, message: str):
-    for user_id in DB["subscribers"]:
-        try:
-            await bot.send_message(chat_id=user_id, text=message, parse_mode="Markdown")
-        except Exception as e:
-            logger.warning(f"Failed to send alert to {user_id}: {e}")
+def sync_subscriptions():
+    """Reload SUBSCRIPTIONS from STORE: other replicas may have taken /subscribe."""
+    global SUBSCRIPTIONS
+    SUBSCRIPTIONS = subscriptions.SubscriptionIndex.from_stored(STORE.subscriber_filters())
+
+
+def _prune_subscriber(user_id):
+    """Drop a user who blocked the bot or deleted their account."""
+    SUBSCRIPTIONS.remove(user_id)
+    STORE.remove_subscriber(user_id)
+
+
+# Every (alert, subscriber) pair is journaled here before anything is sent,
+# so a crash or redeploy mid-broadcast resumes instead of dropping users.
+OUTBOX_CONFIG = CONFIG.get("outbox", {})
+OUTBOX = outbox.Outbox(
+    Path(OUTBOX_CONFIG.get("path", "outbox.jsonl")),
+    batch_size=OUTBOX_CONFIG.get("batch_size", 200),
+    max_attempts=OUTBOX_CONFIG.get("max_attempts", 8),
+    base_backoff=OUTBOX_CONFIG.get("base_backoff_seconds", 5),
+    max_backoff=OUTBOX_CONFIG.get("max_backoff_seconds", 900),
+)
+
+
+def send_alert(message: str, topic: str, token: str = None, reward: float = None) -> str:
+    """Queue an alert for the subscribers whose filters match; the outbox worker delivers it."""
+    recipients = SUBSCRIPTIONS.recipients(topic, token, reward)
+    logger.info(f"{topic} alert for {len(recipients)}/{len(SUBSCRIPTIONS)} subscribers")
+    return OUTBOX.enqueue(message, recipients, parse_mode="Markdown")
+
+
+async def outbox_worker(bot: Bot):
+    """Deliver queued alerts (and resume unfinished ones after a restart)."""
+    await OUTBOX.run(bot, on_forbidden=_prune_subscriber)
 
 
 # --- OpenAI opener (daily quotes) ---
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
+
+HASHTAGS = "#solana #web3 #community #smallcountrybigatheart #superteamireland"
+DEFAULT_OPENER = f"“Builders write history in code, not in headlines.” ☘️\n{HASHTAGS}"
+
 
 async def generate_opener():
+    """Today's opener; on failure the last good one (kept in STORE), then a canned quote."""
     if not OPENAI_API_KEY:
-        return (
-            "“Builders write history in code, not in headlines.” ☘️\n"
-            "#solana #web3 #community #smallcountrybigatheart #superteamireland"
-        )
+        return DEFAULT_OPENER
+    try:
+        # Manual /digestnow and the scheduled digest can overlap; share one call
+        text = await singleflight.LLM.do("opener", _request_opener)
+    except Exception as e:
+        logger.warning(f"OpenAI opener failed: {e}")
+        return STORE.get_meta("last_opener") or f"“When markets dip, true builders rise.” ☘️\n{HASHTAGS}"
+    STORE.set_meta("last_opener", text)
+    return text
 
+
+async def _request_opener():
     system_msg = (
         "You are an inspirational Irish storyteller speaking to a Web3 builder community."
     )
@@ -77,108 +123,177 @@ async def generate_opener():
         "Generate ONE short motivational quote (not a casual greeting), around 25 words, "
         "about crypto, builders, or community spirit. Make it sound like a proverb or wise saying, "
         "with a subtle Irish touch (not cheesy). At the end, put these hashtags on a NEW LINE:\n"
-        "#solana #web3 #community #smallcountrybigatheart #superteamireland"
+        f"{HASHTAGS}"
     )
 
-    try:
-        async with httpx.AsyncClient(timeout=10) as client:
-            resp = await client.post(
-                "https://api.openai.com/v1/chat/completions",
-                headers={
-                    "Authorization": f"Bearer {OPENAI_API_KEY}",
-                    "Content-Type": "application/json",
-                },
-                json={
-                    "model": OPENAI_MODEL,
-                    "messages": [
-                        {"role": "system", "content": system_msg},
-                        {"role": "user", "content": user_msg},
-                    ],
-                    "temperature": 0.6,
-                    "max_tokens": 120,
-                },
-            )
-            resp.raise_for_status()
-            data = resp.json()
-            text = data["choices"][0]["message"]["content"].strip()
-            # Safety: ensure hashtags at the end
-            if "#solana" not in text:
-                text += "\n#solana #web3 #community #smallcountrybigatheart #superteamireland"
-            return text
-    except Exception as e:
-        logger.warning(f"OpenAI opener failed: {e}")
-        return (
-            "“When markets dip, true builders rise.” ☘️\n"
-            "#solana #web3 #community #smallcountrybigatheart #superteamireland"
-        )
+    client = httpclient.get_client(OPENAI_BASE_URL)
+    resp = await client.post(
+        f"{OPENAI_BASE_URL}/chat/completions",
+        headers={
+            "Authorization": f"Bearer {OPENAI_API_KEY}",
+            "Content-Type": "application/json",
+        },
+        json={
+            "model": OPENAI_MODEL,
+            "messages": [
+                {"role": "system", "content": system_msg},
+                {"role": "user", "content": user_msg},
+            ],
+            "temperature": 0.6,
+            "max_tokens": 120,
+        },
+        timeout=10,
+    )
+    resp.raise_for_status()
+    data = resp.json()
+    text = data["choices"][0]["message"]["content"].strip()
+    # Safety: ensure hashtags at the end
+    if "#solana" not in text:
+        text += f"\n{HASHTAGS}"
+    return text
+
+
+# Events cache version / bounty index revision last diffed; unchanged means
+# the poll was a 304 (or failed) and there is nothing new to look for.
+_CHECKED_VERSIONS = {}
+
+
+# Seen keys are content hashes of the Earn slug / ICS UID and expire a while
+# after the deadline or event date, so the index stays small.
+SEEN_CONFIG = CONFIG.get("seen", {})
+
+
+def _seen_expiry(date_str):
+    return seenindex.expiry_for(
+        date_str,
+        SEEN_CONFIG.get("retention_days", 30),
+        SEEN_CONFIG.get("undated_retention_days", 180),
+    )
+
+
+def _is_new(kind: str, key: str, legacy_key: str) -> bool:
+    # legacy_key: the old title_date format, so upgrading doesn't re-alert
+    return not STORE.has_seen(kind, key) and not STORE.has_seen(kind, legacy_key)
 
 
 # --- Bounty alerts ---
-async def check_bounties(bot: Bot):
-    current_bounties = bounties.fetch_bounties()
+async def check_bounties():
+    await bounties.refresh_bounties()
+    index = bounties.INDEX
+    last_revision = _CHECKED_VERSIONS.get("bounties", 0)
+    if last_revision == index.revision:
+        return
+    _CHECKED_VERSIONS["bounties"] = index.revision
+
+    entries = {}
+    for b in index.listings():
+        entries[seenindex.stable_key("bounties", b.slug or b.title)] = _seen_expiry(b.deadline)
+
+    # Only listings the index gained since the last check can be new
     new_bounties = []
-
-    for b in current_bounties:
-        key = f"{b['title']}_{b['deadline']}"
-        if key not in DB["seen_bounties"]:
-            DB["seen_bounties"].append(key)
+    for b in index.added_since(last_revision):
+        key = seenindex.stable_key("bounties", b.slug or b.title)
+        if _is_new("bounties", key, f"{b.title}_{b.deadline}"):
             new_bounties.append(b)
 
+    if not STORE.get_meta("earn_paged_ingestion"):
+        # Before paging only the top 5 were tracked: take the rest of the
+        # already-open listings as seen instead of alerting on all of them.
+        logger.info(f"Earn paging enabled: marking {len(new_bounties)} open listings as seen")
+        new_bounties = []
+        STORE.set_meta("earn_paged_ingestion", True)
+
+    # Queue the alerts durably first, then mark the items as seen
     if new_bounties:
-        save_db()
-        for b in new_bounties:
-            deadline_str = b["deadline"] if b["deadline"] else "N/A"
-            message = (
-                f"🏆 *New Bounty!*\n\n"
-                f"*{b['title']}*\n"
-                f"💰 Reward: {b['reward']}\n"
-                f"⏳ Deadline: {deadline_str}\n"
-                f"🔗 {b['link']}"
-            )
-            await send_alert(bot, message)
+        sync_subscriptions()
+    for b in new_bounties:
+        deadline_str = b.deadline if b.deadline else "N/A"
+        message = (
+            f"🏆 *New Bounty!*\n\n"
+            f"*{b.title}*\n"
+            f"💰 Reward: {b.reward}\n"
+            f"⏳ Deadline: {deadline_str}\n"
+            f"🔗 {b.link}"
+        )
+        send_alert(message, "bounties", token=b.token, reward=b.reward_amount)
+
+    # Marks new items and keeps still-listed ones from expiring
+    STORE.mark_seen("bounties", entries)
+    STORE.prune_seen()
 
 
 # --- Event alerts ---
-async def check_events(bot: Bot):
-    current_events = events.fetch_events()
+async def check_events():
+    current_events = await events.refresh_events()
+    version = events.EVENTS_CACHE.version
+    if _CHECKED_VERSIONS.get("events") == version:
+        return
+    _CHECKED_VERSIONS["events"] = version
     new_events = []
+    entries = {}
 
     for e in current_events:
-        key = f"{e['title']}_{e['date']}"
-        if key not in DB["seen_events"]:
-            DB["seen_events"].append(key)
+        if not e["date"]:
+            continue  # "No upcoming events" / fetch error placeholders
+        key = seenindex.stable_key("events", e.get("uid") or f"{e['title']}_{e['date']}")
+        entries[key] = _seen_expiry(e["date"])
+        if _is_new("events", key, f"{e['title']}_{e['date']}"):
             new_events.append(e)
 
+    # Queue the alerts durably first, then mark the items as seen
     if new_events:
-        save_db()
-        for e in new_events:
-            message = (
-                f"📌 *New Event!*\n\n"
-                f"*{e['title']}*\n"
-                f"📅 {e['date']}\n"
-                f"🔗 {e['link']}"
-            )
-            await send_alert(bot, message)
+        sync_subscriptions()
+    for e in new_events:
+        message = (
+            f"📌 *New Event!*\n\n"
+            f"*{e['title']}*\n"
+            f"📅 {e['date']}\n"
+            f"🔗 {e['link']}"
+        )
+        send_alert(message, "events")
+
+    STORE.mark_seen("events", entries)
+    STORE.prune_seen()
 
 
-# --- Scheduler ---
-async def scheduler(bot: Bot, interval_minutes=10):
-    """Run periodic checks for new bounties and events."""
-    while True:
-        try:
-            await check_bounties(bot)
-            await check_events(bot)
-        except Exception as e:
-            logger.error(f"Error in scheduler: {e}")
-        await asyncio.sleep(interval_minutes * 60)
+# --- Scheduled jobs (run by handlers.jobs.JobScheduler) ---
+async def check_feeds():
+    """Periodic check for new bounties and events."""
+    await check_bounties()
+    await check_events()
+    for url, stats in httpclient.POLL_STATS.items():
+        logger.debug(f"Feed {url}: {stats['not_modified']}/{stats['polls']} polls not modified")
 
 
 # --- Morning Digest ---
-async def send_morning_digest(bot: Bot, group_chat_id: int):
-    opener = await generate_opener()
-    evts = events.fetch_events() or []
-    btys = bounties.fetch_bounties() or []
+# The digest is fetched and rendered `digest_lead_seconds` before it is due,
+# so at the scheduled time only send_message is left to do.
+SCHEDULE_CONFIG = CONFIG.get("schedule", {})
+DIGEST_FETCH_TIMEOUT = SCHEDULE_CONFIG.get("digest_fetch_timeout_seconds", 20)
+
+_STAGED_DIGEST = {}  # local date (ISO) → rendered digest text
+
+
+async def _latest_feed(refresh, cache):
+    """Freshly fetched feed items, or the cache's last good value if that fails."""
+    try:
+        return await asyncio.wait_for(refresh(), timeout=DIGEST_FETCH_TIMEOUT) or []
+    except Exception as e:
+        logger.warning(f"Digest: {cache.name} refresh failed ({e!r}), using last good value")
+        return cache.value or []
+
 
+async def prepare_digest() -> str:
+    """Fetch the opener, events and bounties in parallel and render the digest."""
+    opener, evts, btys = await asyncio.gather(
+        generate_opener(),
+        _latest_feed(events.refresh_events, events.EVENTS_CACHE),
+        _latest_feed(bounties.refresh_bounties, bounties.BOUNTIES_CACHE),
+    )
+    return render_digest(opener, evts, btys)
+
+
+def render_digest(opener: str, evts, btys) -> str:
     parts = [f"{opener}\n\n*Superteam Ireland — Daily Brief*"]
 
     if evts:
@@ -191,18 +306,20 @@ async def send_morning_digest(bot: Bot, group_chat_id: int):
     if btys:
         parts.append("\n— *Open Bounties* —")
         for b in btys[:5]:
-            deadline_str = b["deadline"] if b["deadline"] else "N/A"
+            deadline_str = b.deadline if b.deadline else "N/A"
             parts.append(
-                f"🏆 *{b['title']}*\n"
-                f"💰 {b['reward']}\n"
+                f"🏆 *{b.title}*\n"
+                f"💰 {b.reward}\n"
                 f"⏳ {deadline_str}\n"
-                f"🔗 {b['link']}"
+                f"🔗 {b.link}"
             )
     else:
         parts.append("\nNo open bounties right now. Check back later!")
 
-    text = "\n\n".join(parts)
+    return "\n\n".join(parts)
 
+
+async def _send_digest(bot: Bot, group_chat_id: int, text: str):
     try:
         await bot.send_message(
             chat_id=group_chat_id,
@@ -214,26 +331,32 @@ async def send_morning_digest(bot: Bot, group_chat_id: int):
         logger.warning(f"Failed to send digest to group {group_chat_id}: {e}")
 
 
-async def digest_loop(bot: Bot, digest_time_str: str, tz_name: str, group_chat_id: int):
-    """Send a daily digest at the configured time."""
-    try:
-        tz = ZoneInfo(tz_name)
-    except Exception:
-        tz = ZoneInfo("Europe/Dublin")
-
-    while True:
-        now = datetime.now(tz)
-        target_h, target_m = map(int, digest_time_str.split(":"))
-        last = DB.get("last_digest_date")
-
-        if now.hour == target_h and now.minute == target_m and (last != now.date().isoformat()):
-            logger.info("Sending morning digest…")
-            await send_morning_digest(bot, group_chat_id)
-            DB["last_digest_date"] = now.date().isoformat()
-            save_db()
-            await asyncio.sleep(90)
-        else:
-            await asyncio.sleep(30)
+async def send_morning_digest(bot: Bot, group_chat_id: int):
+    await _send_digest(bot, group_chat_id, await prepare_digest())
+
+
+async def stage_digest(tz: ZoneInfo, lead_seconds: float):
+    """Job that runs `lead_seconds` ahead of the digest and renders it."""
+    day = (datetime.now(tz) + timedelta(seconds=lead_seconds)).date().isoformat()
+    text = await prepare_digest()
+    _STAGED_DIGEST.clear()
+    _STAGED_DIGEST[day] = text
+    logger.info(f"Morning digest for {day} staged")
+
+
+async def scheduled_digest(bot: Bot, group_chat_id: int, tz: ZoneInfo):
+    """Daily digest job; at most once per local date, even across restarts."""
+    today = datetime.now(tz).date().isoformat()
+    if STORE.get_meta("last_digest_date") == today:
+        logger.info("Morning digest already sent today, skipping")
+        return
+    text = _STAGED_DIGEST.pop(today, None)
+    if text is None:
+        logger.warning("Morning digest was not staged ahead of time, preparing it now")
+        text = await prepare_digest()
+    logger.info("Sending morning digest…")
+    await _send_digest(bot, group_chat_id, text)
+    STORE.set_meta("last_digest_date", today)
 
 
 # # --- Digest Now (manual trigger) ---
@@ -0,0 +1,102 @@
+import json
+import logging
+import os
+import re
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+from handlers import retrieval
+
+logger = logging.getLogger(__name__)
+
+_NON_WORD = re.compile(r"[^\w\s]+")
+_NOT = re.compile(r"n['’]t\b")  # "don't" → "do not"
+_CLITIC = re.compile(r"['’](?:s|re|ve|ll|d|m)\b")  # "what's" → "what"
+
+# Retrieval can ignore question words, but a cache key must not: "when is
+# the next meetup" and "where is the next meetup" need different answers.
+_INTERROGATIVES = frozenset(("how", "what", "when", "where", "which", "who", "whom", "whose", "why"))
+_NEGATIONS = frozenset(("no", "not", "nor", "never", "cannot", "without"))
+CACHE_STOPWORDS = retrieval.STOPWORDS - _INTERROGATIVES - _NEGATIONS
+
+
+def normalize_question(question: str) -> str:
+    """
+    Canonical form used as cache key: case, punctuation, whitespace and
+    filler words are ignored ("How do I join?" == "how   to JOIN"), question
+    words and negations are kept.
+    """
+    text = _CLITIC.sub("", _NOT.sub(" not", question.lower()))
+    words = _NON_WORD.sub(" ", text).split()
+    return " ".join(w for w in words if w not in CACHE_STOPWORDS)
+
+
+class AnswerCache:
+    """
+    LRU of FAQ answers with a size cap and TTL, optionally persisted to a JSON
+    file so it survives restarts. Keys should include the KB version so
+    answers are dropped automatically when the FAQ pages change.
+    """
+
+    def __init__(self, max_size: int = 512, ttl_seconds: float = 86400, path: str = ""):
+        self.max_size = max_size
+        self.ttl = ttl_seconds
+        self.path = Path(path) if path else None
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key → (stored_at, answer), oldest first
+        self._load()
+
+    def get(self, key: str):
+        entry = self._entries.get(key)
+        if entry is None or time.time() - entry[0] > self.ttl:
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key: str, answer: str):
+        self._entries[key] = (time.time(), answer)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+        self._save()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+        }
+
+    # --- persistence ---
+    def _load(self):
+        if not self.path or not self.path.exists():
+            return
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable answer cache {self.path}: {e}")
+            return
+        now = time.time()
+        for key, (stored_at, answer) in data.items():
+            if now - stored_at <= self.ttl:
+                self._entries[key] = (stored_at, answer)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def _save(self):
+        if not self.path:
+            return
+        try:
+            tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+            tmp.write_text(json.dumps(dict(self._entries)), encoding="utf-8")
+            os.replace(tmp, self.path)
+        except Exception as e:
+            logger.warning(f"Could not persist answer cache: {e}")
@@ -1,71 +1,181 @@
+import asyncio
 import logging
-import requests
+import httpx
 from pathlib import Path
 import yaml
 
+from handlers import feedcache, httpclient, listings
+
 logger = logging.getLogger(__name__)
 
 # Load config
 CONFIG = yaml.safe_load(Path("config.yaml").read_text())
 
 
-def fetch_bounties():
-    """Fetch open bounties as dicts for handler + alerts."""
+BOUNTIES_CONFIG = CONFIG.get("bounties", {})
+
+# Every open listing, kept across refreshes; alerts diff against it and
+# /bounties filters it in memory.
+INDEX = listings.ListingIndex()
+
+
+def parse_bounties(data):
+    """Turn one page of an Earn search payload into Listing records."""
+    parsed = (listings.parse_listing(item) for item in data.get("results", []))
+    return [listing for listing in parsed if listing is not None]
+
+
+def page_url(url: str, page: int) -> str:
+    """The feed URL with its limit/offset query parameters set for `page`."""
+    page_size = BOUNTIES_CONFIG.get("page_size", 50)
+    return str(
+        httpx.URL(url)
+        .copy_set_param(BOUNTIES_CONFIG.get("limit_param", "bountiesLimit"), page_size)
+        .copy_set_param(BOUNTIES_CONFIG.get("offset_param", "skip"), page * page_size)
+    )
+
+
+async def _fetch_page(url: str, page: int):
+    target = page_url(url, page)
+    r = await httpclient.get_client(target).get(target, timeout=10)
+    r.raise_for_status()
+    return parse_bounties(r.json())
+
+
+async def load_bounties():
+    """Page through the Earn listings and refresh INDEX; raises on failure."""
     url = CONFIG["feeds"]["bounties"]
+    page_size = BOUNTIES_CONFIG.get("page_size", 50)
+    max_pages = BOUNTIES_CONFIG.get("max_pages", 10)
+    concurrency = BOUNTIES_CONFIG.get("concurrency", 3)
+
+    # New listings show up on the first page, so a 304 there means no change
+    first = page_url(url, 0)
+    r = await httpclient.conditional_get(first, use_validators=BOUNTIES_CACHE.value is not None)
+    if r is None:
+        return feedcache.NOT_MODIFIED
+    pages = [parse_bounties(r.json())]
+    seen = {listing.slug or listing.title for listing in pages[0]}
+
+    # Then the following pages, `concurrency` at a time, until a short page
+    # or one with nothing new (a feed that ignores the offset repeats itself)
+    next_page = 1
+    more = len(pages[0]) >= page_size
+    while more and next_page < max_pages:
+        batch = range(next_page, min(next_page + concurrency, max_pages))
+        for page in await asyncio.gather(*(_fetch_page(url, p) for p in batch)):
+            keys = {listing.slug or listing.title for listing in page}
+            if not keys - seen:
+                more = False
+                break
+            seen |= keys
+            pages.append(page)
+            if len(page) < page_size:
+                more = False
+                break
+        next_page = batch.stop
+
+    diff = INDEX.update(listing for page in pages for listing in page)
+    logger.info(
+        f"Earn: {len(INDEX)} listings from {len(pages)} pages "
+        f"(+{len(diff['added'])} ~{len(diff['changed'])} -{len(diff['removed'])})"
+    )
+    httpclient.store_validators(first, r)
+    return INDEX.listings()
+
+
+# Shared by /bounties, the alert scheduler and the morning digest
+BOUNTIES_CACHE = feedcache.FeedCache(
+    "bounties",
+    load_bounties,
+    ttl_seconds=CONFIG.get("cache", {}).get("feed_ttl_seconds", 300),
+)
+
+
+async def get_bounties():
+    """Cached open bounties (stale-while-revalidate)."""
     try:
-        r = requests.get(url, timeout=10)
-        r.raise_for_status()
-        data = r.json()
-        results = data.get("results", [])
-        if not results:
-            return []
-
-        bounties = []
-        for bounty in results[:5]:
-            title = bounty.get("title", "No title")
-            reward_amount = bounty.get("rewardAmount")
-            token = bounty.get("token", "")
-            reward = f"{reward_amount} {token}" if reward_amount else "N/A"
-
-            # Handle deadline safely
-            deadline_raw = bounty.get("deadline")
-            deadline = deadline_raw[:10] if isinstance(deadline_raw, str) else None
-
-            # Build proper link from slug
-            slug = bounty.get("slug", "")
-            link = f"https://earn.superteam.fun/listing/{slug}" if slug else "#"
-
-            bounties.append({
-                "title": title,
-                "reward": reward,
-                "deadline": deadline,
-                "link": link
-            })
-        return bounties
+        return await BOUNTIES_CACHE.get()
+    except Exception:
+        return []
+
 
+async def refresh_bounties():
+    """Force a (coalesced) refresh, e.g. from the scheduler."""
+    try:
+        return await BOUNTIES_CACHE.refresh()
+    except Exception:
+        return []
+
+
+def fetch_bounties():
+    """Blocking first-page fetch for scripts; the bot uses get_bounties()."""
+    url = page_url(CONFIG["feeds"]["bounties"], 0)
+    try:
+        r = httpx.get(url, timeout=10, follow_redirects=True)
+        r.raise_for_status()
+        return parse_bounties(r.json())
     except Exception as e:
         logger.error(f"Error fetching bounties: {e}")
         return []
 
 
 # --- Telegram handler ---
+USAGE = (
+    "Usage: /bounties [token] [min=amount] [max=amount] [days=n]\n"
+    "e.g. /bounties usdc min=500 days=14"
+)
+
+
+def parse_filters(args) -> dict:
+    """`usdc min=500 max=2000 days=7` → ListingIndex.filter keyword arguments."""
+    filters = {}
+    for arg in args:
+        key, sep, value = arg.partition("=")
+        key = key.lower()
+        if not sep:
+            filters["token"] = arg
+        elif key == "token":
+            filters["token"] = value
+        elif key in ("min", "max"):
+            filters[f"{key}_reward"] = float(value)
+        elif key == "days":
+            filters["due_within_days"] = int(value)
+        else:
+            raise ValueError(f"Unknown filter {arg!r}")
+    return filters
+
+
 async def bounties(update, context):
     """
-    Telegram command handler for /bounties
+    Telegram command handler for /bounties (optionally filtered, from memory)
     """
-    bounty_list = fetch_bounties()
+    try:
+        filters = parse_filters(context.args or [])
+    except ValueError:
+        await update.message.reply_text(USAGE)
+        return
+
+    bounty_list = await get_bounties()  # refreshes INDEX when stale
+    if filters:
+        bounty_list = INDEX.filter(**filters)
     if not bounty_list:
-        await update.message.reply_text("No open bounties found.")
+        await update.message.reply_text(
+            "No open bounties match those filters." if filters else "No open bounties found."
+        )
         return
 
+    shown = BOUNTIES_CONFIG.get("show", 5)
     text = ""
-    for b in bounty_list:
-        deadline_str = b["deadline"] if b["deadline"] else "N/A"
+    for b in bounty_list[:shown]:
+        deadline_str = b.deadline if b.deadline else "N/A"
         text += (
-            f"🏆 {b['title']}\n"
-            f"💰 Reward: {b['reward']}\n"
+            f"🏆 {b.title}\n"
+            f"💰 Reward: {b.reward}\n"
             f"⏳ Deadline: {deadline_str}\n"
-            f"🔗 {b['link']}\n\n"
+            f"🔗 {b.link}\n\n"
         )
+    if len(bounty_list) > shown:
+        text += f"…and {len(bounty_list) - shown} more. Narrow it down: /bounties <token> min=<amount> days=<n>"
 
     await update.message.reply_text(text.strip())
@@ -0,0 +1,124 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+import yaml
+from telegram import Bot
+from telegram.error import BadRequest, Forbidden, NetworkError, RetryAfter, TelegramError
+
+from handlers import ratelimit
+
+logger = logging.getLogger(__name__)
+
+# Load config
+CONFIG = yaml.safe_load(Path("config.yaml").read_text())
+BROADCAST_CONFIG = CONFIG.get("broadcasts", {})
+
+# One global bucket for every bulk send, tuned under Telegram's ~30 msg/s
+LIMITER = ratelimit.TokenBucket(
+    rate=BROADCAST_CONFIG.get("rate_per_second", 25),
+    burst=BROADCAST_CONFIG.get("burst", 5),
+)
+
+
+@dataclass
+class BroadcastStats:
+    total: int = 0
+    sent: int = 0
+    failed: int = 0
+    retried: int = 0
+    pruned: int = 0
+    started: float = field(default_factory=time.monotonic)
+    duration: float = 0.0
+
+    def __str__(self):
+        return (
+            f"{self.sent}/{self.total} sent, {self.failed} failed, {self.retried} retried, "
+            f"{self.pruned} pruned in {self.duration:.1f}s"
+        )
+
+
+async def broadcast(
+    bot: Bot,
+    chat_ids,
+    text: str,
+    *,
+    on_sent=None,
+    on_failed=None,
+    on_forbidden=None,
+    on_rejected=None,
+    **send_kwargs,
+) -> BroadcastStats:
+    """
+    Send `text` to every chat with a bounded worker pool behind LIMITER.
+    RetryAfter pauses the whole limiter and retries; chats that blocked the
+    bot (Forbidden) are reported through on_forbidden so they can be pruned.
+    Network and server errors are retried, then reported through on_failed
+    (worth trying again later); any other Telegram error, e.g. a BadRequest
+    for a parse error, fails the same way every time and goes to
+    on_rejected instead (on_failed if not given). Both count as failed.
+    """
+    queue = asyncio.Queue()
+    for chat_id in chat_ids:
+        queue.put_nowait(chat_id)
+    stats = BroadcastStats(total=queue.qsize())
+
+    async def worker():
+        while True:
+            try:
+                chat_id = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            await _deliver(bot, chat_id, text, stats, send_kwargs,
+                           on_sent, on_failed, on_forbidden, on_rejected or on_failed)
+
+    workers = min(BROADCAST_CONFIG.get("concurrency", 16), stats.total)
+    await asyncio.gather(*(worker() for _ in range(workers)))
+    stats.duration = time.monotonic() - stats.started
+    return stats
+
+
+async def _deliver(bot, chat_id, text, stats, send_kwargs, on_sent, on_failed, on_forbidden, on_rejected):
+    max_retries = BROADCAST_CONFIG.get("max_retries", 3)
+    for attempt in range(max_retries + 1):
+        await LIMITER.acquire()
+        try:
+            await bot.send_message(chat_id=chat_id, text=text, **send_kwargs)
+            stats.sent += 1
+            if on_sent:
+                on_sent(chat_id)
+            return
+        except RetryAfter as e:
+            # Flood control applies to the bot as a whole: everyone backs off
+            LIMITER.pause(e.retry_after)
+        except Forbidden as e:
+            logger.info(f"Pruning {chat_id} from broadcasts: {e}")
+            stats.pruned += 1
+            if on_forbidden:
+                on_forbidden(chat_id)
+            return
+        except BadRequest as e:
+            # a NetworkError subclass in PTB, but the same request would be refused again
+            _reject(chat_id, e, stats, on_rejected)
+            return
+        except NetworkError as e:
+            # timeouts and 5xx answers from the Bot API
+            logger.debug(f"Network error sending to {chat_id} (attempt {attempt + 1}): {e}")
+            if attempt < max_retries:
+                await asyncio.sleep(min(30, 2 ** attempt))
+        except TelegramError as e:
+            _reject(chat_id, e, stats, on_rejected)
+            return
+        if attempt < max_retries:
+            stats.retried += 1
+    stats.failed += 1
+    if on_failed:
+        on_failed(chat_id)
+
+
+def _reject(chat_id, error, stats, on_rejected):
+    logger.warning(f"Failed to send alert to {chat_id}, not retrying: {error}")
+    stats.failed += 1
+    if on_rejected:
+        on_rejected(chat_id)
@@ -1,56 +1,110 @@
 import logging
-import requests
+import time
+import httpx
 from pathlib import Path
 import yaml
-from datetime import datetime, timezone
-from icalendar import Calendar
 from telegram.constants import ParseMode
 
+from handlers import feedcache, httpclient, ics, jobs, metrics
+
 logger = logging.getLogger(__name__)
 
 # Load config
 CONFIG = yaml.safe_load(Path("config.yaml").read_text())
 
 
+EVENTS_CONFIG = CONFIG.get("events", {})
+
+
+def _event_window() -> ics.EventWindow:
+    return ics.EventWindow(
+        window_days=EVENTS_CONFIG.get("window_days", 120),
+        limit=EVENTS_CONFIG.get("limit", 5),
+        default_tz=jobs.load_timezone(CONFIG.get("schedule", {}).get("timezone", "Europe/Dublin")),
+    )
+
+
+def _as_dicts(occurrences):
+    events = [
+        {
+            "title": o["title"],
+            "date": o["start"].strftime("%Y-%m-%d %H:%M"),
+            "link": o["link"],
+            "uid": o["uid"],
+        }
+        for o in occurrences
+    ]
+    return events or [{"title": "No upcoming events", "date": "", "link": ""}]
+
+
+def parse_events(ics_text: str):
+    """Parse an ICS body into the next 5 upcoming events."""
+    return _as_dicts(_event_window().parse(ics_text))
+
+
+# Kept across refreshes: unchanged VEVENTs are not parsed again
+_WINDOW = _event_window()
+
+
+async def load_events():
+    """Stream and parse the events feed; raises on failure."""
+    url = CONFIG["feeds"]["events"]
+    async with httpclient.conditional_stream(url, use_validators=EVENTS_CACHE.value is not None) as r:
+        if r is None:
+            return feedcache.NOT_MODIFIED  # 304: skip the ICS parse (see reselect_events)
+        # Parsed chunk by chunk as it arrives, so the loop is never blocked for long
+        _WINDOW.start()
+        parse_seconds = 0.0
+        async for chunk in r.aiter_text():
+            start = time.perf_counter()
+            _WINDOW.feed(chunk)
+            parse_seconds += time.perf_counter() - start
+        with metrics.stage("events.finish"):
+            events = _as_dicts(_WINDOW.finish())
+    metrics.STAGE_SECONDS.observe(parse_seconds, "events.parse")
+    logger.debug(f"Events feed: {_WINDOW.parsed} VEVENTs parsed, {_WINDOW.reused} unchanged")
+    httpclient.store_validators(url, r)
+    return events
+
+
+def reselect_events(cached):
+    """304: the feed is unchanged but time isn't; pick the next events again from the cache."""
+    with metrics.stage("events.finish"):
+        return _as_dicts(_WINDOW.reselect())
+
+
+# Shared by /events, the alert scheduler and the morning digest
+EVENTS_CACHE = feedcache.FeedCache(
+    "events",
+    load_events,
+    ttl_seconds=CONFIG.get("cache", {}).get("feed_ttl_seconds", 300),
+    revalidate=reselect_events,
+)
+
+
+async def get_events():
+    """Cached upcoming events (stale-while-revalidate)."""
+    try:
+        return await EVENTS_CACHE.get()
+    except Exception:
+        return [{"title": "⚠️ Could not fetch events", "date": "", "link": ""}]
+
+
+async def refresh_events():
+    """Force a (coalesced) refresh, e.g. from the scheduler."""
+    try:
+        return await EVENTS_CACHE.refresh()
+    except Exception:
+        return [{"title": "⚠️ Could not fetch events", "date": "", "link": ""}]
+
+
 def fetch_events():
+    """Blocking fetch for scripts; the bot uses get_events()."""
     url = CONFIG["feeds"]["events"]
     try:
-        r = requests.get(url, timeout=10)
+        r = httpx.get(url, timeout=10, follow_redirects=True)
         r.raise_for_status()
-        gcal = Calendar.from_ical(r.text)
-
-        now = datetime.now(timezone.utc)
-        events = []
-        for component in gcal.walk():
-            if component.name == "VEVENT":
-                start = component.get("DTSTART").dt
-                if start >= now:
-                    title = str(component.get("SUMMARY"))
-
-                    # Try URL, then ATTACH, then try to parse DESCRIPTION
-                    link = str(component.get("URL", "")) or \
-                           str(component.get("ATTACH", "")) or ""
-
-                    if not link:
-                        desc = str(component.get("DESCRIPTION", ""))
-                        # crude fallback: find http(s) links inside description
-                        import re
-                        match = re.search(r"https?://\S+", desc)
-                        if match:
-                            link = match.group(0)
-
-                    if not link:
-                        link = "No link available"
-
-                    date = start.strftime("%Y-%m-%d %H:%M")
-                    events.append({
-                        "title": title,
-                        "date": date,
-                        "link": link
-                    })
-
-        events.sort(key=lambda e: e["date"])
-        return events[:5] or [{"title": "No upcoming events", "date": "", "link": ""}]
+        return parse_events(r.text)
     except Exception as e:
         logger.error(f"Error fetching events: {e}")
         return [{"title": "⚠️ Could not fetch events", "date": "", "link": ""}]
@@ -61,7 +115,7 @@ async def events(update, context):
     """
     Telegram command handler for /events
     """
-    event_list = fetch_events()
+    event_list = await get_events()
     if not event_list:
         await update.message.reply_text("No upcoming events found.")
         return
@@ -1,112 +1,157 @@
 import os
 import re
+import html
+import json
+import time
+import hashlib
 import logging
 from pathlib import Path
+import yaml
 from telegram import Update
+from telegram.error import BadRequest, RetryAfter, TelegramError
 from telegram.ext import ContextTypes
-import httpx
+
+from handlers import answercache, httpclient, metrics, ratelimit, retrieval, singleflight, tghtml
 
 logger = logging.getLogger(__name__)
 
+# Load config
+CONFIG = yaml.safe_load(Path("config.yaml").read_text())
+FAQ_CONFIG = CONFIG.get("faq", {})
+
 # ──────────────────────────────────────────────────────────────────────────────
 # OpenAI config
 # ──────────────────────────────────────────────────────────────────────────────
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
 
 # ──────────────────────────────────────────────────────────────────────────────
 # Load Knowledge Base (Markdown files under ./faq/)
 # ──────────────────────────────────────────────────────────────────────────────
 FAQ_DIR = Path("faq")
-FAQ_CONTEXT = {}
+KB_SEPARATOR = "\n\n— — —\n\n"
+
+
+class KnowledgeBase:
+    """
+    faq/*.md compiled once: each page is rendered to Telegram HTML when it is
+    loaded, and refresh() re-renders only the files whose mtime changed.
+    `version` is a content hash that downstream caches can key on.
+    """
+
+    def __init__(self, folder: Path, reload_seconds: float = 5):
+        self.folder = folder
+        self.reload_seconds = reload_seconds
+        self.docs = {}       # title → markdown (FAQ_CONTEXT points here)
+        self.rendered = {}   # title → Telegram-safe HTML
+        self.text = ""       # full KB as sent in full-KB mode
+        self.version = ""
+        self._mtimes = {}
+        self._checked_at = 0.0
+        self.refresh(force=True)
+
+    def refresh(self, force: bool = False) -> bool:
+        """Pick up edited, added or removed pages; True if anything changed."""
+        now = time.monotonic()
+        if not force and now - self._checked_at < self.reload_seconds:
+            return False
+        self._checked_at = now
+
+        files = sorted(self.folder.glob("*.md"), key=lambda p: p.name.lower())
+        mtimes = {p: p.stat().st_mtime_ns for p in files}
+        if mtimes == self._mtimes and not force:
+            return False
+
+        docs, rendered = {}, {}
+        for path in files:
+            title = path.stem.replace("-", " ").title()
+            if self._mtimes.get(path) == mtimes[path] and title in self.docs:
+                docs[title] = self.docs[title]
+                rendered[title] = self.rendered[title]
+            else:
+                docs[title] = path.read_text(encoding="utf-8")
+                rendered[title] = md_to_safe_html(docs[title])
+                logger.info(f"Loaded FAQ page {path.name}")
+        self._mtimes = mtimes
+
+        # Update in place so references to FAQ_CONTEXT stay valid
+        self.docs.clear()
+        self.docs.update(docs)
+        self.rendered = rendered
+        # Make section title bold, then rendered content
+        self.text = KB_SEPARATOR.join(
+            f"<b>{html.escape(title)}</b>\n{body}" for title, body in rendered.items()
+        )
+        digest = hashlib.sha256()
+        for title, md in docs.items():
+            digest.update(title.encode() + b"\0" + md.encode() + b"\0")
+        self.version = digest.hexdigest()[:16]
+        return True
 
-md_files = sorted(FAQ_DIR.glob("*.md"), key=lambda p: p.name.lower())
-for md_file in md_files:
-    title = md_file.stem.replace("-", " ").title()
-    FAQ_CONTEXT[title] = md_file.read_text(encoding="utf-8")
 
 def build_kb_text() -> str:
+    KB.refresh()
+    return KB.text
+
+
+_INDEX = None
+_INDEX_VERSION = None
+
+def get_index() -> "retrieval.BM25Index":
+    """BM25 index over the KB, rebuilt whenever the KB version changes."""
+    global _INDEX, _INDEX_VERSION
+    KB.refresh()
+    if _INDEX is None or _INDEX_VERSION != KB.version:
+        chunks = retrieval.split_chunks(KB.docs, FAQ_CONFIG.get("chunk_tokens", 160))
+        for chunk in chunks:
+            chunk.rendered = md_to_safe_html(chunk.text)
+        _INDEX = retrieval.BM25Index(chunks)
+        _INDEX_VERSION = KB.version
+    return _INDEX
+
+def build_context_text(question: str) -> str:
+    """
+    Context for one question: the top-k BM25 chunks within the token budget,
+    or the whole knowledge base when retrieval is switched off.
+    """
+    if not FAQ_CONFIG.get("retrieval", True):
+        return build_kb_text()
+    chunks = retrieval.select_chunks(
+        get_index(),
+        question,
+        top_k=FAQ_CONFIG.get("top_k", 4),
+        token_budget=FAQ_CONFIG.get("context_token_budget", 900),
+    )
     parts = []
-    # Ensure deterministic ordering; put 00_basics.md first naturally if named like that
-    for title, txt in FAQ_CONTEXT.items():
-        rendered = md_to_safe_html(txt)
-        # Make section title bold, then rendered content
-        parts.append(f"<b>{html.escape(title)}</b>\n{rendered}")
-    # Separate sections with a clear delimiter
-    return "\n\n— — —\n\n".join(parts)
+    last_title = None
+    for chunk in chunks:
+        rendered = chunk.rendered
+        if chunk.title != last_title:
+            rendered = f"<b>{html.escape(chunk.title)}</b>\n{rendered}"
+            last_title = chunk.title
+        parts.append(rendered)
+    return KB_SEPARATOR.join(parts)
 
 
 # ──────────────────────────────────────────────────────────────────────────────
-# Telegram HTML sanitizer (allow only <b> <i> <u> <s> <a> <code> <pre>)
+# Telegram HTML (allow only <b> <i> <u> <s> <a> <code> <pre>): see tghtml.py
 # ──────────────────────────────────────────────────────────────────────────────
-_BR_TAG = re.compile(r'<br\s*/?>', re.I)
-_UNSUPPORTED_TAGS = re.compile(
-    r'</?(?:ul|ol|li|span|strong|em|ins|del|strike|tg-spoiler|img|table|tr|td|th|h[1-6]|div|p|blockquote|hr|sup|sub)[^>]*>',
-    re.I,
-)
-# Remove attributes in allowed tags except href in <a>
-_ALLOWED_TAG_ATTRS = re.compile(r'<(b|i|u|s|code|pre)(\s+[^>]*)?>', re.I)
-_A_TAG_CLEAN = re.compile(r'<a\s+[^>]*href="([^"]+)"[^>]*>', re.I)
-
 def sanitize_for_telegram_html(s: str) -> str:
-    if not s:
-        return s
-    s = s.replace("&nbsp;", " ")
-    s = _BR_TAG.sub("\n", s)           # convert <br> to newline
-    s = _UNSUPPORTED_TAGS.sub("", s)   # drop unsupported tags entirely
-    # Clean allowed tags to remove attributes (Telegram dislikes many attrs)
-    s = _ALLOWED_TAG_ATTRS.sub(lambda m: f"<{m.group(1).lower()}>", s)
-    s = _A_TAG_CLEAN.sub(lambda m: f'<a href="{m.group(1)}">', s)
-    # Collapse 3+ newlines to max 2 for neatness
-    s = re.sub(r'\n{3,}', '\n\n', s)
-    return s
-
-import html, re
-
-# Convert a subset of Markdown to Telegram-safe HTML (<b> <i> <code> <a>) + newline bullets.
-_MD_IMG = re.compile(r'!\[([^\]]*)\]\(([^)]+)\)')
-_MD_LINK = re.compile(r'\[([^\]]+)\]\((https?://[^)]+)\)')
-_MD_CODE = re.compile(r'`([^`]+)`')
-_MD_BOLD = re.compile(r'(\*\*|__)(.*?)\1', re.DOTALL)
-# italics: *text* or _text_ (simple, line-scoped)
-_MD_ITAL = re.compile(r'(?:(?<!\*)\*(?!\*))([^*\n]+?)(?<!\*)\*(?!\*)|_([^_\n]+?)_', re.DOTALL)
-_MD_H = re.compile(r'^\s{0,3}#{1,6}\s*(.+)$', re.M)
-_MD_UL = re.compile(r'^\s*[-*]\s+', re.M)
-_MD_OL = re.compile(r'^\s*\d+\.\s+', re.M)
-_MD_HR = re.compile(r'^\s{0,3}(-{3,}|\*{3,}|_{3,})\s*$', re.M)
+    return tghtml.sanitize(s)
+
+def sanitize_partial_html(s: str) -> str:
+    """Sanitize streamed output: cut a half-received tag/entity, then balance."""
+    return tghtml.sanitize(s, partial=True)
 
 def md_to_safe_html(md: str) -> str:
-    if not md:
-        return ""
+    return tghtml.render_markdown(md)
 
-    # Escape raw HTML first
-    s = html.escape(md)
-
-    # Images → keep alt text only
-    s = _MD_IMG.sub(lambda m: m.group(1), s)
-    # Links → <a href="...">text</a>
-    s = _MD_LINK.sub(lambda m: f'<a href="{m.group(2)}">{m.group(1)}</a>', s)
-    # Inline code
-    s = _MD_CODE.sub(lambda m: f"<code>{m.group(1)}</code>", s)
-    # Bold
-    s = _MD_BOLD.sub(lambda m: f"<b>{m.group(2)}</b>", s)
-    # Italic (two-alternative groups)
-    def ital_repl(m):
-        txt = m.group(1) or m.group(2) or ""
-        return f"<i>{txt}</i>"
-    s = _MD_ITAL.sub(ital_repl, s)
-    # Headings → bold line
-    s = _MD_H.sub(lambda m: f"<b>{m.group(1)}</b>", s)
-    # Lists → bullet prefix "• "
-    s = _MD_UL.sub("• ", s)
-    s = _MD_OL.sub("• ", s)
-    # Horizontal rules → blank line
-    s = _MD_HR.sub("\n", s)
-
-    # Normalize newlines
-    s = re.sub(r'\r\n?', '\n', s)
-    s = re.sub(r'\n{3,}', '\n\n', s)
-    return s
+# ──────────────────────────────────────────────────────────────────────────────
+# Compile the knowledge base (needs md_to_safe_html above)
+# ──────────────────────────────────────────────────────────────────────────────
+KB = KnowledgeBase(FAQ_DIR, reload_seconds=FAQ_CONFIG.get("reload_seconds", 5))
+FAQ_CONTEXT = KB.docs
 
 # ──────────────────────────────────────────────────────────────────────────────
 # Friendly small-talk: allow greetings ONLY (no knowledge claims)
@@ -191,6 +236,162 @@ def build_messages_html(context_text: str, question: str):
     )
     return system_msg, user_msg
 
+# ──────────────────────────────────────────────────────────────────────────────
+# Answer cache (normalized question + KB version)
+# ──────────────────────────────────────────────────────────────────────────────
+_CACHE_CONFIG = FAQ_CONFIG.get("answer_cache", {})
+ANSWER_CACHE = answercache.AnswerCache(
+    max_size=_CACHE_CONFIG.get("max_size", 512),
+    ttl_seconds=_CACHE_CONFIG.get("ttl_seconds", 86400),
+    path=_CACHE_CONFIG.get("path", ""),
+)
+
+def answer_cache_key(question: str) -> str:
+    """Empty when the question has no meaningful words (nothing to cache)."""
+    normalized = answercache.normalize_question(question)
+    if not normalized:
+        return ""
+    KB.refresh()
+    return f"{KB.version}:{normalized}"
+
+# ──────────────────────────────────────────────────────────────────────────────
+# OpenAI call
+# ──────────────────────────────────────────────────────────────────────────────
+def _chat_request(system_msg: str, user_msg: str, stream: bool = False) -> dict:
+    payload = {
+        "model": OPENAI_MODEL,
+        "messages": [
+            {"role": "system", "content": system_msg},
+            {"role": "user", "content": user_msg},
+        ],
+        "temperature": 0.3,
+        "max_tokens": 700,
+        "frequency_penalty": 0.2,   # reduces copy-ish repetition
+        "presence_penalty": 0.1     # nudges variety a bit
+    }
+    if stream:
+        payload["stream"] = True
+    return payload
+
+def _openai_headers() -> dict:
+    return {
+        "Authorization": f"Bearer {OPENAI_API_KEY}",
+        "Content-Type": "application/json",
+    }
+
+async def ask_openai(system_msg: str, user_msg: str) -> str:
+    # Pooled client: keep-alive connection to OpenAI instead of a new handshake
+    client = httpclient.get_client(OPENAI_BASE_URL)
+    resp = await client.post(
+        f"{OPENAI_BASE_URL}/chat/completions",
+        headers=_openai_headers(),
+        json=_chat_request(system_msg, user_msg),
+        timeout=15,
+    )
+    resp.raise_for_status()
+    data = resp.json()
+    return (
+        data.get("choices", [{}])[0]
+        .get("message", {})
+        .get("content", "")
+        .strip()
+    )
+
+async def stream_openai(system_msg: str, user_msg: str, on_partial) -> str:
+    """Like ask_openai(), but with stream=true; on_partial(text) gets the answer so far."""
+    answer = ""
+    client = httpclient.get_client(OPENAI_BASE_URL)
+    async with client.stream(
+        "POST",
+        f"{OPENAI_BASE_URL}/chat/completions",
+        headers=_openai_headers(),
+        json=_chat_request(system_msg, user_msg, stream=True),
+        timeout=15,
+    ) as resp:
+        resp.raise_for_status()
+        # Server-sent events: "data: {...}" lines, terminated by "data: [DONE]"
+        async for line in resp.aiter_lines():
+            if not line.startswith("data:"):
+                continue
+            payload = line[5:].strip()
+            if payload == "[DONE]":
+                break
+            delta = (
+                json.loads(payload).get("choices", [{}])[0]
+                .get("delta", {})
+                .get("content")
+            )
+            if delta:
+                answer += delta
+                await on_partial(answer)
+    return answer.strip()
+
+
+class ProgressiveEditor:
+    """
+    Edits the "Thinking…" placeholder in place while an answer streams in,
+    at most once per `interval` seconds to stay under Telegram's edit limits.
+    """
+
+    def __init__(self, message, interval: float = 1.0):
+        self.message = message
+        self.interval = interval
+        self._next_edit = 0.0
+        self._shown = ""
+
+    async def update(self, partial: str):
+        if time.monotonic() < self._next_edit:
+            return
+        # Long answers: stream the first message; the rest is sent on finish
+        await self._edit(tghtml.split_message(sanitize_partial_html(partial))[0])
+
+    async def finish(self, answer: str) -> bool:
+        """Show the final answer; False if the placeholder could not be edited."""
+        return await self._edit(answer)
+
+    async def _edit(self, text: str) -> bool:
+        self._next_edit = time.monotonic() + self.interval
+        if not text.strip() or text == self._shown:
+            return True
+        try:
+            await self.message.edit_text(
+                text,
+                parse_mode="HTML",
+                disable_web_page_preview=True,
+            )
+            self._shown = text
+            return True
+        except RetryAfter as e:
+            self._next_edit = time.monotonic() + e.retry_after
+        except BadRequest as e:
+            if "not modified" in str(e).lower():
+                return True
+            logger.warning(f"Could not edit FAQ placeholder: {e}")
+        except TelegramError as e:
+            logger.warning(f"Could not edit FAQ placeholder: {e}")
+        return False
+
+
+async def answer_question(question: str, cache_key: str = "", on_partial=None) -> str:
+    """
+    Build the KB prompt, ask OpenAI and return Telegram-safe HTML.
+    With on_partial (and faq.stream enabled) the answer is streamed.
+    """
+    with metrics.stage("faq.context"):
+        context_text = build_context_text(question)
+    system_msg, user_msg = build_messages_html(context_text, question)
+    with metrics.stage("faq.openai"):
+        if on_partial and FAQ_CONFIG.get("stream", True):
+            answer = await stream_openai(system_msg, user_msg, on_partial)
+        else:
+            answer = await ask_openai(system_msg, user_msg)
+    if not answer:
+        answer = FALLBACK_REFUSAL_HTML
+    answer = sanitize_for_telegram_html(answer)
+    if cache_key:
+        ANSWER_CACHE.put(cache_key, answer)
+    return answer
+
 # ──────────────────────────────────────────────────────────────────────────────
 # /faq command handler
 # ──────────────────────────────────────────────────────────────────────────────
@@ -216,6 +417,76 @@ async def faq(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
 
     question = " ".join(context.args).strip()
+    await ask(update, question)
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Rate-limited replies (/faq and group mentions share one limiter)
+# ──────────────────────────────────────────────────────────────────────────────
+LIMITER = ratelimit.reply_limiter_from(CONFIG)
+
+
+async def ask(update: Update, question: str):
+    """
+    Answer `question` within the reply limits: right away, queued until the
+    group's cooldown is over (possibly batched with other questions), or
+    not at all when the asker is over their own limit.
+    """
+    chat = update.effective_chat
+    user = update.effective_user
+    # Groups share one reply budget; private chats are only limited per user
+    chat_key = chat.id if chat.type in ("group", "supergroup") else None
+    result = await LIMITER.submit(chat_key, user.id if user else None, (update, question), reply_batch)
+    if result == ratelimit.QUEUED:
+        logger.info(f"Rate limit hit in chat {chat.id}, question queued.")
+    elif result == ratelimit.REJECTED:
+        logger.info(f"Rate limit hit in chat {chat.id}, question dropped ({LIMITER.stats()}).")
+        if chat_key is None:
+            await update.message.reply_text("⏳ You're asking faster than I can answer. Try again in a minute.")
+
+
+async def reply_batch(items):
+    """LIMITER callback: one question as usual, several as one combined reply."""
+    if len(items) == 1:
+        await reply_to_question(*items[0])
+        return
+
+    parts = []
+    for _, question in items:
+        try:
+            answer = await answer_text(question)
+        except Exception as e:
+            logger.error(f"OpenAI FAQ error: {e}")
+            answer = "⚠️ Sorry, I couldn't fetch an answer right now."
+        parts.append(f"❓ <i>{html.escape(question)}</i>\n{answer}")
+
+    # Reply to the latest question; split_message prefers the blank lines between answers
+    await reply_parts(items[-1][0].message, tghtml.split_message("\n\n".join(parts)))
+
+
+async def reply_parts(message, parts):
+    for text in parts:
+        await message.reply_text(text, parse_mode="HTML", disable_web_page_preview=True)
+
+
+async def answer_text(question: str) -> str:
+    """Final HTML answer without placeholder or streaming (for batched replies)."""
+    if GREETING_RE.search(question):
+        return sanitize_for_telegram_html(greeting_reply_html())
+    cache_key = answer_cache_key(question)
+    cached = ANSWER_CACHE.get(cache_key) if cache_key else None
+    if cached:
+        return cached
+    if not OPENAI_API_KEY:
+        logger.error("OPENAI_API_KEY is not set.")
+        return "⚠️ OpenAI model is not configured yet. Please try again later."
+    return await singleflight.LLM.do(
+        f"faq:{cache_key or question}",
+        lambda: answer_question(question, cache_key),
+    )
+
+
+async def reply_to_question(update: Update, question: str):
 
     # Allow friendly greeting without touching the KB
     if GREETING_RE.search(question):
@@ -227,7 +498,15 @@ async def faq(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
         return
 
-    await update.message.reply_text("💡 Thinking…", parse_mode="HTML")
+    # Repeat question → answer straight from the cache, no placeholder
+    cache_key = answer_cache_key(question)
+    cached = ANSWER_CACHE.get(cache_key) if cache_key else None
+    if cached:
+        logger.info(f"FAQ cache hit ({ANSWER_CACHE.stats()})")
+        await reply_parts(update.message, tghtml.split_message(cached))
+        return
+
+    placeholder = await update.message.reply_text("💡 Thinking…", parse_mode="HTML")
 
     # Guard: ensure API key exists
     if not OPENAI_API_KEY:
@@ -239,50 +518,24 @@ async def faq(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
         return
 
-    # Build strict KB prompt
-    context_text = build_kb_text()
-    system_msg, user_msg = build_messages_html(context_text, question)
+    # Streaming mode: the answer grows inside the placeholder message
+    editor = None
+    if FAQ_CONFIG.get("stream", True):
+        editor = ProgressiveEditor(placeholder, FAQ_CONFIG.get("stream_edit_interval", 1.0))
 
     try:
-        async with httpx.AsyncClient(timeout=15) as client:
-            resp = await client.post(
-                "https://api.openai.com/v1/chat/completions",
-                headers={
-                    "Authorization": f"Bearer {OPENAI_API_KEY}",
-                    "Content-Type": "application/json",
-                },
-                json={
-                    "model": OPENAI_MODEL,
-                    "messages": [
-                        {"role": "system", "content": system_msg},
-                        {"role": "user", "content": user_msg},
-                    ],
-                    "temperature": 0.3,
-                    "max_tokens": 700,
-                    "frequency_penalty": 0.2,   # reduces copy-ish repetition
-                    "presence_penalty": 0.1     # nudges variety a bit
-                },
-            )
-            resp.raise_for_status()
-            data = resp.json()
-            answer = (
-                data.get("choices", [{}])[0]
-                .get("message", {})
-                .get("content", "")
-                .strip()
-            )
-
-        # Sanitize for Telegram and send
-        if not answer:
-            answer = FALLBACK_REFUSAL_HTML
-        answer = sanitize_for_telegram_html(answer)
-
-        await update.message.reply_text(
-            answer,
-            parse_mode="HTML",
-            disable_web_page_preview=True,
+        # Identical questions asked at the same time share one OpenAI call
+        answer = await singleflight.LLM.do(
+            f"faq:{cache_key or question}",
+            lambda: answer_question(question, cache_key, editor.update if editor else None),
         )
 
+        with metrics.stage("faq.reply"):
+            parts = tghtml.split_message(answer)
+            if editor and await editor.finish(parts[0]):
+                parts = parts[1:]
+            await reply_parts(update.message, parts)
+
     except Exception as e:
         logger.error(f"OpenAI FAQ error: {e}")
         await update.message.reply_text(
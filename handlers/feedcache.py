@@ -0,0 +1,72 @@
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Returned by a loader when the upstream says the feed has not changed (304)
+NOT_MODIFIED = object()
+
+
+class FeedCache:
+    """
+    Last good value of a feed, shared by command handlers and background jobs.
+
+    - fresh (younger than ttl) → returned as is
+    - stale → returned as is while one background refresh runs
+    - concurrent refreshes are coalesced into a single upstream request
+
+    `version` only changes when the value does, so pollers can skip diffing
+    when a refresh was a 304. On a 304, `revalidate(value)` (if given)
+    rebuilds the value from what the loader kept, e.g. so time-dependent
+    selections don't go stale while the upstream file stays the same.
+    """
+
+    def __init__(self, name: str, loader, ttl_seconds: float, revalidate=None):
+        self.name = name
+        self.ttl = ttl_seconds
+        self._revalidate = revalidate
+        self.value = None
+        self.updated_at = 0.0
+        self.version = 0
+        self._loader = loader
+        self._inflight = None
+
+    def is_fresh(self) -> bool:
+        return self.value is not None and time.monotonic() - self.updated_at < self.ttl
+
+    async def get(self):
+        """Return the cached value, refreshing in the background when stale."""
+        if self.value is None:
+            return await self.refresh()
+        if not self.is_fresh():
+            self._start_refresh()
+        return self.value
+
+    async def refresh(self):
+        """Fetch now, joining any refresh that is already in flight."""
+        # shield: a cancelled caller must not cancel the request others wait on
+        return await asyncio.shield(self._start_refresh())
+
+    def _start_refresh(self) -> asyncio.Task:
+        if self._inflight is None or self._inflight.done():
+            self._inflight = asyncio.create_task(self._load())
+        return self._inflight
+
+    async def _load(self):
+        try:
+            value = await self._loader()
+        except Exception as e:
+            logger.error(f"Error refreshing {self.name} feed: {e}")
+            if self.value is None:
+                raise
+            return self.value  # keep serving the last good value
+        self.updated_at = time.monotonic()
+        if value is NOT_MODIFIED:
+            if self._revalidate is not None:
+                value = self._revalidate(self.value)
+            if value is NOT_MODIFIED or value == self.value:
+                return self.value
+        self.value = value
+        self.version += 1
+        return value
@@ -0,0 +1,150 @@
+import contextlib
+import logging
+from pathlib import Path
+import httpx
+import yaml
+
+from handlers import metrics
+
+logger = logging.getLogger(__name__)
+
+# Load config
+CONFIG = yaml.safe_load(Path("config.yaml").read_text())
+HTTP_CONFIG = CONFIG.get("http", {})
+
+try:
+    import h2  # noqa: F401  (httpx[http2] extra)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# --- Client registry ---
+# Long-lived AsyncClients shared by every outbound call (LLM + feeds), so
+# connections are kept alive instead of paying a TCP/TLS handshake per call.
+# One client per host listed under http.hosts (own limits and timeouts),
+# plus a "default" client for everything else.
+_clients = {}
+
+
+def host_settings(host: str) -> dict:
+    """Settings for a host: http.default overlaid with http.hosts[host]."""
+    settings = dict(HTTP_CONFIG.get("default", {}))
+    settings.update(HTTP_CONFIG.get("hosts", {}).get(host, {}))
+    return settings
+
+
+def build_client(settings: dict) -> httpx.AsyncClient:
+    http2 = settings.get("http2", True)
+    if http2 and not HTTP2_AVAILABLE:
+        logger.warning("HTTP/2 requested but h2 is not installed; using HTTP/1.1")
+        http2 = False
+    transport = httpx.AsyncHTTPTransport(
+        http2=http2,
+        limits=httpx.Limits(
+            max_connections=settings.get("max_connections", 20),
+            max_keepalive_connections=settings.get("max_keepalive", 10),
+            keepalive_expiry=settings.get("keepalive_expiry", 60),
+        ),
+        verify=settings.get("verify", True),
+    )
+    return httpx.AsyncClient(
+        # every outbound call is timed per host (see handlers.metrics)
+        transport=metrics.InstrumentedTransport(transport),
+        timeout=httpx.Timeout(
+            settings.get("timeout", 10),
+            connect=settings.get("connect_timeout", 5),
+        ),
+        follow_redirects=True,
+    )
+
+
+def get_client(url: str = "") -> httpx.AsyncClient:
+    """Pooled client for the host of `url`, created on first use."""
+    host = httpx.URL(url).host if url else ""
+    key = host if host in HTTP_CONFIG.get("hosts", {}) else "default"
+    client = _clients.get(key)
+    if client is None or client.is_closed:
+        client = build_client(host_settings(host if key != "default" else ""))
+        _clients[key] = client
+    return client
+
+
+async def startup():
+    """Create the configured clients up front (bot post_init)."""
+    get_client()
+    for host in HTTP_CONFIG.get("hosts", {}):
+        get_client(f"https://{host}/")
+    logger.info(f"HTTP clients ready: {', '.join(_clients)} (http2={HTTP2_AVAILABLE})")
+
+
+async def aclose():
+    """Close every pooled client (bot post_shutdown)."""
+    clients = list(_clients.values())
+    _clients.clear()
+    for client in clients:
+        if not client.is_closed:
+            await client.aclose()
+
+
+# --- Conditional GET for feed polling ---
+# ETag / Last-Modified per feed URL, plus how many polls were 304 no-ops.
+_VALIDATORS = {}
+POLL_STATS = {}
+
+
+def _revalidation_headers(url: str, use_validators: bool) -> dict:
+    headers = {}
+    validators = _VALIDATORS.get(url, {}) if use_validators else {}
+    if validators.get("etag"):
+        headers["If-None-Match"] = validators["etag"]
+    if validators.get("last_modified"):
+        headers["If-Modified-Since"] = validators["last_modified"]
+    return headers
+
+
+def _not_modified(url: str, response: httpx.Response) -> bool:
+    stats = POLL_STATS.setdefault(url, {"polls": 0, "not_modified": 0})
+    stats["polls"] += 1
+    if response.status_code == 304:
+        stats["not_modified"] += 1
+        return True
+    return False
+
+
+async def conditional_get(url: str, use_validators: bool = True, timeout: float = 10):
+    """
+    GET a feed, revalidating with If-None-Match / If-Modified-Since.
+    Returns None when the server answers 304 Not Modified.
+    Call store_validators() once the body has been parsed successfully.
+    """
+    headers = _revalidation_headers(url, use_validators)
+    r = await get_client(url).get(url, headers=headers, timeout=timeout)
+    if _not_modified(url, r):
+        return None
+    r.raise_for_status()
+    return r
+
+
+@contextlib.asynccontextmanager
+async def conditional_stream(url: str, use_validators: bool = True, timeout: float = 10):
+    """
+    conditional_get() without reading the body: yields the open response
+    (None on 304) so large feeds can be parsed chunk by chunk.
+    """
+    headers = _revalidation_headers(url, use_validators)
+    async with get_client(url).stream("GET", url, headers=headers, timeout=timeout) as r:
+        if _not_modified(url, r):
+            yield None
+        else:
+            r.raise_for_status()
+            yield r
+
+
+def store_validators(url: str, response: httpx.Response):
+    """Remember the validators of a response we have fully processed."""
+    etag = response.headers.get("ETag")
+    last_modified = response.headers.get("Last-Modified")
+    if etag or last_modified:
+        _VALIDATORS[url] = {"etag": etag, "last_modified": last_modified}
+    else:
+        _VALIDATORS.pop(url, None)
@@ -0,0 +1,124 @@
+import asyncio
+import json
+from abc import ABC, abstractmethod
+
+MAX_BODY = 1 << 20  # Telegram updates are a few KB; refuse anything silly
+MAX_HEADERS = 100
+_REASONS = {200: "OK", 400: "Bad Request", 403: "Forbidden", 404: "Not Found",
+            405: "Method Not Allowed", 413: "Payload Too Large",
+            431: "Request Header Fields Too Large", 503: "Service Unavailable"}
+
+
+class HttpServer(ABC):
+    """
+    Minimal asyncio HTTP/1.1 server (no extra deps) behind the webhook and
+    the stand-alone metrics listener:
+
+    - keep-alive connections, Content-Length bodies up to `max_body`
+    - route() answers each request with (status, payload): a dict is sent
+      as JSON, a str as Prometheus text
+    - stop(): stops accepting, lets in-flight requests finish
+
+    Slow or hostile clients can't hold a connection forever: once a request
+    has started, every read must complete within `read_timeout`; headers
+    are capped at `max_headers` lines, and connections beyond
+    `max_connections` get a 503 and are closed.
+    """
+
+    max_body = MAX_BODY
+    max_headers = MAX_HEADERS
+    idle_timeout = None  # seconds an open connection may wait for its next request; None: no limit
+    read_timeout = 10    # seconds per read once a request has started
+
+    def __init__(self, max_connections: int = 100):
+        self.max_connections = max_connections
+        self._server = None
+        self._connections = set()
+        self._busy = set()  # connections in the middle of a request
+        self._closing = False
+
+    @abstractmethod
+    async def route(self, method: str, path: str, headers: dict, body: bytes):
+        """(status, payload) for one request; `headers` has lower-cased names."""
+
+    async def start(self, host: str, port: int):
+        self._server = await asyncio.start_server(self._handle, host, port)
+
+    @property
+    def port(self) -> int:
+        return self._server.sockets[0].getsockname()[1]
+
+    async def stop(self, timeout: float = 10):
+        if self._server is None:
+            return
+        self._closing = True
+        self._server.close()
+        for task in self._connections - self._busy:
+            task.cancel()  # idle keep-alive connections
+        if self._connections:
+            await asyncio.wait(self._connections, timeout=timeout)
+        await self._server.wait_closed()
+
+    async def _read(self, read):
+        return await asyncio.wait_for(read, self.read_timeout)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        task = asyncio.current_task()
+        if len(self._connections) >= self.max_connections:
+            try:
+                await self._respond(writer, 503, {"ok": False}, close=True)
+            except ConnectionError:
+                pass
+            writer.close()
+            return
+        self._connections.add(task)
+        try:
+            while not self._closing:
+                request_line = await asyncio.wait_for(reader.readline(), self.idle_timeout)
+                if not request_line:
+                    break
+                self._busy.add(task)
+                method, target, _ = request_line.decode("latin-1").split(" ", 2)
+                headers = {}
+                for lines in range(self.max_headers + 1):
+                    line = await self._read(reader.readline())
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    if lines == self.max_headers:
+                        await self._respond(writer, 431, {"ok": False}, close=True)
+                        return
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get("content-length") or 0)
+                if length > self.max_body:
+                    await self._respond(writer, 413, close=True)
+                    break
+                body = await self._read(reader.readexactly(length)) if length else b""
+                status, payload = await self.route(method, target.split("?", 1)[0], headers, body)
+                close = self._closing or headers.get("connection", "").lower() == "close"
+                await self._respond(writer, status, payload, close=close)
+                self._busy.discard(task)
+                if close:
+                    break
+        except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError, ValueError,
+                asyncio.CancelledError):
+            pass
+        finally:
+            self._connections.discard(task)
+            self._busy.discard(task)
+            writer.close()
+
+    @staticmethod
+    async def _respond(writer, status: int, payload=None, close: bool = False):
+        if isinstance(payload, str):  # metrics exposition
+            body, content_type = payload.encode(), "text/plain; version=0.0.4"
+        else:
+            body, content_type = json.dumps(payload or {}).encode(), "application/json"
+        head = (
+            f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'close' if close else 'keep-alive'}\r\n\r\n"
+        )
+        writer.write(head.encode() + body)
+        await writer.drain()
@@ -0,0 +1,322 @@
+import hashlib
+import heapq
+import logging
+import re
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+from dateutil.rrule import rruleset, rrulestr
+
+logger = logging.getLogger(__name__)
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Streaming, windowed iCalendar (RFC 5545) reader for the events feed.
+# Only VEVENTs are read; each is parsed once per UID/SEQUENCE/content and
+# recurrences are expanded only inside the look-ahead window.
+# ──────────────────────────────────────────────────────────────────────────────
+_UNTIL_FLOATING = re.compile(r"UNTIL=(\d{8})(T\d{6})?(?=;|$)")
+_LINK = re.compile(r"https?://\S+")
+_FOLD = re.compile(r"\r?\n[ \t]")
+
+
+def _unescape(value: str) -> str:
+    return (value.replace("\\n", "\n").replace("\\N", "\n")
+            .replace("\\,", ",").replace("\\;", ";").replace("\\\\", "\\"))
+
+
+def split_property(line: str):
+    """'DTSTART;TZID=Europe/Dublin:20250101T100000' → (name, {params}, value)."""
+    in_quotes = False
+    for i, ch in enumerate(line):
+        if ch == '"':
+            in_quotes = not in_quotes
+        elif ch == ":" and not in_quotes:
+            head, value = line[:i], line[i + 1:]
+            break
+    else:
+        return line.upper(), {}, ""
+    name, *raw_params = head.split(";")
+    params = {}
+    for p in raw_params:
+        key, _, val = p.partition("=")
+        params[key.upper()] = val.strip('"')
+    return name.upper(), params, value
+
+
+def parse_datetime(value: str, params: dict, default_tz) -> datetime:
+    """
+    Any DTSTART/EXDATE form as an aware datetime: UTC ("…Z"), TZID=…,
+    floating (default_tz) or all-day VALUE=DATE (midnight in default_tz).
+    """
+    value = value.strip()
+    if params.get("VALUE") == "DATE" or len(value) == 8:
+        d = datetime.strptime(value[:8], "%Y%m%d")
+        return d.replace(tzinfo=default_tz)
+    if value.endswith("Z"):
+        return datetime.strptime(value[:-1], "%Y%m%dT%H%M%S").replace(tzinfo=timezone.utc)
+    tz = default_tz
+    if "TZID" in params:
+        try:
+            tz = ZoneInfo(params["TZID"])
+        except Exception:
+            pass  # non-Olson names (e.g. Windows zones): treat as floating
+    return datetime.strptime(value[:15], "%Y%m%dT%H%M%S").replace(tzinfo=tz)
+
+
+class VEvent:
+    __slots__ = ("uid", "summary", "link", "start", "rrule", "rdates", "exdates",
+                 "recurrence_id", "cancelled")
+
+    def __init__(self):
+        self.uid = ""
+        self.summary = ""
+        self.link = ""
+        self.start = None
+        self.rrule = None
+        self.rdates = []
+        self.exdates = []
+        self.recurrence_id = None
+        self.cancelled = False
+
+    def recurrences(self):
+        """dateutil rule set for a recurring master (RRULE/RDATE/EXDATE)."""
+        rules = rruleset()
+        if self.rrule:
+            # dateutil requires UNTIL in UTC once DTSTART is aware
+            rule = _UNTIL_FLOATING.sub(lambda m: f"UNTIL={m.group(1)}{m.group(2) or 'T235959'}Z", self.rrule)
+            rules.rrule(rrulestr(f"RRULE:{rule}", dtstart=self.start))
+        else:
+            rules.rdate(self.start)
+        for d in self.rdates:
+            rules.rdate(d)
+        for d in self.exdates:
+            rules.exdate(d)
+        return rules
+
+
+def parse_vevent(lines, default_tz) -> VEvent:
+    """Parse the unfolded property lines of one VEVENT."""
+    event = VEvent()
+    url = attach = description = ""
+    for line in lines:
+        name, params, value = split_property(line)
+        if name == "UID":
+            event.uid = value
+        elif name == "SUMMARY":
+            event.summary = _unescape(value)
+        elif name == "DTSTART":
+            event.start = parse_datetime(value, params, default_tz)
+        elif name == "RRULE":
+            event.rrule = value
+        elif name in ("RDATE", "EXDATE"):
+            target = event.rdates if name == "RDATE" else event.exdates
+            target.extend(parse_datetime(v, params, default_tz) for v in value.split(",") if v)
+        elif name == "RECURRENCE-ID":
+            event.recurrence_id = parse_datetime(value, params, default_tz)
+        elif name == "STATUS":
+            event.cancelled = value.upper() == "CANCELLED"
+        elif name == "URL":
+            url = value
+        elif name == "ATTACH":
+            attach = value
+        elif name == "DESCRIPTION":
+            description = _unescape(value)
+
+    # Try URL, then ATTACH, then a link inside DESCRIPTION
+    link = url or attach
+    if not link:
+        match = _LINK.search(description)
+        link = match.group(0) if match else ""
+    event.link = link or "No link available"
+    return event
+
+
+def _value(body: str, marker: str) -> str:
+    """Value of the first property line starting with `marker` ("\nUID")."""
+    i = body.find(marker)
+    if i < 0:
+        return ""
+    end = body.find("\n", i + 1)
+    line = body[i + 1:] if end < 0 else body[i + 1:end]
+    return line.partition(":")[2].rstrip("\r")
+
+
+def _fingerprint(body: str) -> tuple:
+    """
+    (UID, RECURRENCE-ID) identity plus SEQUENCE and a content hash. DTSTAMP
+    is left out: feeds regenerate it on every export.
+    """
+    hashed = body
+    i = body.find("\nDTSTAMP")
+    if i >= 0:
+        end = body.find("\n", i + 1)
+        hashed = body[:i] + (body[end:] if end >= 0 else "")
+    digest = hashlib.blake2b(hashed.encode(), digest_size=12).digest()
+    identity = (_value(body, "\nUID"), _value(body, "\nRECURRENCE-ID"))
+    return identity, (_value(body, "\nSEQUENCE"), digest)
+
+
+def _property_lines(body: str):
+    """Content lines of an unfolded VEVENT body, minus nested components (VALARM)."""
+    lines, depth = [], 0
+    for line in body.split("\n"):
+        line = line.rstrip("\r")
+        if line.startswith("BEGIN:"):
+            depth += 1
+        elif line.startswith("END:"):
+            depth -= 1
+        elif line and depth == 0:
+            lines.append(line)
+    return lines
+
+
+class EventWindow:
+    """
+    Incremental feed reader: feed() text chunks as they arrive, then finish()
+    for the next `limit` occurrences starting within `window_days`.
+
+    VEVENTs are cached by UID (+ RECURRENCE-ID) across refreshes and only
+    re-parsed when SEQUENCE or their content changed. Upcoming occurrences
+    are kept in a bounded heap, so nothing is sorted beyond the top N.
+    """
+
+    def __init__(self, window_days: float = 120, limit: int = 5, default_tz="UTC"):
+        self.window = timedelta(days=window_days)
+        self.limit = limit
+        self.default_tz = ZoneInfo(default_tz) if isinstance(default_tz, str) else default_tz
+        self._cache = {}  # identity → (version, VEvent)
+        self.parsed = self.reused = 0
+        self.start()
+
+    # --- streaming ---
+    def start(self, now: datetime = None):
+        """Begin a new pass over the feed."""
+        self.now = now or datetime.now(timezone.utc)
+        self.until = self.now + self.window
+        self._pending = ""       # text after the last complete VEVENT
+        self._heap = []          # (-timestamp, seq, occurrence): max-heap of the best N
+        self._seq = 0
+        self._masters = []       # recurring VEvents, expanded in finish()
+        self._overridden = set() # (uid, timestamp) replaced by a RECURRENCE-ID VEVENT
+        self._seen = set()
+        self.parsed = self.reused = 0
+
+    def feed(self, text: str):
+        buf = self._pending + text
+        pos = 0
+        while True:
+            begin = buf.find("BEGIN:VEVENT", pos)
+            if begin < 0:
+                # keep a marker that may be cut in half by the chunk boundary
+                pos = max(pos, len(buf) - len("BEGIN:VEVENT"))
+                break
+            end = buf.find("END:VEVENT", begin)
+            if end < 0:
+                pos = begin  # incomplete VEVENT: wait for the next chunk
+                break
+            body = buf[begin + len("BEGIN:VEVENT"):end]
+            if "\n " in body or "\n\t" in body:
+                # RFC 5545 folding: CRLF + space/tab continues the previous line
+                body = _FOLD.sub("", body)
+            self._vevent(body)
+            pos = end + len("END:VEVENT")
+        self._pending = buf[pos:]
+
+    def finish(self) -> list:
+        self._pending = ""
+        for event in self._masters:
+            self._expand(event)
+        # Forget VEVENTs that disappeared from the feed
+        self._cache = {k: v for k, v in self._cache.items() if k in self._seen}
+        occurrences = [occ for _, _, occ in self._heap]
+        occurrences.sort(key=lambda o: o["start"])
+        return occurrences
+
+    def parse(self, text: str, now: datetime = None) -> list:
+        """Whole-text convenience wrapper around start/feed/finish."""
+        self.start(now)
+        self.feed(text)
+        return self.finish()
+
+    def reselect(self, now: datetime = None) -> list:
+        """
+        finish() again from the cached VEVENTs of the last pass, for a new
+        `now`: when the feed hasn't changed (304), events that have started
+        drop out and later ones move up without fetching or parsing anything.
+        """
+        cached = [event for _, event in self._cache.values()]
+        self.start(now)
+        self._seen = set(self._cache)
+        self.reused = len(cached)
+        for event in cached:
+            self._select(event)
+        return self.finish()
+
+    # --- per event ---
+    def _vevent(self, body: str):
+        identity, version = _fingerprint(body)
+        self._seen.add(identity)
+        cached = self._cache.get(identity)
+        if cached and cached[0] == version:
+            event = cached[1]
+            self.reused += 1
+        else:
+            try:
+                event = parse_vevent(_property_lines(body), self.default_tz)
+            except Exception as e:
+                logger.debug(f"Skipping unparsable VEVENT {identity[0]!r}: {e}")
+                event = None
+            self.parsed += 1
+            if event is not None and event.start is not None and event.start < self.now \
+                    and not (event.rrule or event.rdates or event.recurrence_id):
+                self._cache[identity] = (version, None)  # past for good: keep no copy
+            else:
+                self._cache[identity] = (version, event)
+        self._select(event)
+
+    def _select(self, event: VEvent):
+        if event is None or event.start is None:
+            return
+
+        if event.recurrence_id is not None:
+            # One changed (or cancelled) instance of a recurring series
+            self._overridden.add((event.uid, event.recurrence_id.timestamp()))
+        if event.cancelled:
+            return
+        if event.rrule or event.rdates:
+            self._masters.append(event)
+        else:
+            self._offer(event, event.start, instance=event.recurrence_id)
+
+    def _expand(self, event: VEvent):
+        try:
+            rules = event.recurrences()
+            for start in rules.xafter(self.now, inc=True):
+                if start > self._bound():
+                    break
+                if (event.uid, start.timestamp()) not in self._overridden:
+                    self._offer(event, start, instance=start)
+        except Exception as e:
+            logger.debug(f"Could not expand recurrences of {event.uid!r}: {e}")
+            self._offer(event, event.start)
+
+    def _bound(self) -> datetime:
+        """Latest start still worth considering: window end, or the Nth best so far."""
+        if len(self._heap) >= self.limit:
+            return self._heap[0][2]["start"]
+        return self.until
+
+    def _offer(self, event: VEvent, start: datetime, instance: datetime = None):
+        if start < self.now or start > self._bound():
+            return
+        uid = event.uid
+        if instance is not None:
+            # each instance of a series is its own event for alerts / seen keys
+            uid = f"{uid}/{instance.astimezone(timezone.utc):%Y%m%dT%H%M%SZ}"
+        self._seq += 1
+        occurrence = {"uid": uid, "title": event.summary, "link": event.link, "start": start}
+        item = (-start.timestamp(), self._seq, occurrence)
+        if len(self._heap) < self.limit:
+            heapq.heappush(self._heap, item)
+        else:
+            heapq.heappushpop(self._heap, item)
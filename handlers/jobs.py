@@ -0,0 +1,231 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import random
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+from handlers import metrics
+
+logger = logging.getLogger(__name__)
+
+# Longest single sleep; bounds the effect of wall-clock jumps (NTP, suspend)
+MAX_SLEEP = 3600
+
+
+def load_timezone(name: str) -> ZoneInfo:
+    try:
+        return ZoneInfo(name)
+    except Exception:
+        logger.warning(f"Unknown timezone {name!r}, using Europe/Dublin")
+        return ZoneInfo("Europe/Dublin")
+
+
+# --- Triggers ---
+class IntervalTrigger:
+    """Every `seconds`, plus up to `jitter` random seconds so polls spread out."""
+
+    def __init__(self, seconds: float, jitter: float = 0):
+        self.seconds = seconds
+        self.jitter = jitter
+
+    def first_run(self, now: datetime, misfire_grace: float) -> datetime:
+        return now
+
+    def next_after(self, now: datetime) -> datetime:
+        return now + timedelta(seconds=self.seconds + random.uniform(0, self.jitter))
+
+
+def _parse_field(field: str, low: int, high: int):
+    values = set()
+    for part in field.split(","):
+        step = 1
+        if "/" in part:
+            part, step = part.split("/")
+            step = int(step)
+        if part == "*":
+            start, end = low, high
+        elif "-" in part:
+            start, end = map(int, part.split("-"))
+        else:
+            start = end = int(part)
+        values.update(range(start, end + 1, step))
+    return sorted(v for v in values if low <= v <= high)
+
+
+class CronTrigger:
+    """
+    Five-field cron expression ("minute hour day month weekday") evaluated
+    in `tz`, with standard cron weekdays: 0 or 7 = Sunday, 1 = Monday … 6 =
+    Saturday. Supports *, a-b, a,b and */n. As in cron, when both day and
+    weekday are restricted a date matching either one fires.
+    """
+
+    def __init__(self, expr: str, tz: ZoneInfo):
+        fields = expr.split()
+        if len(fields) != 5:
+            raise ValueError(f"Expected 5 cron fields, got {expr!r}")
+        self.expr = expr
+        self.tz = tz
+        self.minutes = _parse_field(fields[0], 0, 59)
+        self.hours = _parse_field(fields[1], 0, 23)
+        self.days = set(_parse_field(fields[2], 1, 31))
+        self.months = set(_parse_field(fields[3], 1, 12))
+        self.weekdays = {d % 7 for d in _parse_field(fields[4], 0, 7)}  # 7 is Sunday too
+        self.any_day = fields[2].startswith("*")
+        self.any_weekday = fields[4].startswith("*")
+
+    def _day_matches(self, day) -> bool:
+        if day.month not in self.months:
+            return False
+        day_ok = day.day in self.days
+        weekday_ok = (day.weekday() + 1) % 7 in self.weekdays  # Python: 0 = Monday
+        if self.any_day or self.any_weekday:
+            return day_ok and weekday_ok
+        return day_ok or weekday_ok
+
+    def first_run(self, now: datetime, misfire_grace: float) -> datetime:
+        # A fire time missed by less than the grace period (e.g. a restart
+        # at 08:03 for an 08:00 job) still runs, late, right away.
+        return self.next_after(now - timedelta(seconds=misfire_grace))
+
+    def next_after(self, now: datetime) -> datetime:
+        local = now.astimezone(self.tz)
+        day = local.date()
+        for _ in range(366 * 4):
+            if self._day_matches(day):
+                for hour in self.hours:
+                    for minute in self.minutes:
+                        candidate = datetime(day.year, day.month, day.day, hour, minute, tzinfo=self.tz)
+                        if candidate > local:
+                            return candidate
+            day += timedelta(days=1)
+        raise ValueError(f"Cron expression {self.expr!r} never fires")
+
+
+def cron_trigger(spec: str, tz: ZoneInfo) -> CronTrigger:
+    """Accept either "HH:MM" (daily) or a full five-field cron expression."""
+    if ":" in spec and len(spec.split()) == 1:
+        hour, minute = map(int, spec.split(":"))
+        spec = f"{minute} {hour} * * *"
+    return CronTrigger(spec, tz)
+
+
+class LeadTrigger:
+    """Fires `lead_seconds` before each fire time of another trigger."""
+
+    def __init__(self, trigger, lead_seconds: float):
+        self.trigger = trigger
+        self.lead = timedelta(seconds=lead_seconds)
+
+    def first_run(self, now: datetime, misfire_grace: float) -> datetime:
+        return self.trigger.first_run(now + self.lead, misfire_grace) - self.lead
+
+    def next_after(self, now: datetime) -> datetime:
+        return self.trigger.next_after(now + self.lead) - self.lead
+
+
+# --- Scheduler ---
+class Job:
+    def __init__(self, name: str, func, trigger, misfire_grace: float):
+        self.name = name
+        self.func = func
+        self.trigger = trigger
+        self.misfire_grace = misfire_grace
+        self.next_run = None
+        self.task = None
+
+
+class JobScheduler:
+    """
+    Single timezone-aware scheduler: a min-heap of next fire times, sleeping
+    exactly until the earliest job is due. Jobs that fire later than their
+    misfire grace are skipped to the next slot; a job still running when it
+    fires again is not started twice.
+    """
+
+    def __init__(self, tz: ZoneInfo, misfire_grace: float = 600):
+        self.tz = tz
+        self.misfire_grace = misfire_grace
+        self.jobs = {}
+        self._heap = []
+        self._seq = itertools.count()
+        self._wake = asyncio.Event()
+
+    def now(self) -> datetime:
+        return datetime.now(self.tz)
+
+    def add_job(self, name: str, func, trigger, misfire_grace: float = None):
+        """func: zero-argument coroutine function."""
+        grace = self.misfire_grace if misfire_grace is None else misfire_grace
+        # run time, errors and in-flight count per job (handlers.metrics)
+        job = Job(name, metrics.instrument(name, func, kind="job"), trigger, grace)
+        job.next_run = trigger.first_run(self.now(), grace)
+        self.jobs[name] = job
+        self._push(job)
+        logger.info(f"Scheduled job {name}: next run {job.next_run.isoformat()}")
+        return job
+
+    def _push(self, job: Job):
+        heapq.heappush(self._heap, (job.next_run.timestamp(), next(self._seq), job))
+        self._wake.set()
+
+    async def run(self):
+        try:
+            await self._loop()
+        finally:
+            # Stopped (shutdown, or this instance lost leadership): don't
+            # leave jobs running that another instance may now start too
+            running = [job.task for job in self.jobs.values() if job.task and not job.task.done()]
+            for task in running:
+                task.cancel()
+            await asyncio.gather(*running, return_exceptions=True)
+
+    async def _loop(self):
+        while True:
+            if not self._heap:
+                self._wake.clear()
+                await self._wake.wait()
+                continue
+            due_at, _, job = self._heap[0]
+            delay = due_at - self.now().timestamp()
+            if delay > 0:
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout=min(delay, MAX_SLEEP))
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            heapq.heappop(self._heap)
+            lateness = -delay
+            if lateness > job.misfire_grace:
+                logger.warning(f"Job {job.name} misfired by {lateness:.0f}s, skipping this run")
+            elif job.task and not job.task.done():
+                logger.warning(f"Job {job.name} still running, skipping this run")
+            else:
+                job.task = asyncio.create_task(self._run_job(job))
+            job.next_run = job.trigger.next_after(max(self.now(), job.next_run))
+            self._push(job)
+
+    async def _run_job(self, job: Job):
+        try:
+            await job.func()
+        except Exception as e:
+            logger.error(f"Job {job.name} failed: {e}")
+
+
+async def supervise(name: str, coro_fn, max_backoff: float = 60):
+    """Run a long-lived coroutine forever, restarting it (with backoff) if it dies."""
+    backoff = 1
+    while True:
+        try:
+            await coro_fn()
+            logger.warning(f"Background task {name} exited, restarting")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Background task {name} crashed: {e}; restarting in {backoff}s")
+        await asyncio.sleep(backoff)
+        backoff = min(max_backoff, backoff * 2)
@@ -0,0 +1,252 @@
+import asyncio
+import fcntl
+import json
+import logging
+import os
+import socket
+import sqlite3
+import time
+import uuid
+from abc import ABC, abstractmethod
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+
+# --- Lease backends ---
+class Lease(ABC):
+    """
+    A named lease held by at most one owner until `expires_at` (epoch
+    seconds, shared between processes). Backends: FileLease, SqliteLease.
+    """
+
+    @abstractmethod
+    def try_acquire(self, owner: str, ttl: float) -> bool:
+        """Take the lease if it is free or expired, or renew it if `owner` holds it."""
+
+    @abstractmethod
+    def release(self, owner: str) -> None:
+        """Give the lease up now (only if `owner` holds it), so another instance can take over."""
+
+    @abstractmethod
+    def current(self):
+        """(owner, expires_at) of the present holder, or (None, 0)."""
+
+    def close(self):
+        pass
+
+
+class FileLease(Lease):
+    """
+    Lease in a small JSON file, read and rewritten under an exclusive
+    flock() on a sidecar lock file. For instances sharing one host or disk.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._lock_path = path.with_suffix(path.suffix + ".lock")
+
+    def _locked(self, update):
+        with open(self._lock_path, "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                state = json.loads(self.path.read_text()) if self.path.exists() else {}
+            except ValueError:
+                state = {}
+            new_state, result = update(state)
+            if new_state is not state:
+                tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+                tmp.write_text(json.dumps(new_state))
+                os.replace(tmp, self.path)
+            return result
+
+    def try_acquire(self, owner, ttl):
+        def update(state):
+            now = time.time()
+            if state.get("owner") not in (None, owner) and state.get("expires_at", 0) > now:
+                return state, False
+            return {"owner": owner, "expires_at": now + ttl}, True
+        return self._locked(update)
+
+    def release(self, owner):
+        def update(state):
+            if state.get("owner") != owner:
+                return state, None
+            return {}, None
+        self._locked(update)
+
+    def current(self):
+        def read(state):
+            if state.get("expires_at", 0) <= time.time():
+                return state, (None, 0)
+            return state, (state.get("owner"), state["expires_at"])
+        return self._locked(read)
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS leases (
+    name TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+"""
+
+
+class SqliteLease(Lease):
+    """
+    One row per lease name; take/renew is a single conditional upsert, so
+    SQLite's write lock makes it atomic across processes. Can live in the
+    bot's own database file.
+    """
+
+    def __init__(self, path: Path, name: str = "background-jobs"):
+        self.path = path
+        self.name = name
+        self.conn = sqlite3.connect(str(path), isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA busy_timeout=5000")
+        self.conn.executescript(_SCHEMA)
+
+    def try_acquire(self, owner, ttl):
+        now = time.time()
+        cur = self.conn.execute(
+            "INSERT INTO leases VALUES (?, ?, ?) ON CONFLICT(name) DO UPDATE "
+            "SET owner = excluded.owner, expires_at = excluded.expires_at "
+            "WHERE leases.owner = excluded.owner OR leases.expires_at <= ?",
+            (self.name, owner, now + ttl, now),
+        )
+        return cur.rowcount > 0
+
+    def release(self, owner):
+        self.conn.execute("DELETE FROM leases WHERE name = ? AND owner = ?", (self.name, owner))
+
+    def current(self):
+        row = self.conn.execute(
+            "SELECT owner, expires_at FROM leases WHERE name = ? AND expires_at > ?",
+            (self.name, time.time()),
+        ).fetchone()
+        return tuple(row) if row else (None, 0)
+
+    def close(self):
+        self.conn.close()
+
+
+# --- Leader election ---
+class LeaderElector:
+    """
+    Runs background work on exactly one instance. Every instance calls
+    lead(work): the one holding the lease runs `work` and renews the lease
+    every `renew_every` seconds; the others wait and retry, waking right
+    when the current lease expires. A leader that loses the lease (or can't
+    renew it before it runs out) cancels its work first; a clean shutdown
+    releases the lease so a standby takes over within one retry.
+    """
+
+    def __init__(self, lease: Lease, owner: str = None, ttl: float = 15, renew_every: float = None):
+        self.lease = lease
+        self.owner = owner or default_owner()
+        self.ttl = ttl
+        self.renew_every = renew_every or ttl / 3
+        self.is_leader = False
+        self.elections = 0  # times this instance became leader
+        self._valid_until = 0.0  # monotonic deadline of the lease we hold
+
+    async def _try_acquire(self) -> bool:
+        started = time.monotonic()
+        try:
+            acquired = await asyncio.to_thread(self.lease.try_acquire, self.owner, self.ttl)
+        except Exception as e:
+            logger.warning(f"Leader lease check failed: {e}")
+            return False
+        if acquired:
+            # measured from before the call, so we never think we hold it longer than we do
+            self._valid_until = started + self.ttl
+        return acquired
+
+    async def _wait_for_lease(self):
+        while not await self._try_acquire():
+            try:
+                _, expires_at = await asyncio.to_thread(self.lease.current)
+            except Exception:
+                expires_at = 0
+            # retry at the latest when the holder's lease runs out
+            until_expiry = expires_at - time.time() + 0.05
+            await asyncio.sleep(max(0.05, min(self.renew_every, until_expiry)))
+
+    async def _hold(self):
+        """Renew until the lease is lost; returns when this instance must step down."""
+        while True:
+            await asyncio.sleep(max(0.0, min(self.renew_every, self._valid_until - time.monotonic())))
+            if await self._try_acquire():
+                continue
+            if time.monotonic() >= self._valid_until:
+                return
+            try:
+                owner, _ = await asyncio.to_thread(self.lease.current)
+            except Exception:
+                continue  # storage hiccup: keep working while our lease is still valid
+            if owner != self.owner:
+                return
+
+    async def lead(self, work):
+        """Forever: wait for the lease, run `work()` while holding it."""
+        while True:
+            await self._wait_for_lease()
+            self.is_leader = True
+            self.elections += 1
+            logger.info(f"{self.owner} is now the leader, starting background jobs")
+            task = asyncio.create_task(work())
+            holder = asyncio.create_task(self._hold())
+            try:
+                await asyncio.wait({task, holder}, return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                self.is_leader = False
+                for t in (task, holder):
+                    t.cancel()
+                await asyncio.gather(task, holder, return_exceptions=True)
+                if holder.done() and not holder.cancelled():
+                    logger.warning(f"{self.owner} lost the leader lease, background jobs stopped")
+                else:
+                    await asyncio.to_thread(self.lease.release, self.owner)
+            if task.done() and not task.cancelled() and task.exception():
+                raise task.exception()
+
+    def stats(self) -> dict:
+        owner, expires_at = self.lease.current()
+        return {
+            "owner": self.owner,
+            "is_leader": self.is_leader,
+            "leader": owner,
+            "lease_expires_in": round(max(0.0, expires_at - time.time()), 1),
+            "elections": self.elections,
+        }
+
+    def collect(self):
+        """metrics.Registry collector."""
+        yield ("bot_is_leader", "1 on the instance running background jobs", "gauge",
+               {(): int(self.is_leader)}, ())
+
+
+def default_owner() -> str:
+    """Unique per process: host (or Render instance), pid and a random suffix."""
+    host = os.getenv("RENDER_INSTANCE_ID") or socket.gethostname()
+    return f"{host}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+
+def elector_from(config: dict):
+    """leader section of config.yaml; None when leader election is off."""
+    settings = config.get("leader", {})
+    if not settings.get("enabled", True):
+        return None
+    storage_settings = config.get("storage", {})
+    backend = settings.get("backend") or (
+        "file" if storage_settings.get("backend", "sqlite") == "json" else "sqlite"
+    )
+    if backend == "file":
+        lease = FileLease(Path(settings.get("path") or "leader.lease"))
+    else:
+        lease = SqliteLease(Path(settings.get("path") or storage_settings.get("path", "bot.db")))
+    return LeaderElector(
+        lease,
+        ttl=settings.get("ttl_seconds", 15),
+        renew_every=settings.get("renew_seconds", 5),
+    )
@@ -0,0 +1,111 @@
+from dataclasses import dataclass
+from datetime import date
+
+
+@dataclass(slots=True, frozen=True)
+class Listing:
+    """One Earn listing (bounty, project or grant), normalized."""
+
+    slug: str
+    title: str
+    token: str = ""
+    reward_amount: float = None
+    deadline: str = None  # "YYYY-MM-DD"
+    type: str = "bounty"
+
+    @property
+    def reward(self) -> str:
+        if not self.reward_amount:
+            return "N/A"
+        amount = int(self.reward_amount) if float(self.reward_amount).is_integer() else self.reward_amount
+        return f"{amount} {self.token}".strip()
+
+    @property
+    def link(self) -> str:
+        return f"https://earn.superteam.fun/listing/{self.slug}" if self.slug else "#"
+
+    def deadline_date(self):
+        try:
+            return date.fromisoformat(self.deadline) if self.deadline else None
+        except ValueError:
+            return None
+
+
+def parse_listing(item: dict):
+    """Listing from one Earn API result, or None if it has no slug/title."""
+    slug = item.get("slug") or ""
+    title = item.get("title") or ""
+    if not (slug or title):
+        return None
+    try:
+        amount = float(item["rewardAmount"]) if item.get("rewardAmount") else None
+    except (TypeError, ValueError):
+        amount = None
+    deadline = item.get("deadline")
+    return Listing(
+        slug=slug,
+        title=title or "No title",
+        token=item.get("token") or "",
+        reward_amount=amount,
+        deadline=deadline[:10] if isinstance(deadline, str) else None,
+        type=item.get("type") or "bounty",
+    )
+
+
+class ListingIndex:
+    """
+    Every known open listing, keyed by slug, in feed order. Each update()
+    bumps `revision` and records the revision a slug first appeared in, so
+    consumers diff against the index (added_since) instead of refetching.
+    """
+
+    def __init__(self):
+        self.by_slug = {}
+        self.revision = 0
+        self._added_in = {}  # slug → revision it first appeared in
+
+    def __len__(self):
+        return len(self.by_slug)
+
+    def update(self, listings) -> dict:
+        """Replace the index contents; returns {"added", "changed", "removed"} slugs."""
+        self.revision += 1
+        new = {}
+        for listing in listings:
+            new.setdefault(listing.slug or listing.title, listing)
+        added = [s for s in new if s not in self.by_slug]
+        changed = [s for s in new if s in self.by_slug and self.by_slug[s] != new[s]]
+        removed = [s for s in self.by_slug if s not in new]
+        for slug in added:
+            self._added_in[slug] = self.revision
+        for slug in removed:
+            self._added_in.pop(slug, None)
+        self.by_slug = new
+        return {"added": added, "changed": changed, "removed": removed}
+
+    def listings(self) -> list:
+        return list(self.by_slug.values())
+
+    def added_since(self, revision: int) -> list:
+        return [l for s, l in self.by_slug.items() if self._added_in.get(s, 0) > revision]
+
+    def filter(self, token: str = None, min_reward: float = None, max_reward: float = None,
+               due_within_days: int = None, today: date = None) -> list:
+        """Listings matching every given criterion, soonest deadline first."""
+        today = today or date.today()
+        token = token.upper() if token else None
+        matches = []
+        for listing in self.by_slug.values():
+            if token and listing.token.upper() != token:
+                continue
+            amount = listing.reward_amount or 0
+            if min_reward is not None and amount < min_reward:
+                continue
+            if max_reward is not None and amount > max_reward:
+                continue
+            due = listing.deadline_date()
+            if due_within_days is not None and (due is None or not 0 <= (due - today).days <= due_within_days):
+                continue
+            matches.append(listing)
+        matches.sort(key=lambda l: l.deadline_date() or date.max)
+        return matches
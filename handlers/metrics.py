@@ -0,0 +1,341 @@
+import functools
+import hmac
+import logging
+import os
+import time
+from bisect import bisect_left
+
+import httpx
+from telegram.request import HTTPXRequest
+
+from handlers import httpserver
+
+logger = logging.getLogger(__name__)
+
+# Latency buckets in seconds: 1 ms … 30 s (OpenAI answers can take a while)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _label_text(names, values, extra="") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    """Monotonic count per label values, e.g. errors by handler."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+
+    def inc(self, *label_values, amount: float = 1):
+        self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def value(self, *label_values) -> float:
+        return self._values.get(label_values, 0)
+
+    def samples(self):
+        for values, count in self._values.items():
+            yield self.name + _label_text(self.labels, values), count
+
+
+class Gauge(Counter):
+    """A value that goes up and down, e.g. requests in flight."""
+
+    kind = "gauge"
+
+    def dec(self, *label_values, amount: float = 1):
+        self._values[label_values] = self._values.get(label_values, 0) - amount
+
+    def set(self, value: float, *label_values):
+        self._values[label_values] = value
+
+
+class Histogram:
+    """
+    Fixed-bucket latency histogram per label values. observe() is one dict
+    lookup, one bisect and three additions; cumulative counts are only
+    built when scraped.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # label values -> [per-bucket counts (+Inf last), sum, count]
+
+    def observe(self, value: float, *label_values):
+        series = self._series.get(label_values)
+        if series is None:
+            series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def count(self, *label_values) -> int:
+        series = self._series.get(label_values)
+        return series[2] if series else 0
+
+    def quantile(self, q: float, *label_values) -> float:
+        """Estimate from the buckets (linear within a bucket), like histogram_quantile()."""
+        series = self._series.get(label_values)
+        if not series or not series[2]:
+            return 0.0
+        rank = q * series[2]
+        seen = 0
+        lower = 0.0
+        for bound, n in zip(self.buckets + (float("inf"),), series[0]):
+            if seen + n >= rank and n:
+                if bound == float("inf"):
+                    return lower
+                return lower + (bound - lower) * (rank - seen) / n
+            seen += n
+            lower = bound
+        return lower
+
+    def samples(self):
+        for values, (counts, total, count) in self._series.items():
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                yield self.name + "_bucket" + _label_text(self.labels, values, f'le="{bound}"'), cumulative
+            yield self.name + "_bucket" + _label_text(self.labels, values, 'le="+Inf"'), count
+            yield self.name + "_sum" + _label_text(self.labels, values), total
+            yield self.name + "_count" + _label_text(self.labels, values), count
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+        self.collectors = {}  # name -> callable run at scrape time, see add_collector()
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def add_collector(self, name: str, fn):
+        """
+        fn() → iterable of (metric name, help, kind, {label values: value}, label names).
+        Adding under an existing name replaces that collector.
+        """
+        self.collectors[name] = fn
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(f"{name} {value}" for name, value in metric.samples())
+        for collector, collect in self.collectors.items():
+            try:
+                families = list(collect())
+            except Exception as e:
+                logger.warning(f"Metrics collector {collector} failed: {e}")
+                continue
+            for name, help, kind, values, labels in families:
+                lines.append(f"# HELP {name} {help}")
+                lines.append(f"# TYPE {name} {kind}")
+                lines.extend(f"{name}{_label_text(labels, key)} {value}" for key, value in values.items())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+HANDLER_SECONDS = REGISTRY.register(Histogram("bot_handler_seconds", "Update handler latency", ["handler"]))
+HANDLER_ERRORS = REGISTRY.register(Counter("bot_handler_errors_total", "Update handlers that raised", ["handler"]))
+HANDLER_IN_FLIGHT = REGISTRY.register(Gauge("bot_handler_in_flight", "Update handlers running now", ["handler"]))
+
+JOB_SECONDS = REGISTRY.register(Histogram("bot_job_seconds", "Background job run time", ["job"]))
+JOB_ERRORS = REGISTRY.register(Counter("bot_job_errors_total", "Background job runs that raised", ["job"]))
+JOB_IN_FLIGHT = REGISTRY.register(Gauge("bot_job_in_flight", "Background jobs running now", ["job"]))
+
+HTTP_SECONDS = REGISTRY.register(Histogram(
+    "bot_http_request_seconds", "Outbound HTTP time to response headers", ["host", "method"]))
+HTTP_ERRORS = REGISTRY.register(Counter(
+    "bot_http_errors_total", "Outbound HTTP failures (4xx/5xx status or exception)", ["host", "kind"]))
+HTTP_IN_FLIGHT = REGISTRY.register(Gauge("bot_http_in_flight", "Outbound HTTP requests open now", ["host"]))
+
+TELEGRAM_SECONDS = REGISTRY.register(Histogram("bot_telegram_api_seconds", "Bot API call latency", ["method"]))
+TELEGRAM_ERRORS = REGISTRY.register(Counter(
+    "bot_telegram_api_errors_total", "Bot API calls answered with an error status", ["method"]))
+
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "bot_stage_seconds", "Time spent in a named step of a handler or job", ["stage"]))
+
+_KINDS = {
+    "handler": (HANDLER_SECONDS, HANDLER_ERRORS, HANDLER_IN_FLIGHT),
+    "job": (JOB_SECONDS, JOB_ERRORS, JOB_IN_FLIGHT),
+}
+
+
+def instrument(name: str, func, kind: str = "handler"):
+    """Wrap an async callable with latency, error and in-flight metrics."""
+    seconds, errors, in_flight = _KINDS[kind]
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        in_flight.inc(name)
+        start = time.perf_counter()
+        try:
+            return await func(*args, **kwargs)
+        except Exception:
+            errors.inc(name)
+            raise
+        finally:
+            seconds.observe(time.perf_counter() - start, name)
+            in_flight.dec(name)
+
+    return wrapper
+
+
+class stage:
+    """
+    Time a block: `with metrics.stage("faq.openai"): ...`. Works around
+    awaits too (it measures wall time).
+    """
+
+    __slots__ = ("name", "start")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        STAGE_SECONDS.observe(time.perf_counter() - self.start, self.name)
+        return False
+
+
+class InstrumentedTransport(httpx.AsyncBaseTransport):
+    """httpx transport wrapper: per-host latency, errors and in-flight gauge."""
+
+    def __init__(self, transport):
+        self._transport = transport
+
+    async def handle_async_request(self, request):
+        host = request.url.host
+        HTTP_IN_FLIGHT.inc(host)
+        start = time.perf_counter()
+        try:
+            response = await self._transport.handle_async_request(request)
+        except Exception as e:
+            HTTP_ERRORS.inc(host, type(e).__name__)
+            raise
+        finally:
+            HTTP_SECONDS.observe(time.perf_counter() - start, host, request.method)
+            HTTP_IN_FLIGHT.dec(host)
+        if response.status_code >= 400:
+            HTTP_ERRORS.inc(host, f"{response.status_code // 100}xx")
+        return response
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+
+class BotAPIRequest(HTTPXRequest):
+    """PTB request backend that records per-method Bot API latency (reply_text → sendMessage)."""
+
+    async def do_request(self, url: str, method: str, *args, **kwargs):
+        api_method = url.rsplit("/", 1)[-1]
+        start = time.perf_counter()
+        try:
+            code, payload = await super().do_request(url, method, *args, **kwargs)
+        except Exception:
+            TELEGRAM_ERRORS.inc(api_method)
+            raise
+        finally:
+            TELEGRAM_SECONDS.observe(time.perf_counter() - start, api_method)
+        if code >= 400:
+            TELEGRAM_ERRORS.inc(api_method)
+        return code, payload
+
+
+# --- /stats and the scrape endpoint ---
+
+def admin_ids(config: dict) -> set:
+    """metrics.admin_ids from config.yaml plus $ADMIN_IDS (comma separated)."""
+    ids = {int(i) for i in config.get("metrics", {}).get("admin_ids", []) or []}
+    ids.update(int(i) for i in os.getenv("ADMIN_IDS", "").replace(" ", "").split(",") if i)
+    return ids
+
+
+def summary() -> str:
+    """Compact text for /stats: p50/p95, counts and errors per handler, job, host and stage."""
+    lines = []
+
+    def section(title, histogram, errors=None):
+        rows = []
+        for key in sorted(histogram._series):
+            label = "/".join(str(k) for k in key)
+            count = histogram.count(*key)
+            failed = sum(v for k, v in errors._values.items() if k[0] == key[0]) if errors else 0
+            rows.append(
+                f"  {label}: {count}× p50 {histogram.quantile(0.5, *key) * 1000:.0f} ms"
+                f" p95 {histogram.quantile(0.95, *key) * 1000:.0f} ms"
+                + (f", {failed:.0f} errors" if failed else "")
+            )
+        if rows:
+            lines.append(title)
+            lines.extend(rows)
+
+    section("Handlers", HANDLER_SECONDS, HANDLER_ERRORS)
+    section("Stages", STAGE_SECONDS)
+    section("Jobs", JOB_SECONDS, JOB_ERRORS)
+    section("HTTP", HTTP_SECONDS, HTTP_ERRORS)
+    section("Bot API", TELEGRAM_SECONDS, TELEGRAM_ERRORS)
+    return "\n".join(lines) or "No requests recorded yet."
+
+
+def authorized(headers: dict, token: str) -> bool:
+    """Bearer-token check for the scrape endpoint (open when no token is set)."""
+    if not token:
+        return True
+    return hmac.compare_digest(headers.get("authorization", ""), f"Bearer {token}")
+
+
+def scrape(method: str, headers: dict, token: str):
+    """(status, payload) for a request to the metrics path, on either server."""
+    if method != "GET":
+        return 405, {"ok": False}
+    if not authorized(headers, token):
+        return 403, {"ok": False}
+    return 200, REGISTRY.render()
+
+
+class MetricsServer(httpserver.HttpServer):
+    """
+    Stand-alone GET /metrics listener for polling mode (in webhook mode the
+    webhook server answers /metrics itself).
+    """
+
+    idle_timeout = 10  # scrapers reconnect; don't keep their connections around
+
+    def __init__(self, path: str = "/metrics", token: str = ""):
+        super().__init__(max_connections=16)
+        self.path = path
+        self.token = token
+
+    async def start(self, host: str, port: int):
+        await super().start(host, port)
+        logger.info(f"Metrics on http://{host}:{self.port}{self.path}")
+
+    async def route(self, method, path, headers, body):
+        if path != self.path:
+            return 404, {"ok": False}
+        return scrape(method, headers, self.token)
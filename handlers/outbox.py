@@ -0,0 +1,190 @@
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+from pathlib import Path
+from telegram import Bot
+
+from handlers import broadcast
+
+logger = logging.getLogger(__name__)
+
+
+class Outbox:
+    """
+    Durable alert outbox: an append-only JSON-lines journal on disk.
+
+    - {"op": "add", "alert": id, "text": ..., "chat_ids": [...]} — one pending
+      job per (alert, recipient), fsynced before the alert counts as queued
+    - {"op": "done", "alert": id, "chat_ids": [...]} — delivered, refused by
+      Telegram (BadRequest) or given up after max_attempts
+
+    run() replays the journal when the worker starts, which gives back every
+    unfinished send, so a crash, redeploy or leader change mid-broadcast only
+    resumes instead of losing recipients. Nothing is read or rewritten
+    before that: a standby replica never touches the file. Finished entries
+    are compacted out by rewriting the file.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        batch_size: int = 200,
+        max_attempts: int = 8,
+        base_backoff: float = 5,
+        max_backoff: float = 900,
+        compact_after: int = 1000,
+    ):
+        self.path = path
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.compact_after = compact_after
+        self.alerts = {}      # alert id → {"text", "kwargs", "pending": set of chat ids}
+        self._retry = {}      # (alert id, chat id) → (attempts, next attempt at)
+        self._done_since_compact = 0
+        self._wake = asyncio.Event()
+
+    # --- journal ---
+    def load(self):
+        """Rebuild the pending jobs from the journal (the file is the source of truth)."""
+        self.alerts = {}
+        self._retry = {}
+        if not self.path.exists():
+            return
+        for line in self.path.read_text(encoding="utf-8").splitlines():
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # torn last line from a crash mid-write
+            if record["op"] == "add":
+                self.alerts[record["alert"]] = {
+                    "text": record["text"],
+                    "kwargs": record.get("kwargs", {}),
+                    "pending": set(record["chat_ids"]),
+                }
+            elif record["op"] == "done" and record["alert"] in self.alerts:
+                self.alerts[record["alert"]]["pending"].difference_update(record["chat_ids"])
+        self._compact()
+        if self.pending_count():
+            logger.info(f"Outbox: resuming {self.pending_count()} unfinished sends")
+
+    def _append(self, record: dict):
+        with self.path.open("a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _compact(self):
+        self.alerts = {k: a for k, a in self.alerts.items() if a["pending"]}
+        tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        with tmp.open("w", encoding="utf-8") as f:
+            for alert_id, alert in self.alerts.items():
+                f.write(json.dumps({
+                    "op": "add", "alert": alert_id, "text": alert["text"],
+                    "kwargs": alert["kwargs"], "chat_ids": sorted(alert["pending"]),
+                }, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+        self._done_since_compact = 0
+
+    def pending_count(self) -> int:
+        return sum(len(a["pending"]) for a in self.alerts.values())
+
+    def enqueue(self, text: str, chat_ids, **send_kwargs) -> str:
+        """Persist one job per recipient and wake the worker."""
+        chat_ids = list(dict.fromkeys(chat_ids))
+        alert_id = uuid.uuid4().hex[:12]
+        if chat_ids:
+            self._append({"op": "add", "alert": alert_id, "text": text,
+                          "kwargs": send_kwargs, "chat_ids": chat_ids})
+            self.alerts[alert_id] = {"text": text, "kwargs": send_kwargs, "pending": set(chat_ids)}
+            self._wake.set()
+        return alert_id
+
+    def _mark_done(self, alert_id: str, chat_ids):
+        if not chat_ids:
+            return
+        self._append({"op": "done", "alert": alert_id, "chat_ids": list(chat_ids)})
+        self.alerts[alert_id]["pending"].difference_update(chat_ids)
+        for chat_id in chat_ids:
+            self._retry.pop((alert_id, chat_id), None)
+        self._done_since_compact += len(chat_ids)
+
+    # --- delivery ---
+    def _due(self, alert_id: str, now: float):
+        return [
+            c for c in self.alerts[alert_id]["pending"]
+            if self._retry.get((alert_id, c), (0, 0.0))[1] <= now
+        ]
+
+    def _next_due_in(self, now: float):
+        waits = [
+            self._retry.get((alert_id, c), (0, 0.0))[1] - now
+            for alert_id, alert in self.alerts.items()
+            for c in alert["pending"]
+        ]
+        return max(0.0, min(waits)) if waits else None
+
+    async def drain(self, bot: Bot, on_forbidden=None):
+        """Deliver every job that is due, in batches journaled as they finish."""
+        now = time.monotonic()
+        for alert_id in list(self.alerts):
+            alert = self.alerts[alert_id]
+            due = self._due(alert_id, now)
+            for i in range(0, len(due), self.batch_size):
+                done, failed = [], []
+
+                def forbidden(chat_id):
+                    done.append(chat_id)
+                    if on_forbidden:
+                        on_forbidden(chat_id)
+
+                stats = await broadcast.broadcast(
+                    bot,
+                    due[i:i + self.batch_size],
+                    alert["text"],
+                    on_sent=done.append,
+                    on_failed=failed.append,
+                    on_forbidden=forbidden,
+                    on_rejected=done.append,  # refused (e.g. BadRequest): resending won't help
+                    **alert["kwargs"],
+                )
+                logger.info(f"Outbox alert {alert_id}: {stats}")
+                self._schedule_retries(alert_id, failed, done)
+                self._mark_done(alert_id, done)
+
+        if self._done_since_compact and (
+            self._done_since_compact >= self.compact_after or not self.pending_count()
+        ):
+            self._compact()
+
+    def _schedule_retries(self, alert_id: str, failed, done):
+        for chat_id in failed:
+            attempts = self._retry.get((alert_id, chat_id), (0, 0.0))[0] + 1
+            if attempts >= self.max_attempts:
+                logger.warning(f"Outbox: giving up on {chat_id} for alert {alert_id}")
+                done.append(chat_id)
+                continue
+            delay = min(self.max_backoff, self.base_backoff * 2 ** (attempts - 1))
+            self._retry[(alert_id, chat_id)] = (attempts, time.monotonic() + delay)
+
+    async def run(self, bot: Bot, on_forbidden=None):
+        """Worker loop: replay the journal, then drain and sleep until new jobs or the next retry."""
+        self.load()
+        while True:
+            self._wake.clear()
+            try:
+                await self.drain(bot, on_forbidden)
+            except Exception as e:
+                logger.error(f"Outbox worker error: {e}")
+                await asyncio.sleep(self.base_backoff)
+            wait = self._next_due_in(time.monotonic())
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=wait if wait is not None else None)
+            except asyncio.TimeoutError:
+                pass
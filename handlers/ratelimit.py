@@ -0,0 +1,212 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict, deque
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """
+    Classic token bucket: `rate` tokens per second, holding at most `burst`.
+    acquire() waits (FIFO) until a token is available; pause() blocks the
+    whole bucket, e.g. when Telegram answers with RetryAfter.
+    """
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = burst
+        self._stamp = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float):
+        if now <= self._stamp:
+            return
+        self.tokens = min(self.capacity, self.tokens + (now - self._stamp) * self.rate)
+        self._stamp = now
+
+    def try_acquire(self, n: float = 1) -> bool:
+        now = time.monotonic()
+        if now < self._blocked_until:
+            return False
+        self._refill(now)
+        if self.tokens >= n:
+            self.tokens -= n
+            return True
+        return False
+
+    def delay(self, n: float = 1) -> float:
+        """Seconds until n tokens would be available (0 if available now)."""
+        now = time.monotonic()
+        self._refill(now)
+        wait = max(0.0, self._blocked_until - now)
+        return max(wait, (n - self.tokens) / self.rate) if self.tokens < n else wait
+
+    async def acquire(self, n: float = 1):
+        async with self._lock:
+            while not self.try_acquire(n):
+                await asyncio.sleep(self.delay(n))
+
+    def pause(self, seconds: float):
+        self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+        # Start refilling from empty once the pause is over
+        self.tokens = 0
+        self._stamp = self._blocked_until
+
+
+class KeyedBuckets:
+    """
+    One TokenBucket per key (chat, user…), LRU-bounded to `max_keys`.
+    An evicted key simply starts over with a full bucket, which is what an
+    idle key would have refilled to anyway.
+    """
+
+    def __init__(self, rate: float, burst: float, max_keys: int = 10_000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+
+    def get(self, key) -> TokenBucket:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(self.rate, self.burst)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        return bucket
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+SENT = "sent"
+QUEUED = "queued"
+REJECTED = "rejected"
+
+
+class ReplyLimiter:
+    """
+    Rate limits for replies to people: a token bucket per chat and one per
+    user. submit() delivers right away when both have a token. A user out of
+    tokens is rejected. A chat out of tokens queues the request (up to
+    `queue_size`, if it would wait at most `max_wait` seconds); a background
+    drainer answers queued requests as tokens come back, up to `batch_size`
+    per delivery, so a busy group gets one combined reply instead of several.
+
+    The handler never waits for tokens itself, so it does not hold up the
+    chat's other updates (see handlers.updates). Queued batches are
+    delivered from the drainer's task, through `dispatch(chat_id, coroutine)`
+    when set (the bot routes them through its update processor, so they
+    keep the chat's order and the LLM lane's limit), else awaited directly.
+    """
+
+    def __init__(self, chat_rate: float, chat_burst: float, user_rate: float, user_burst: float,
+                 max_keys: int = 10_000, queue_size: int = 5, max_wait: float = 60,
+                 batch_size: int = 3):
+        self.chats = KeyedBuckets(chat_rate, chat_burst, max_keys)
+        self.users = KeyedBuckets(user_rate, user_burst, max_keys)
+        self.queue_size = queue_size
+        self.max_wait = max_wait
+        self.batch_size = max(1, batch_size)
+        self.counts = {SENT: 0, QUEUED: 0, REJECTED: 0, "batches": 0}
+        self._queues = {}   # chat_id -> deque of (item, deliver), only while non-empty
+        self._tasks = set()
+        self.dispatch = None
+
+    async def submit(self, chat_id, user_id, item, deliver) -> str:
+        """
+        deliver(items) is awaited with [item] now, or later with a batch of
+        queued items. chat_id=None skips the chat bucket (e.g. private
+        chats), user_id=None the user bucket. The user's token is only spent
+        once the request is sent or queued, not when the chat turns it away.
+        """
+        user = self.users.get(user_id) if user_id is not None else None
+        if user is not None and user.delay() > 0:
+            self.counts[REJECTED] += 1
+            return REJECTED
+        if chat_id is None:
+            self._accept(user, SENT)
+            await deliver([item])
+            return SENT
+
+        bucket = self.chats.get(chat_id)
+        queue = self._queues.get(chat_id)
+        if not queue and bucket.try_acquire():
+            self._accept(user, SENT)
+            await deliver([item])
+            return SENT
+
+        waiting = len(queue) if queue else 0
+        expected_wait = bucket.delay() + (waiting // self.batch_size) / bucket.rate
+        if waiting >= self.queue_size or expected_wait > self.max_wait:
+            self.counts[REJECTED] += 1
+            return REJECTED
+        if queue is None:
+            queue = self._queues[chat_id] = deque()
+            task = asyncio.create_task(self._drain(chat_id, bucket, queue))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        queue.append((item, deliver))
+        self._accept(user, QUEUED)
+        return QUEUED
+
+    def _accept(self, user, outcome: str):
+        # no await since submit() checked delay(), so the token is still there
+        if user is not None:
+            user.try_acquire()
+        self.counts[outcome] += 1
+
+    async def _drain(self, chat_id, bucket: TokenBucket, queue: deque):
+        try:
+            while queue:
+                await bucket.acquire()
+                deliver = queue[0][1]
+                batch = []
+                while queue and len(batch) < self.batch_size and queue[0][1] is deliver:
+                    batch.append(queue.popleft()[0])
+                self.counts["batches"] += 1
+                try:
+                    if self.dispatch:
+                        await self.dispatch(chat_id, deliver(batch))
+                    else:
+                        await deliver(batch)
+                except Exception as e:
+                    logger.error(f"Queued reply for chat {chat_id} failed: {e}")
+        finally:
+            if self._queues.get(chat_id) is queue:
+                del self._queues[chat_id]
+
+    def queued(self) -> int:
+        return sum(len(q) for q in self._queues.values())
+
+    def stats(self) -> dict:
+        return {**self.counts, "queued_now": self.queued(),
+                "chats": len(self.chats), "users": len(self.users)}
+
+    def collect(self):
+        """metrics.Registry collector."""
+        yield ("bot_reply_limit_total", "Rate-limited replies by outcome", "counter",
+               {(k,): v for k, v in self.counts.items()}, ("outcome",))
+        yield ("bot_reply_queue_depth", "Questions waiting for a group's cooldown", "gauge",
+               {(): self.queued()}, ())
+
+
+def reply_limiter_from(config: dict) -> ReplyLimiter:
+    """ratelimit section of config.yaml."""
+    settings = config.get("ratelimit", {})
+    group = settings.get("group", {})
+    user = settings.get("user", {})
+    return ReplyLimiter(
+        chat_rate=group.get("rate_per_second", 0.1),
+        chat_burst=group.get("burst", 1),
+        user_rate=user.get("rate_per_second", 0.05),
+        user_burst=user.get("burst", 3),
+        max_keys=settings.get("max_keys", 10_000),
+        queue_size=settings.get("queue_size", 5),
+        max_wait=settings.get("max_wait_seconds", 60),
+        batch_size=settings.get("batch_size", 3),
+    )
@@ -0,0 +1,116 @@
+import math
+import re
+from collections import Counter
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Local BM25 retrieval over the FAQ knowledge base (pure Python, no network)
+# ──────────────────────────────────────────────────────────────────────────────
+_WORD = re.compile(r"[a-z0-9]+")
+_HEADING = re.compile(r"^\s{0,3}#{1,6}\s")
+
+STOPWORDS = frozenset("""
+a an and are as at be but by can do does for from has have how i if in into is it
+its me my of on or our so that the their them there these they this to us was we
+what when where which who why will with you your
+""".split())
+
+
+def tokenize(text: str):
+    return [w for w in _WORD.findall(text.lower()) if w not in STOPWORDS]
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough LLM token count (~4 chars per token), good enough for budgeting."""
+    return len(text) // 4 + 1
+
+
+class Chunk:
+    __slots__ = ("title", "text", "order", "rendered")
+
+    def __init__(self, title: str, text: str, order: int):
+        self.title = title
+        self.text = text
+        self.order = order
+        self.rendered = text  # callers may store a pre-rendered form here
+
+
+def split_chunks(docs: dict, chunk_tokens: int = 160):
+    """
+    Split {title: markdown} into chunks of whole paragraphs, starting a new
+    chunk at every heading or when the chunk would exceed chunk_tokens.
+    """
+    chunks = []
+    for title, md in docs.items():
+        current = []
+        size = 0
+        for para in re.split(r"\n\s*\n", md.strip()):
+            para = para.strip()
+            if not para:
+                continue
+            para_size = estimate_tokens(para)
+            if current and (_HEADING.match(para) or size + para_size > chunk_tokens):
+                chunks.append(Chunk(title, "\n\n".join(current), len(chunks)))
+                current, size = [], 0
+            current.append(para)
+            size += para_size
+        if current:
+            chunks.append(Chunk(title, "\n\n".join(current), len(chunks)))
+    return chunks
+
+
+class BM25Index:
+    def __init__(self, chunks, k1: float = 1.5, b: float = 0.75):
+        self.chunks = chunks
+        self.k1 = k1
+        self.b = b
+        self._lengths = []
+        self._postings = {}  # term → [(chunk index, term frequency)]
+        for i, chunk in enumerate(chunks):
+            # The document title counts as part of every chunk it contains
+            terms = tokenize(f"{chunk.title} {chunk.text}")
+            self._lengths.append(len(terms))
+            for term, tf in Counter(terms).items():
+                self._postings.setdefault(term, []).append((i, tf))
+        n = len(chunks)
+        self._avg_len = (sum(self._lengths) / n) if n else 0.0
+        self._idf = {
+            term: math.log(1 + (n - len(p) + 0.5) / (len(p) + 0.5))
+            for term, p in self._postings.items()
+        }
+
+    def search(self, query: str, k: int = 4):
+        """Return up to k (score, chunk) pairs, best first."""
+        scores = {}
+        for term in set(tokenize(query)):
+            idf = self._idf.get(term)
+            if idf is None:
+                continue
+            for i, tf in self._postings[term]:
+                norm = self.k1 * (1 - self.b + self.b * self._lengths[i] / self._avg_len)
+                scores[i] = scores.get(i, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+        best = sorted(scores.items(), key=lambda kv: (-kv[1], kv[0]))[:k]
+        return [(score, self.chunks[i]) for i, score in best]
+
+
+def select_chunks(index: BM25Index, query: str, top_k: int = 4, token_budget: int = 900):
+    """
+    Top-k chunks for the query that fit in token_budget, in KB order.
+    Falls back to the opening chunk of each document when nothing matches.
+    """
+    hits = [chunk for _, chunk in index.search(query, top_k)]
+    if not hits:
+        seen = set()
+        for chunk in index.chunks:
+            if chunk.title not in seen:
+                seen.add(chunk.title)
+                hits.append(chunk)
+
+    selected = []
+    used = 0
+    for chunk in hits:
+        cost = estimate_tokens(chunk.text)
+        if selected and used + cost > token_budget:
+            continue
+        selected.append(chunk)
+        used += cost
+    return sorted(selected, key=lambda c: c.order)
@@ -0,0 +1,72 @@
+import hashlib
+import time
+from datetime import datetime, timezone
+
+DAY = 86400
+
+
+def stable_key(kind: str, stable_id: str) -> str:
+    """
+    Short content hash of an item's upstream identity (Earn slug, ICS UID),
+    so a title edit upstream does not look like a new item.
+    """
+    return hashlib.sha1(f"{kind}:{stable_id}".encode()).hexdigest()[:16]
+
+
+def expiry_for(date_str, retention_days: float, undated_retention_days: float, now: float = None) -> float:
+    """
+    When a seen key may be forgotten: `retention_days` after the item's
+    deadline/date, or `undated_retention_days` from now for undated items.
+    """
+    now = time.time() if now is None else now
+    if date_str:
+        for fmt in ("%Y-%m-%d %H:%M", "%Y-%m-%d"):
+            try:
+                when = datetime.strptime(date_str, fmt).replace(tzinfo=timezone.utc)
+                return max(now, when.timestamp()) + retention_days * DAY
+            except ValueError:
+                continue
+    return now + undated_retention_days * DAY
+
+
+class SeenIndex:
+    """
+    Set of seen keys with an expiry time each: O(1) membership, and prune()
+    drops entries whose deadline/event date is well past. Serializes to a
+    compact {key: expiry (int epoch seconds)} mapping.
+    """
+
+    def __init__(self, entries: dict = None):
+        self._expires = dict(entries or {})
+
+    def __contains__(self, key: str) -> bool:
+        expires = self._expires.get(key)
+        return expires is not None and expires >= time.time()
+
+    def __len__(self):
+        return len(self._expires)
+
+    def add(self, key: str, expires_at: float) -> bool:
+        """Insert or extend an entry; True if the index changed."""
+        current = self._expires.get(key)
+        if current is not None and current >= expires_at:
+            return False
+        self._expires[key] = expires_at
+        return True
+
+    def prune(self, now: float = None) -> int:
+        now = time.time() if now is None else now
+        expired = [k for k, exp in self._expires.items() if exp < now]
+        for key in expired:
+            del self._expires[key]
+        return len(expired)
+
+    def to_compact(self) -> dict:
+        return {k: int(exp) for k, exp in self._expires.items()}
+
+    @classmethod
+    def from_stored(cls, data, legacy_expiry: float):
+        """Load the compact mapping, or a legacy list of keys (db.json v1)."""
+        if isinstance(data, dict):
+            return cls(data)
+        return cls({key: legacy_expiry for key in data or []})
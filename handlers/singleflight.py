@@ -0,0 +1,27 @@
+import asyncio
+
+
+class SingleFlight:
+    """
+    In-flight request table: concurrent calls with the same key share one
+    execution of the coroutine and all get its result (or its exception).
+    """
+
+    def __init__(self):
+        self._inflight = {}
+
+    async def do(self, key: str, coro_fn):
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(coro_fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # shield: one caller giving up must not cancel the call for the others
+        return await asyncio.shield(task)
+
+    def in_flight(self) -> int:
+        return len(self._inflight)
+
+
+# Shared by every LLM-backed path (/faq, group mentions, the digest opener)
+LLM = SingleFlight()
@@ -0,0 +1,327 @@
+import json
+import logging
+import os
+import sqlite3
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+
+from handlers.seenindex import DAY, SeenIndex
+
+logger = logging.getLogger(__name__)
+
+# Expiry given to keys imported from the old append-only lists
+LEGACY_RETENTION = 90 * DAY
+
+
+class Storage(ABC):
+    """
+    Subscribers, seen bounty/event keys and small metadata values.
+    `kind` is "bounties" or "events"; seen keys carry an expiry timestamp.
+    A subscriber's alert filters are a small dict (see handlers.subscriptions),
+    None meaning every alert.
+    Backends: JsonStorage, SqliteStorage.
+    """
+
+    @abstractmethod
+    def is_subscriber(self, user_id: int) -> bool:
+        ...
+
+    @abstractmethod
+    def add_subscriber(self, user_id: int, filters: dict = None) -> bool:
+        """False if `user_id` was already subscribed (its filters are left as they are)."""
+
+    @abstractmethod
+    def remove_subscriber(self, user_id: int) -> bool:
+        """False if `user_id` was not subscribed."""
+
+    @abstractmethod
+    def subscribers(self) -> list:
+        ...
+
+    @abstractmethod
+    def subscriber_filters(self) -> dict:
+        """user id → filters dict (or None) for every subscriber."""
+
+    @abstractmethod
+    def get_subscriber_filters(self, user_id: int):
+        ...
+
+    @abstractmethod
+    def set_subscriber_filters(self, user_id: int, filters: dict) -> bool:
+        """False if `user_id` is not subscribed."""
+
+    @abstractmethod
+    def has_seen(self, kind: str, key: str) -> bool:
+        ...
+
+    @abstractmethod
+    def mark_seen(self, kind: str, entries: dict) -> None:
+        """Record seen keys; `entries` maps key → expiry timestamp."""
+
+    @abstractmethod
+    def prune_seen(self) -> int:
+        """Drop expired seen keys; returns how many were removed."""
+
+    @abstractmethod
+    def get_meta(self, key: str, default=None):
+        ...
+
+    @abstractmethod
+    def set_meta(self, key: str, value) -> None:
+        ...
+
+    def close(self):
+        pass
+
+
+# --- JSON backend (local development) ---
+class JsonStorage(Storage):
+    """
+    The db.json layout, held in memory (O(1) lookups). Every write replaces
+    the file atomically (temp file + rename), so a crash can't corrupt it.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        data = json.loads(path.read_text()) if path.exists() else {}
+        # ordered user_id → filters (None: every alert)
+        stored_filters = data.get("subscriber_filters", {})
+        self._subscribers = {u: stored_filters.get(str(u)) for u in data.get("subscribers", [])}
+        legacy_expiry = time.time() + LEGACY_RETENTION
+        self._seen = {
+            kind: SeenIndex.from_stored(data.get(f"seen_{kind}"), legacy_expiry)
+            for kind in ("bounties", "events")
+        }
+        self._meta = {"last_digest_date": data.get("last_digest_date")}
+        self._meta.update(data.get("meta", {}))
+
+    def _save(self):
+        data = {
+            "subscribers": list(self._subscribers),
+            "subscriber_filters": {str(u): f for u, f in self._subscribers.items() if f is not None},
+            "seen_bounties": self._seen["bounties"].to_compact(),
+            "seen_events": self._seen["events"].to_compact(),
+            "last_digest_date": self._meta.get("last_digest_date"),
+            "meta": {k: v for k, v in self._meta.items() if k != "last_digest_date"},
+        }
+        tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        tmp.write_text(json.dumps(data, indent=2))
+        os.replace(tmp, self.path)
+
+    def is_subscriber(self, user_id):
+        return user_id in self._subscribers
+
+    def add_subscriber(self, user_id, filters=None):
+        if user_id in self._subscribers:
+            return False
+        self._subscribers[user_id] = filters
+        self._save()
+        return True
+
+    def remove_subscriber(self, user_id):
+        if self._subscribers.pop(user_id, False) is False:
+            return False
+        self._save()
+        return True
+
+    def subscribers(self):
+        return list(self._subscribers)
+
+    def subscriber_filters(self):
+        return dict(self._subscribers)
+
+    def get_subscriber_filters(self, user_id):
+        return self._subscribers.get(user_id)
+
+    def set_subscriber_filters(self, user_id, filters):
+        if user_id not in self._subscribers:
+            return False
+        self._subscribers[user_id] = filters
+        self._save()
+        return True
+
+    def has_seen(self, kind, key):
+        return key in self._seen[kind]
+
+    def mark_seen(self, kind, entries):
+        changed = [self._seen[kind].add(k, exp) for k, exp in entries.items()]
+        if any(changed):
+            self._save()
+
+    def prune_seen(self):
+        pruned = sum(index.prune() for index in self._seen.values())
+        if pruned:
+            self._save()
+        return pruned
+
+    def get_meta(self, key, default=None):
+        value = self._meta.get(key)
+        return default if value is None else value
+
+    def set_meta(self, key, value):
+        self._meta[key] = value
+        self._save()
+
+
+# --- SQLite backend (production) ---
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS subscribers (
+    user_id INTEGER PRIMARY KEY,
+    subscribed_at REAL NOT NULL,
+    filters TEXT
+);
+CREATE TABLE IF NOT EXISTS seen (
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL,
+    seen_at REAL NOT NULL,
+    expires_at REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (kind, key)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+class SqliteStorage(Storage):
+    """
+    SQLite in WAL mode: indexed lookups and one small transaction per write
+    instead of rewriting the whole database file.
+    """
+
+    def __init__(self, path: Path, migrate_from: Path = None):
+        self.path = path
+        self.conn = sqlite3.connect(str(path), isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(_SCHEMA)
+        self._upgrade_seen_table()
+        self._upgrade_subscribers_table()
+        if migrate_from is not None:
+            self._migrate_json(migrate_from)
+
+    def _upgrade_seen_table(self):
+        """Add expiry to a seen table created before keys could expire."""
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(seen)")}
+        if "expires_at" not in columns:
+            self.conn.execute("ALTER TABLE seen ADD COLUMN expires_at REAL NOT NULL DEFAULT 0")
+        self.conn.execute(
+            "UPDATE seen SET expires_at = ? WHERE expires_at = 0", (time.time() + LEGACY_RETENTION,)
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS seen_expiry ON seen (expires_at)")
+
+    def _upgrade_subscribers_table(self):
+        """Add the filters column to a subscribers table from before filters existed."""
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(subscribers)")}
+        if "filters" not in columns:
+            self.conn.execute("ALTER TABLE subscribers ADD COLUMN filters TEXT")
+
+    def _migrate_json(self, json_path: Path):
+        """One-time import of an existing db.json."""
+        if self.get_meta("migrated_from_json") or not json_path.exists():
+            return
+        data = json.loads(json_path.read_text())
+        now = time.time()
+        stored_filters = data.get("subscriber_filters", {})
+        with self.conn:
+            self.conn.execute("BEGIN")
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO subscribers VALUES (?, ?, ?)",
+                [(int(u), now, _dump_filters(stored_filters.get(str(u))))
+                 for u in data.get("subscribers", [])],
+            )
+            for kind in ("bounties", "events"):
+                index = SeenIndex.from_stored(data.get(f"seen_{kind}"), now + LEGACY_RETENTION)
+                self.conn.executemany(
+                    "INSERT OR IGNORE INTO seen VALUES (?, ?, ?, ?)",
+                    [(kind, k, now, exp) for k, exp in index.to_compact().items()],
+                )
+            if data.get("last_digest_date"):
+                self._put_meta("last_digest_date", data["last_digest_date"])
+            self._put_meta("migrated_from_json", str(json_path))
+        logger.info(f"Migrated {json_path} into {self.path}")
+
+    def is_subscriber(self, user_id):
+        row = self.conn.execute("SELECT 1 FROM subscribers WHERE user_id = ?", (user_id,)).fetchone()
+        return row is not None
+
+    def add_subscriber(self, user_id, filters=None):
+        cur = self.conn.execute(
+            "INSERT OR IGNORE INTO subscribers VALUES (?, ?, ?)",
+            (user_id, time.time(), _dump_filters(filters)),
+        )
+        return cur.rowcount > 0
+
+    def remove_subscriber(self, user_id):
+        cur = self.conn.execute("DELETE FROM subscribers WHERE user_id = ?", (user_id,))
+        return cur.rowcount > 0
+
+    def subscribers(self):
+        rows = self.conn.execute("SELECT user_id FROM subscribers ORDER BY subscribed_at")
+        return [r[0] for r in rows]
+
+    def subscriber_filters(self):
+        rows = self.conn.execute("SELECT user_id, filters FROM subscribers ORDER BY subscribed_at")
+        return {user_id: json.loads(f) if f else None for user_id, f in rows}
+
+    def get_subscriber_filters(self, user_id):
+        row = self.conn.execute("SELECT filters FROM subscribers WHERE user_id = ?", (user_id,)).fetchone()
+        return json.loads(row[0]) if row and row[0] else None
+
+    def set_subscriber_filters(self, user_id, filters):
+        cur = self.conn.execute(
+            "UPDATE subscribers SET filters = ? WHERE user_id = ?", (_dump_filters(filters), user_id)
+        )
+        return cur.rowcount > 0
+
+    def has_seen(self, kind, key):
+        row = self.conn.execute(
+            "SELECT 1 FROM seen WHERE kind = ? AND key = ? AND expires_at >= ?",
+            (kind, key, time.time()),
+        ).fetchone()
+        return row is not None
+
+    def mark_seen(self, kind, entries):
+        now = time.time()
+        with self.conn:
+            self.conn.execute("BEGIN")
+            self.conn.executemany(
+                "INSERT INTO seen VALUES (?, ?, ?, ?) ON CONFLICT(kind, key) "
+                "DO UPDATE SET expires_at = MAX(expires_at, excluded.expires_at)",
+                [(kind, k, now, exp) for k, exp in entries.items()],
+            )
+
+    def prune_seen(self):
+        cur = self.conn.execute("DELETE FROM seen WHERE expires_at < ?", (time.time(),))
+        return cur.rowcount
+
+    def get_meta(self, key, default=None):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row and row[0] is not None else default
+
+    def set_meta(self, key, value):
+        self._put_meta(key, value)
+
+    def _put_meta(self, key, value):
+        self.conn.execute(
+            "INSERT INTO meta VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (key, json.dumps(value)),
+        )
+
+    def close(self):
+        self.conn.close()
+
+
+def _dump_filters(filters):
+    return json.dumps(filters) if filters is not None else None
+
+
+def open_storage(config: dict) -> Storage:
+    """Build the backend selected by `storage.backend` in config.yaml."""
+    settings = config.get("storage", {})
+    json_path = Path(settings.get("json_path", "db.json"))
+    if settings.get("backend", "sqlite") == "json":
+        return JsonStorage(json_path)
+    return SqliteStorage(Path(settings.get("path", "bot.db")), migrate_from=json_path)
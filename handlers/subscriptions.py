@@ -0,0 +1,165 @@
+from bisect import bisect_right, insort
+from dataclasses import dataclass
+
+TOPICS = ("bounties", "events")
+
+USAGE = (
+    "Usage: /subscribe [bounties|events|all] [token] [min=amount]\n"
+    "e.g. /subscribe bounties usdc min=500"
+)
+
+
+@dataclass(slots=True, frozen=True)
+class Filters:
+    """
+    Which alerts a subscriber gets. Token and minimum reward only narrow
+    bounty alerts (events have neither); no tokens means any token.
+    """
+
+    topics: frozenset = frozenset(TOPICS)
+    tokens: frozenset = frozenset()
+    min_reward: float = None
+
+    @property
+    def is_default(self) -> bool:
+        return self == Filters()
+
+    def to_stored(self):
+        """Compact dict for storage; None for the default (every alert)."""
+        if self.is_default:
+            return None
+        stored = {"topics": sorted(self.topics)}
+        if self.tokens:
+            stored["tokens"] = sorted(self.tokens)
+        if self.min_reward is not None:
+            stored["min_reward"] = self.min_reward
+        return stored
+
+    @classmethod
+    def from_stored(cls, data):
+        if not data:
+            return cls()
+        return cls(
+            topics=frozenset(data.get("topics", TOPICS)) & frozenset(TOPICS),
+            tokens=frozenset(data.get("tokens", ())),
+            min_reward=data.get("min_reward"),
+        )
+
+    def describe(self) -> str:
+        if self.is_default:
+            return "all new bounties and events"
+        parts = []
+        if "bounties" in self.topics:
+            bounty = "bounties"
+            if self.tokens:
+                bounty += " paid in " + "/".join(sorted(self.tokens))
+            if self.min_reward is not None:
+                bounty += f" worth at least {self.min_reward:g}"
+            parts.append(bounty)
+        if "events" in self.topics:
+            parts.append("events")
+        return "new " + " and ".join(parts)
+
+
+def parse_filters(args) -> Filters:
+    """`bounties usdc min=500` → Filters; raises ValueError on anything else."""
+    topics, tokens, min_reward = set(), set(), None
+    for arg in args:
+        key, sep, value = arg.partition("=")
+        key = key.lower()
+        if not sep:
+            if key == "all":
+                topics.update(TOPICS)
+            elif key in TOPICS:
+                topics.add(key)
+            else:
+                tokens.add(arg.upper())
+        elif key == "token":
+            tokens.add(value.upper())
+        elif key == "min":
+            min_reward = float(value)
+        else:
+            raise ValueError(f"Unknown filter {arg!r}")
+    if (tokens or min_reward is not None) and not topics:
+        topics.add("bounties")  # "/subscribe usdc" is about bounties
+    if "bounties" not in topics and (tokens or min_reward is not None):
+        raise ValueError("Token and min= filters only apply to bounties")
+    return Filters(frozenset(topics or TOPICS), frozenset(tokens), min_reward)
+
+
+class SubscriptionIndex:
+    """
+    Subscribers inverted by what they want: topic → users, reward token →
+    users, plus the users without a token filter and a sorted list of
+    minimum rewards. recipients() builds an alert's audience from set
+    unions/intersections instead of checking every subscriber.
+    """
+
+    def __init__(self):
+        self._filters = {}  # user → Filters
+        self._topics = {topic: set() for topic in TOPICS}
+        self._tokens = {}  # TOKEN → users (bounty subscribers with that token)
+        self._any_token = set()  # bounty subscribers without a token filter
+        self._min_rewards = []  # sorted (min_reward, user)
+
+    @classmethod
+    def from_stored(cls, stored: dict):
+        """From Storage.subscriber_filters()."""
+        index = cls()
+        for user_id, data in stored.items():
+            index.add(user_id, Filters.from_stored(data))
+        return index
+
+    def __len__(self):
+        return len(self._filters)
+
+    def __contains__(self, user_id):
+        return user_id in self._filters
+
+    def get(self, user_id):
+        return self._filters.get(user_id)
+
+    def add(self, user_id, filters: Filters):
+        """Insert or replace a subscriber's filters."""
+        self.remove(user_id)
+        self._filters[user_id] = filters
+        for topic in filters.topics:
+            self._topics[topic].add(user_id)
+        if "bounties" in filters.topics:
+            if filters.tokens:
+                for token in filters.tokens:
+                    self._tokens.setdefault(token, set()).add(user_id)
+            else:
+                self._any_token.add(user_id)
+            if filters.min_reward is not None:
+                insort(self._min_rewards, (filters.min_reward, user_id))
+
+    def remove(self, user_id) -> bool:
+        filters = self._filters.pop(user_id, None)
+        if filters is None:
+            return False
+        for topic in filters.topics:
+            self._topics[topic].discard(user_id)
+        for token in filters.tokens:
+            users = self._tokens.get(token)
+            if users is not None:
+                users.discard(user_id)
+                if not users:
+                    del self._tokens[token]
+        self._any_token.discard(user_id)
+        if filters.min_reward is not None and "bounties" in filters.topics:
+            i = bisect_right(self._min_rewards, (filters.min_reward, user_id)) - 1
+            del self._min_rewards[i]
+        return True
+
+    def recipients(self, topic: str, token: str = None, reward: float = None) -> set:
+        """Users who want an alert about `topic` (and, for bounties, this token/reward)."""
+        if topic != "bounties":
+            return set(self._topics.get(topic, ()))
+        # Every bounty subscriber is in _any_token or in some token's set
+        users = self._any_token | self._tokens.get((token or "").upper(), set())
+        # Users whose minimum is above this reward: a suffix of the sorted list
+        cut = bisect_right(self._min_rewards, (reward or 0, float("inf")))
+        if cut < len(self._min_rewards):
+            users -= {user_id for _, user_id in self._min_rewards[cut:]}
+        return users
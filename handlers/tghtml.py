@@ -0,0 +1,423 @@
+import html
+import re
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Telegram HTML: Markdown renderer, sanitizer and splitter.
+# Telegram accepts only <b> <i> <u> <s> <a href> <code> <pre>, properly
+# nested, with every other <, > and & escaped; a message is at most 4096
+# characters. Everything here is a single left-to-right scan: the
+# sanitizer rewrites tokens in place with one re.sub, the renderer and
+# splitter append to a list and join once.
+# ──────────────────────────────────────────────────────────────────────────────
+ALLOWED = frozenset(("b", "i", "u", "s", "a", "code", "pre"))
+MAX_MESSAGE_CHARS = 4096
+
+# Synonyms Telegram does not accept, mapped to the tag it does
+_ALIASES = {"strong": "b", "em": "i", "ins": "u", "del": "s", "strike": "s"}
+# Known HTML/markup tags that are dropped (their text is kept); anything
+# else that looks like a tag ("<3", "<https://…>", "a<b") is escaped instead
+_DROPPED = frozenset((
+    "ul", "ol", "li", "span", "tg-spoiler", "img", "table", "thead", "tbody", "tr", "td", "th",
+    "h1", "h2", "h3", "h4", "h5", "h6", "div", "p", "blockquote", "hr", "sup", "sub",
+    "html", "head", "body", "section", "article", "header", "footer", "small", "big",
+    "font", "center", "mark", "kbd", "var", "samp", "tt", "abbr", "cite", "q", "dl", "dt", "dd",
+))
+# One token per match: a tag (groups 1-4), an entity (group 5) or a stray <, > or &
+_TOKEN = re.compile(
+    r"<(/?)([a-zA-Z][a-zA-Z0-9-]*)((?:\s[^<>]*)?)(/?)>"
+    r"|&(#[0-9]{1,7}|#[xX][0-9a-fA-F]{1,6}|[a-zA-Z][a-zA-Z0-9]{1,31});"
+    r"|[<>&]"
+)
+_STRAY = {"<": "&lt;", ">": "&gt;", "&": "&amp;"}
+# Tag name → what sanitize() does with it: an allowed name, "br", or "" to
+# drop it; the lower- and upper-case spellings are looked up directly
+_TAG_ACTIONS = {}
+for _name in (*ALLOWED, *_ALIASES, *_DROPPED, "br"):
+    for _spelling in (_name, _name.upper()):
+        _TAG_ACTIONS[_spelling] = "" if _name in _DROPPED else _ALIASES.get(_name, _name)
+_HREF = re.compile(r"""href\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]+))""", re.I)
+_KEEP_ENTITIES = frozenset(("amp", "lt", "gt", "quot"))
+_NEWLINES = re.compile(r"\n{3,}")
+
+
+def _escape_text(text: str) -> str:
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+def _escape_attr(value: str) -> str:
+    return _escape_text(value).replace('"', "&quot;")
+
+
+def _cut_partial_tail(s: str) -> str:
+    """Drop a half-received tag or entity at the end of streamed text."""
+    lt = s.rfind("<")
+    if lt > s.rfind(">"):
+        s = s[:lt]
+    amp = s.rfind("&")
+    if amp != -1 and ";" not in s[amp:] and all(c == "#" or c.isalnum() for c in s[amp + 1:]):
+        s = s[:amp]
+    return s
+
+
+def sanitize(s: str, partial: bool = False) -> str:
+    """
+    Make arbitrary (LLM) HTML safe for parse_mode=HTML in one scan:
+
+    - allowed tags are kept without attributes (<a> keeps only href);
+      aliases like <strong>/<em> are mapped, <br> becomes a newline
+    - known block/markup tags are dropped, anything else tag-like is escaped
+    - stray <, > and & are escaped; named entities Telegram lacks are decoded
+    - tags are balanced: stray closers dropped, crossed ones closed in
+      order, open ones closed at the end; nothing nests inside <code>/<pre>
+      (except <pre><code>) and links don't nest
+    - runs of 3+ newlines become 2
+
+    partial=True first cuts a half-received tag/entity (streamed answers).
+    """
+    if not s:
+        return s
+    if partial:
+        s = _cut_partial_tail(s)
+
+    stack = []  # (name, emitted) of open tags
+    open_count = dict.fromkeys(ALLOWED, 0)  # per name, so lookups don't scan the stack
+    links = 0  # emitted <a> still open
+    literal = 0  # depth of open <code>/<pre>: no formatting inside
+
+    def token(m) -> str:
+        """What one _TOKEN match becomes; the text between matches is copied by re.sub."""
+        nonlocal links, literal
+        closing, name, attrs, self_closing, entity = m.groups()
+        if name is None:
+            if entity is None:  # stray <, > or &
+                return _STRAY[m.group(0)]
+            if entity[0] == "#" or entity in _KEEP_ENTITIES:
+                return m.group(0)
+            if entity == "nbsp":
+                return " "
+            return _escape_text(html.unescape(m.group(0)))
+
+        action = _TAG_ACTIONS.get(name)
+        name = _TAG_ACTIONS.get(name.lower()) if action is None else action
+        if not name:
+            # "": a dropped tag; None: not a known tag ("<3", "<hi>", "a<b")
+            return "" if name == "" else _escape_text(m.group(0))
+        if name == "br":
+            return "\n"
+        if self_closing:  # <b/>
+            return ""
+
+        if not closing:
+            emit = (
+                (not literal or (name == "code" and stack and stack[-1] == ("pre", True)))
+                and not (name == "a" and links)
+            )
+            tag = ""
+            if emit and name == "a":
+                href = _HREF.search(attrs)
+                if href:
+                    url = html.unescape(href.group(1) or href.group(2) or href.group(3) or "")
+                    tag = f'<a href="{_escape_attr(url)}">'
+                else:
+                    emit = False
+            elif emit:
+                tag = f"<{name}>"
+            stack.append((name, emit))
+            open_count[name] += 1
+            if emit and name in ("code", "pre"):
+                literal += 1
+            elif emit and name == "a":
+                links += 1
+            return tag
+
+        if not open_count[name]:
+            return ""  # stray closing tag
+        if stack[-1][0] == name:  # the usual case: it closes the innermost tag
+            _, emitted = stack.pop()
+            open_count[name] -= 1
+            if not emitted:
+                return ""
+            if name in ("code", "pre"):
+                literal -= 1
+            elif name == "a":
+                links -= 1
+            return f"</{name}>"
+        # close anything opened inside it first, then the tag itself
+        closers = []
+        while stack:
+            open_name, emitted = stack.pop()
+            open_count[open_name] -= 1
+            if emitted:
+                closers.append(f"</{open_name}>")
+                if open_name in ("code", "pre"):
+                    literal -= 1
+                elif open_name == "a":
+                    links -= 1
+            if open_name == name:
+                break
+        return "".join(closers)
+
+    text = _TOKEN.sub(token, s)
+    if stack:
+        text += "".join(f"</{name}>" for name, emitted in reversed(stack) if emitted)
+    return _NEWLINES.sub("\n\n", text) if "\n\n\n" in text else text
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Markdown subset → Telegram HTML (KB pages): headings, bullets, rules,
+# fenced code, `code`, **bold**/__bold__, *italic*/_italic_, [links](…),
+# ![images](…) (alt text only). Inline markers pair within a line.
+# ──────────────────────────────────────────────────────────────────────────────
+_HEADING = re.compile(r"\s{0,3}#{1,6}\s*(.+)$")
+_BULLET = re.compile(r"\s*(?:[-*]|\d+\.)\s+")
+_RULE = re.compile(r"\s{0,3}(?:-{3,}|\*{3,}|_{3,})\s*$")
+_LINK = re.compile(r"\[([^\]]+)\]\((https?://[^)\s]+)\)")
+_IMAGE = re.compile(r"!\[([^\]]*)\]\(([^)]+)\)")
+_SPECIAL = re.compile(r"[`*_\[\]!]")
+_NEEDS_ESCAPE = re.compile(r"[&<>\"']")  # what html.escape() would change
+
+
+def _inline(line: str, out: list):
+    """Render one line's inline Markdown into `out`; unclosed markers stay literal."""
+    stack = []      # open markers: "**", "__", "*", "_" or "a"
+    link_end = []   # index of the "]" that closes each open link
+    i, n = 0, len(line)
+    start = 0       # start of the pending plain-text run
+
+    def flush(upto):
+        if upto > start:
+            chunk = line[start:upto]
+            out.append(html.escape(chunk) if _NEEDS_ESCAPE.search(chunk) else chunk)
+
+    while i < n:
+        m = _SPECIAL.search(line, i)
+        if not m:
+            break
+        i = m.start()
+        c = line[i]
+
+        if c == "]" and link_end and link_end[-1] == i:
+            flush(i)
+            while stack:
+                top = stack.pop()
+                out.append("</a>" if top == "a" else "</b>" if len(top) == 2 else "</i>")
+                if top == "a":
+                    break
+            i = link_end.pop() + 1
+            i = line.index(")", i) + 1
+            start = i
+            continue
+
+        if c == "`":
+            close = line.find("`", i + 1)
+            if close > i + 1:
+                flush(i)
+                out.append(f"<code>{html.escape(line[i + 1:close])}</code>")
+                i = start = close + 1
+                continue
+            i += 1
+            continue
+
+        if c == "!" and line.startswith("![", i):
+            m = _IMAGE.match(line, i)
+            if m:
+                flush(i)
+                out.append(html.escape(m.group(1)))
+                i = start = m.end()
+                continue
+            i += 1
+            continue
+
+        if c == "[":
+            m = _LINK.match(line, i) if "a" not in stack else None
+            if m:
+                flush(i)
+                out.append(f'<a href="{html.escape(m.group(2))}">')
+                stack.append("a")
+                link_end.append(m.end(1))
+                i = start = i + 1
+                continue
+            i += 1
+            continue
+
+        if c not in "*_":
+            i += 1
+            continue
+        marker = line[i:i + 2] if line.startswith(c * 2, i) else c
+        after = line[i + len(marker):i + len(marker) + 1]
+        # _ only emphasises at word boundaries (snake_case, URLs stay literal)
+        if marker in stack and not (c == "_" and after.isalnum()):
+            flush(i)
+            while stack:  # close inner markers crossed by this one
+                top = stack.pop()
+                if top == "a":
+                    stack.append(top)
+                    break
+                out.append("</b>" if len(top) == 2 else "</i>")
+                if top == marker:
+                    break
+            i = start = i + len(marker)
+            continue
+        if c == "_" and i and line[i - 1].isalnum():
+            i += len(marker)
+            continue
+        if after and not after.isspace() and line.find(marker, i + len(marker) + 1) != -1:
+            flush(i)
+            out.append("<b>" if len(marker) == 2 else "<i>")
+            stack.append(marker)
+            i = start = i + len(marker)
+            continue
+        i += len(marker)
+
+    flush(n)
+    while stack:
+        top = stack.pop()
+        out.append("</a>" if top == "a" else "</b>" if len(top) == 2 else "</i>")
+
+
+def render_markdown(md: str) -> str:
+    """Markdown (KB pages) → Telegram-safe HTML, line by line in one pass."""
+    if not md:
+        return ""
+    out = []
+    blank_run = 0
+    fence = None  # lines of an open ``` block
+    for line in md.replace("\r\n", "\n").replace("\r", "\n").split("\n"):
+        if line.lstrip().startswith("```"):
+            if fence is None:
+                fence = []
+            else:
+                out.append(f"<pre>{html.escape(chr(10).join(fence))}</pre>\n")
+                fence = None
+                blank_run = 0
+            continue
+        if fence is not None:
+            fence.append(line)
+            continue
+
+        if not line.strip() or _RULE.match(line):
+            blank_run += 1
+            if blank_run <= 1:
+                out.append("\n")
+            continue
+        blank_run = 0
+
+        heading = _HEADING.match(line)
+        if heading:
+            out.append("<b>")
+            _inline(heading.group(1), out)
+            out.append("</b>\n")
+            continue
+        bullet = _BULLET.match(line)
+        if bullet:
+            out.append("• ")
+            line = line[bullet.end():]
+        _inline(line, out)
+        out.append("\n")
+
+    if fence is not None:  # unterminated fence: still show it
+        out.append(f"<pre>{html.escape(chr(10).join(fence))}</pre>\n")
+    return "".join(out)[:-1] if out and out[-1].endswith("\n") else "".join(out)
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Splitting long messages on tag-safe boundaries
+# ──────────────────────────────────────────────────────────────────────────────
+_SPLIT_TOKEN = re.compile(r"<(/?)([a-z]+)[^>]*>")
+
+
+def split_message(s: str, limit: int = MAX_MESSAGE_CHARS) -> list:
+    """
+    Split sanitized HTML into parts of at most `limit` characters. Breaks
+    prefer a blank line, then a newline, then a space; never inside a tag or
+    an entity. Tags open at a break are closed at the end of the part and
+    reopened at the start of the next.
+    """
+    if len(s) <= limit:
+        return [s]
+    parts = []
+    stack = []   # (name, opening tag text)
+    current = []
+    size = 0
+    prefix = 0   # length of the reopened tags that start the current part
+
+    def closers() -> str:
+        return "".join(f"</{name}>" for name, _ in reversed(stack))
+
+    def flush():
+        nonlocal current, size, prefix
+        parts.append("".join(current) + closers())
+        reopen = "".join(tag for _, tag in stack)
+        current, size, prefix = [reopen], len(reopen), len(reopen)
+
+    def add_text(text: str):
+        nonlocal size
+        while text:
+            room = limit - size - len(closers())
+            if len(text) <= room:
+                current.append(text)
+                size += len(text)
+                return
+            cut = _break_at(text, room)
+            if cut == 0:
+                if size > prefix:
+                    flush()
+                    continue
+                # no break point on an otherwise empty part: cut the word
+                cut = _break_at(text, room, hard=True) or max(1, room)
+            current.append(text[:cut])
+            size += cut
+            flush()
+            text = text[cut:].lstrip(" \n")
+
+    pos = 0
+    for m in _SPLIT_TOKEN.finditer(s):
+        add_text(s[pos:m.start()])
+        pos = m.end()
+        tag = m.group(0)
+        closing = m.group(1) == "/"
+        # an opening tag needs room for itself and for its closer
+        need = len(tag) + (0 if closing else len(m.group(2)) + 3)
+        if size + need + len(closers()) > limit and size > prefix:
+            flush()
+        current.append(tag)
+        size += len(tag)
+        if closing:
+            if stack and stack[-1][0] == m.group(2):
+                stack.pop()
+        else:
+            stack.append((m.group(2), tag))
+    add_text(s[pos:])
+    last = "".join(current)
+    if last.strip() and last != "".join(tag for _, tag in stack):
+        parts.append(last + closers())
+    return [p for p in parts if _visible(p)]
+
+
+def _break_at(text: str, room: int, hard: bool = False) -> int:
+    """
+    Cut position ≤ room: a blank line, newline or space (preferably in the
+    second half), else 0 so the caller can start a new part first; with
+    `hard` a word is cut. Never inside an entity.
+    """
+    if room <= 0:
+        return 0
+    window = text[:room]
+    cut = 0
+    for sep in ("\n\n", "\n", " "):
+        k = window.rfind(sep)
+        if k > room // 2:
+            cut = k + len(sep)
+            break
+        if k > 0 and not cut:
+            cut = k + len(sep)
+    if not cut and hard:
+        cut = room
+    amp = text.rfind("&", 0, cut)
+    if amp != -1 and text.find(";", amp) >= cut:
+        cut = amp
+    return cut
+
+
+def _visible(part: str) -> bool:
+    return bool(_SPLIT_TOKEN.sub("", part).strip())
@@ -0,0 +1,171 @@
+import asyncio
+import time
+from collections import deque
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+from handlers import metrics
+
+DEFAULT_LANE = "default"
+LLM_LANE = "llm"
+
+WAIT_SECONDS = metrics.REGISTRY.register(metrics.Histogram(
+    "bot_update_wait_seconds", "Time an update waited for its chat and a lane slot", ["lane"]))
+
+
+def _percentile(values, pct: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, round(pct / 100 * (len(ordered) - 1)))]
+
+
+class Lane:
+    """A bounded pool of handler slots plus its queue metrics."""
+
+    def __init__(self, name: str, concurrency: int, samples: int = 1024):
+        self.name = name
+        self.concurrency = concurrency
+        self._slots = asyncio.Semaphore(concurrency)
+        self.waiting = 0        # queue depth: accepted, not yet running
+        self.running = 0
+        self.processed = 0
+        self.max_waiting = 0
+        self.max_wait = 0.0
+        self._waits = deque(maxlen=samples)  # recent wait times, seconds
+
+    def stats(self) -> dict:
+        waits = list(self._waits)
+        return {
+            "concurrency": self.concurrency,
+            "waiting": self.waiting,
+            "running": self.running,
+            "processed": self.processed,
+            "max_waiting": self.max_waiting,
+            "wait_p50_ms": round(_percentile(waits, 50) * 1000, 1),
+            "wait_p95_ms": round(_percentile(waits, 95) * 1000, 1),
+            "wait_max_ms": round(self.max_wait * 1000, 1),
+        }
+
+
+class ChatOrderedProcessor(BaseUpdateProcessor):
+    """
+    Runs updates concurrently while keeping each chat's updates in order.
+
+    - per-chat FIFO lock: a chat's next update starts once its previous one is done
+    - lanes: LLM-backed updates (/faq, group mentions) get their own, smaller
+      pool, so slow answers can't hold every slot that /events or /start need
+    - max_pending bounds the updates accepted at once (queued + running);
+      PTB's own semaphore enforces it before do_process_update is called
+    """
+
+    def __init__(self, concurrency: int = 8, llm_concurrency: int = 2,
+                 llm_commands=("faq",), max_pending: int = 256):
+        super().__init__(max(max_pending, concurrency + llm_concurrency))
+        self.lanes = {
+            DEFAULT_LANE: Lane(DEFAULT_LANE, concurrency),
+            LLM_LANE: Lane(LLM_LANE, llm_concurrency),
+        }
+        self.llm_commands = {c.lower() for c in llm_commands}
+        self._chats = {}  # chat_id -> [lock, updates holding or waiting for it]
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+    def lane_for(self, update) -> str:
+        if not isinstance(update, Update) or not update.effective_message:
+            return DEFAULT_LANE
+        message = update.effective_message
+        text = message.text or ""
+        if text.startswith("/"):
+            command = text[1:].split(maxsplit=1)[0].split("@", 1)[0].lower() if text[1:].strip() else ""
+            return LLM_LANE if command in self.llm_commands else DEFAULT_LANE
+        # group mentions are answered by the FAQ (see bot.mention_handler)
+        if message.chat.type in ("group", "supergroup") and "@" in text:
+            try:
+                username = message.get_bot().username
+            except RuntimeError:
+                username = None
+            if not username or f"@{username}" in text:
+                return LLM_LANE
+        return DEFAULT_LANE
+
+    async def do_process_update(self, update, coroutine) -> None:
+        chat = update.effective_chat if isinstance(update, Update) else None
+        await self.run_in_chat(chat.id if chat else None, self.lane_for(update), coroutine)
+
+    async def run_in_chat(self, chat_id, lane_name: str, coroutine) -> None:
+        """
+        Await `coroutine` after the chat's earlier updates and within the
+        lane's slots, like an update; also used for replies sent later by
+        handlers.ratelimit.ReplyLimiter.
+        """
+        lane = self.lanes[lane_name]
+        entry = None
+        if chat_id is not None:
+            # asyncio.Lock wakes waiters first-come first-served, so updates of
+            # one chat run in the order PTB handed them over
+            entry = self._chats.setdefault(chat_id, [asyncio.Lock(), 0])
+            entry[1] += 1
+
+        queued = time.monotonic()
+        lane.waiting += 1
+        lane.max_waiting = max(lane.max_waiting, lane.waiting)
+        started = False
+        try:
+            if entry:
+                await entry[0].acquire()
+            try:
+                async with lane._slots:
+                    waited = time.monotonic() - queued
+                    lane.waiting -= 1
+                    started = True
+                    lane._waits.append(waited)
+                    WAIT_SECONDS.observe(waited, lane.name)
+                    lane.max_wait = max(lane.max_wait, waited)
+                    lane.running += 1
+                    try:
+                        await coroutine
+                    finally:
+                        lane.running -= 1
+                        lane.processed += 1
+            finally:
+                if entry:
+                    entry[0].release()
+        finally:
+            if not started:  # cancelled while queued
+                lane.waiting -= 1
+                coroutine.close()
+            if entry:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._chats[chat_id]
+
+    def stats(self) -> dict:
+        return {
+            "chats": len(self._chats),
+            **{name: lane.stats() for name, lane in self.lanes.items()},
+        }
+
+    def collect(self):
+        """Queue depth and running updates per lane (metrics.Registry collector)."""
+        lanes = self.lanes.values()
+        yield ("bot_update_queue_depth", "Updates waiting for their chat or a lane slot", "gauge",
+               {(lane.name,): lane.waiting for lane in lanes}, ("lane",))
+        yield ("bot_update_running", "Updates being handled now", "gauge",
+               {(lane.name,): lane.running for lane in lanes}, ("lane",))
+
+
+def processor_from(config: dict) -> ChatOrderedProcessor:
+    """updates section of config.yaml."""
+    settings = config.get("updates", {})
+    return ChatOrderedProcessor(
+        concurrency=settings.get("concurrency", 8),
+        llm_concurrency=settings.get("llm_concurrency", 2),
+        llm_commands=settings.get("llm_commands", ["faq"]),
+        max_pending=settings.get("max_pending", 256),
+    )
@@ -0,0 +1,137 @@
+import asyncio
+import hmac
+import json
+import logging
+import os
+import secrets
+import signal
+import time
+
+from telegram import Update
+from telegram.ext import Application
+
+from handlers import httpserver, metrics
+
+logger = logging.getLogger(__name__)
+
+
+class WebhookServer(httpserver.HttpServer):
+    """
+    Telegram webhook endpoint on handlers.httpserver:
+
+    - POST <path>: checks X-Telegram-Bot-Api-Secret-Token, hands the update
+      to the Application's update_queue and answers 200 right away
+    - GET /healthz: liveness/readiness for the host's health checks; only
+      {"ok": ...}, as it is unauthenticated (details are on /metrics)
+    - GET <metrics_path>: Prometheus metrics (handlers.metrics), if set
+    """
+
+    def __init__(self, app: Application, path: str, secret_token: str,
+                 metrics_path: str = "", metrics_token: str = "", max_connections: int = 100):
+        super().__init__(max_connections)
+        self.app = app
+        self.path = path
+        self.secret_token = secret_token
+        self.metrics_path = metrics_path
+        self.metrics_token = metrics_token
+        self.started = time.monotonic()
+        self.received = 0
+        self.rejected = 0
+
+    async def start(self, host: str, port: int):
+        await super().start(host, port)
+        logger.info(f"Webhook server listening on {host}:{self.port}{self.path}")
+
+    async def route(self, method, path, headers, body):
+        if path == "/healthz":
+            if method != "GET":
+                return 405, {"ok": False}
+            healthy = self.app.running and not self._closing
+            return (200 if healthy else 503), {"ok": healthy}
+        if self.metrics_path and path == self.metrics_path:
+            return metrics.scrape(method, headers, self.metrics_token)
+        if path != self.path:
+            return 404, {"ok": False}
+        if method != "POST":
+            return 405, {"ok": False}
+        token = headers.get("x-telegram-bot-api-secret-token", "")
+        if not hmac.compare_digest(token, self.secret_token):
+            self.rejected += 1
+            return 403, {"ok": False}
+        try:
+            update = Update.de_json(json.loads(body), self.app.bot)
+        except Exception as e:
+            logger.warning(f"Webhook: unparsable update: {e}")
+            return 400, {"ok": False}
+        self.received += 1
+        await self.app.update_queue.put(update)
+        return 200, {"ok": True}
+
+    def collect(self):
+        """metrics.Registry collector."""
+        yield ("bot_webhook_requests_total", "Webhook POSTs by result", "counter",
+               {("accepted",): self.received, ("rejected",): self.rejected}, ("result",))
+        yield ("bot_webhook_queued_updates", "Updates received but not yet picked up", "gauge",
+               {(): self.app.update_queue.qsize()}, ())
+        yield ("bot_webhook_uptime_seconds", "Seconds since the webhook server started", "gauge",
+               {(): round(time.monotonic() - self.started)}, ())
+
+
+def settings_from(config: dict) -> dict:
+    """webhook section of config.yaml, with the environment taking precedence."""
+    settings = dict(config.get("webhook", {}))
+    mode = os.getenv("BOT_MODE")
+    if mode:
+        settings["enabled"] = mode.lower() == "webhook"
+    settings["port"] = int(os.getenv("PORT", settings.get("port", 8080)))
+    # Render sets RENDER_EXTERNAL_URL for web services
+    settings["public_url"] = (
+        os.getenv("WEBHOOK_URL") or settings.get("public_url") or os.getenv("RENDER_EXTERNAL_URL", "")
+    ).rstrip("/")
+    settings["secret_token"] = os.getenv("WEBHOOK_SECRET") or secrets.token_urlsafe(32)
+    metrics_config = config.get("metrics", {})
+    settings["metrics_path"] = metrics_config.get("path", "/metrics") if metrics_config.get("enabled", True) else ""
+    settings["metrics_token"] = os.getenv("METRICS_TOKEN", "")
+    return settings
+
+
+async def run(app: Application, settings: dict, stop_signals=(signal.SIGINT, signal.SIGTERM)):
+    """
+    Webhook counterpart of app.run_polling(): same post_init/post_shutdown
+    hooks, and on SIGTERM the server stops accepting, queued updates are
+    processed, then everything shuts down.
+    """
+    path = "/" + settings.get("path", "telegram").strip("/")
+    server = WebhookServer(app, path, settings["secret_token"],
+                           settings.get("metrics_path", ""), settings.get("metrics_token", ""),
+                           max_connections=settings.get("max_open_connections", 100))
+    metrics.REGISTRY.add_collector("webhook", server.collect)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in stop_signals:
+        loop.add_signal_handler(sig, stop.set)
+
+    await app.initialize()
+    try:
+        if app.post_init:
+            await app.post_init(app)
+        await server.start(settings.get("listen", "0.0.0.0"), settings["port"])
+        if settings["public_url"]:
+            await app.bot.set_webhook(
+                url=settings["public_url"] + path,
+                secret_token=settings["secret_token"],
+                max_connections=settings.get("max_connections", 40),
+                allowed_updates=Update.ALL_TYPES,
+            )
+        else:
+            logger.warning("Webhook mode without public_url: not registering the webhook with Telegram")
+        await app.start()
+        logger.info("Bot started in webhook mode…")
+        await stop.wait()
+        logger.info("Shutting down webhook server…")
+        await server.stop()
+        await app.stop()  # drains the update queue
+    finally:
+        await app.shutdown()
+        if app.post_shutdown:
+            await app.post_shutdown(app)